@@ -1,6 +1,6 @@
 # bank_uploads/admin.py
 from django.contrib import admin
-from .models import BankTransaction, BankUploadBatch
+from .models import BalanceBreak, BankParsingProfile, BankTransaction, BankUploadBatch
 
 
 @admin.register(BankTransaction)
@@ -20,9 +20,25 @@ class BankTransactionAdmin(admin.ModelAdmin):
 @admin.register(BankUploadBatch)
 class BankUploadBatchAdmin(admin.ModelAdmin):
     list_display = (
-        'created_at', 'file_name', 'bank_account', 'uploaded_by',
+        'created_at', 'file_name', 'bank_account', 'uploaded_by', 'status',
         'uploaded_count', 'skipped_count', 'errors_count',
         'balance_continuity_in_file', 'previous_ending_balance_match',
     )
-    list_filter = ('bank_account', 'created_at', 'uploaded_by')
+    list_filter = ('status', 'bank_account', 'created_at', 'uploaded_by')
     search_fields = ('file_name',)
+
+
+@admin.register(BankParsingProfile)
+class BankParsingProfileAdmin(admin.ModelAdmin):
+    list_display = ('bank_account', 'delimiter', 'date_format', 'updated_at')
+    readonly_fields = ('created_at', 'updated_at')
+
+
+@admin.register(BalanceBreak)
+class BalanceBreakAdmin(admin.ModelAdmin):
+    list_display = (
+        'bank_account', 'kind', 'previous_date', 'transaction_date',
+        'expected_balance', 'actual_balance', 'gap_days',
+    )
+    list_filter = ('kind', 'bank_account')
+    raw_id_fields = ('transaction', 'previous_transaction')
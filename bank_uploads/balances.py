@@ -0,0 +1,129 @@
+# bank_uploads/balances.py
+"""
+Incremental balance checkpoints and break detection per bank account.
+
+History order is (transaction_date, created_at, id) over active rows. A row
+"breaks" when previous.balance + row.signed != row.balance, or when more than
+DATE_GAP_DAYS passed since the previous row. Breaks live in BalanceBreak and
+the tail of each account lives in BankBalanceState.
+
+Whenever rows appear or disappear in a date range, refresh() re-derives
+breaks for that range only (plus the first row after it, whose predecessor
+may have changed), so an upload costs O(rows in its date range) and reading
+the breaks back costs O(breaks).
+"""
+from __future__ import annotations
+
+from datetime import date
+from typing import List
+
+from django.db import transaction
+
+from banks.models import BankAccount
+
+from .models import BalanceBreak, BankBalanceState, BankTransaction
+
+# consecutive transactions further apart than this are reported as a gap
+DATE_GAP_DAYS = 7
+
+_ORDER = ("transaction_date", "created_at", "id")
+_ORDER_DESC = tuple("-" + f for f in _ORDER)
+_FIELDS = ("id", "transaction_date", "signed_amount", "balance_amount")
+
+
+def _breaks_between(prev: BankTransaction, tx: BankTransaction) -> List[BalanceBreak]:
+    found = []
+    expected = prev.balance_amount + tx.signed_amount
+    if expected != tx.balance_amount:
+        found.append(BalanceBreak(
+            bank_account_id=tx.bank_account_id, kind=BalanceBreak.KIND_BALANCE,
+            transaction=tx, previous_transaction=prev,
+            transaction_date=tx.transaction_date, previous_date=prev.transaction_date,
+            expected_balance=expected, actual_balance=tx.balance_amount,
+        ))
+    gap = (tx.transaction_date - prev.transaction_date).days
+    if gap > DATE_GAP_DAYS:
+        found.append(BalanceBreak(
+            bank_account_id=tx.bank_account_id, kind=BalanceBreak.KIND_DATE_GAP,
+            transaction=tx, previous_transaction=prev,
+            transaction_date=tx.transaction_date, previous_date=prev.transaction_date,
+            gap_days=gap,
+        ))
+    return found
+
+
+def refresh(bank_account_id: int, date_from: date, date_to: date) -> BankBalanceState:
+    """
+    Re-derive breaks after rows were inserted, soft-deleted or restored with
+    transaction dates in [date_from, date_to], and move the checkpoint if the
+    range reaches the end of the account's history.
+    """
+    with transaction.atomic():
+        # same lock uploads take, so ranges can't be refreshed concurrently
+        BankAccount.objects.select_for_update().filter(pk=bank_account_id).exists()
+        state = BankBalanceState.objects.filter(bank_account_id=bank_account_id).first()
+        if state is None:
+            # first time for this account: derive everything once
+            state = BankBalanceState(bank_account_id=bank_account_id)
+            date_from, date_to = date.min, date.max
+
+        active = BankTransaction.objects.filter(bank_account_id=bank_account_id).only(*_FIELDS, "bank_account_id")
+        prev = active.filter(transaction_date__lt=date_from).order_by(*_ORDER_DESC).first()
+        following = active.filter(transaction_date__gt=date_to).order_by(*_ORDER).first()
+
+        in_range = active.filter(transaction_date__range=(date_from, date_to)).order_by(*_ORDER)
+        new_breaks: List[BalanceBreak] = []
+        last = prev
+        for tx in in_range.iterator(chunk_size=2000):
+            if last is not None:
+                new_breaks.extend(_breaks_between(last, tx))
+            last = tx
+        if following is not None and last is not None:
+            new_breaks.extend(_breaks_between(last, following))
+
+        # breaks of rows in the range (including ones just soft-deleted) and of
+        # the row right after it are all superseded
+        stale = BalanceBreak.objects.filter(
+            bank_account_id=bank_account_id, transaction_date__range=(date_from, date_to),
+        )
+        if following is not None:
+            stale = stale | BalanceBreak.objects.filter(transaction_id=following.pk)
+        stale.delete()
+        BalanceBreak.objects.bulk_create(new_breaks)
+
+        if following is None:
+            # the range ran to the end of history, so `last` is the new tail
+            state.last_transaction = last
+            state.last_transaction_date = last.transaction_date if last else None
+            state.last_balance = last.balance_amount if last else None
+            state.save()
+        return state
+
+
+def rebuild(bank_account_id: int) -> BankBalanceState:
+    """Re-derive every break and the checkpoint from the whole history."""
+    return refresh(bank_account_id, date.min, date.max)
+
+
+def checkpoint(bank_account_id: int) -> BankBalanceState:
+    """
+    The account's checkpoint, built from its history the first time it's
+    needed. Soft deletes keep it current; a hard delete of the tail row
+    (SET_NULL on last_transaction) triggers a rebuild here. After hard
+    deleting rows elsewhere in the history, call rebuild().
+    """
+    state = BankBalanceState.objects.filter(bank_account_id=bank_account_id).first()
+    if state is None or (state.last_transaction_id is None and state.last_transaction_date is not None):
+        return rebuild(bank_account_id)
+    return state
+
+
+def refresh_for(transactions) -> None:
+    """refresh() around a set of changed transactions, one range per account."""
+    ranges = {}
+    for tx in transactions:
+        lo, hi = ranges.get(tx.bank_account_id, (tx.transaction_date, tx.transaction_date))
+        ranges[tx.bank_account_id] = (min(lo, tx.transaction_date), max(hi, tx.transaction_date))
+    for bank_account_id, (lo, hi) in ranges.items():
+        refresh(bank_account_id, lo, hi)
+
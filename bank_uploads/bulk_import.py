@@ -0,0 +1,338 @@
+# bank_uploads/bulk_import.py
+"""
+Importing many statement files at once (month-end onboarding).
+
+Sources are the statement files (CSV, XLSX, see readers.py) in a
+directory or zip. Each file is mapped to a
+BankAccount by a manifest (`manifest.csv` with `file,account_number`
+columns) or, failing that, by its folder name or the leading token of its
+file name (`<account_number>/jan.csv`, `<account_number>_jan.csv`).
+
+`manage.py import_statements` ingests accounts concurrently and each
+account's files one at a time, oldest statement first, so
+previous_ending_balance_match compares against the right statement. The
+bulk upload endpoint queues the same files as background jobs in the same
+order instead.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.files.base import File
+from django.db import connection
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+
+from banks.models import BankAccount
+
+from . import jobs, readers
+from .ingest import DEFAULT_LOADER, StatementIngest
+from .models import BankParsingProfile, BankUploadBatch
+from .parsing import DEFAULT_ENGINE, READ_CHUNK_SIZE, CsvStatementReader, StatementError, open_statement
+
+MANIFEST_NAME = "manifest.csv"
+# zip members are unpacked to memory up to this size, to a temp file past it
+SPOOL_MAX_MEMORY = 4 * 1024 * 1024
+
+
+@dataclass
+class StatementSource:
+    """One statement file inside a directory (`archive` None) or a zip archive."""
+    name: str                       # path relative to the directory / inside the zip
+    archive: Optional[str] = None   # zip path on disk
+    account_number: Optional[str] = None
+
+    def open(self) -> File:
+        if self.archive:
+            with zipfile.ZipFile(self.archive) as zf:
+                return _extract(zf, self.name)
+        return File(open(self.name, "rb"), name=os.path.basename(self.name))
+
+
+def _extract(zf: zipfile.ZipFile, name: str) -> File:
+    """Copy one zip member to a spooled temp file (memory up to SPOOL_MAX_MEMORY, then disk)."""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    with zf.open(name) as member:
+        shutil.copyfileobj(member, spool, READ_CHUNK_SIZE)
+    spool.seek(0)
+    return File(spool, name=os.path.basename(name))
+
+
+def max_file_size() -> int:
+    return getattr(settings, "BANK_UPLOADS_ZIP_MAX_FILE_SIZE", 50 * 1024 * 1024)
+
+
+def max_total_size() -> int:
+    return getattr(settings, "BANK_UPLOADS_ZIP_MAX_TOTAL_SIZE", 500 * 1024 * 1024)
+
+
+def check_sizes(zf: zipfile.ZipFile, names: List[str]) -> None:
+    """
+    Refuse archives whose members would unpack past the configured limits,
+    going by the sizes the zip declares (reads never go past them).
+    """
+    infos = [zf.getinfo(n) for n in names]
+    too_big = [i.filename for i in infos if i.file_size > max_file_size()]
+    if too_big:
+        raise ValueError(f"over {filesizeformat(max_file_size())} once unpacked: {', '.join(too_big)}")
+    if sum(i.file_size for i in infos) > max_total_size():
+        raise ValueError(f"statements unpack to over {filesizeformat(max_total_size())} in total")
+
+
+# ---------- collecting sources ----------
+
+def _account_candidates(name: str) -> List[str]:
+    parent = os.path.basename(os.path.dirname(name))
+    token = re.split(r"[_\-\s.]", os.path.splitext(os.path.basename(name))[0], maxsplit=1)[0]
+    return [c for c in (parent, token) if c]
+
+
+def _is_statement(name: str) -> bool:
+    return not name.endswith("/") and os.path.splitext(name)[1].lower() in readers.supported_extensions()
+
+
+def _read_manifest(fh) -> Dict[str, str]:
+    reader = csv.DictReader(io.TextIOWrapper(fh, encoding="utf-8-sig"))
+    return {
+        (row.get("file") or "").strip(): (row.get("account_number") or "").strip()
+        for row in reader if row.get("file")
+    }
+
+
+def collect_sources(path, manifest: Optional[str] = None) -> List[StatementSource]:
+    """
+    List the statement files under a directory or inside a zip (a path, or an open file
+    such as an upload) and resolve each one's account number (None if it
+    can't be mapped to an existing account).
+    """
+    is_dir = isinstance(path, str) and os.path.isdir(path)
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            names = [n for n in zf.namelist() if _is_statement(n)]
+            mapping = {}
+            manifest_name = next((n for n in names if os.path.basename(n) == MANIFEST_NAME), None)
+            if manifest is None and manifest_name:
+                with zf.open(manifest_name) as fh:
+                    mapping = _read_manifest(fh)
+        sources = [StatementSource(n, archive=path) for n in names if n != manifest_name]
+    elif is_dir:
+        names = sorted(
+            os.path.relpath(os.path.join(root, f), path)
+            for root, _dirs, files in os.walk(path) for f in files if _is_statement(f)
+        )
+        mapping = {}
+        if manifest is None and MANIFEST_NAME in names:
+            with open(os.path.join(path, MANIFEST_NAME), "rb") as fh:
+                mapping = _read_manifest(fh)
+        sources = [StatementSource(os.path.join(path, n)) for n in names if n != MANIFEST_NAME]
+    else:
+        raise ValueError("Expected a directory or a zip file.")
+
+    if manifest is not None:
+        with open(manifest, "rb") as fh:
+            mapping = _read_manifest(fh)
+
+    base = path if is_dir else ""
+    relative = {s.name: os.path.relpath(s.name, base) if base else s.name for s in sources}
+    candidates = {s.name: (
+        [mapping[relative[s.name]]] if relative[s.name] in mapping
+        else [mapping[os.path.basename(s.name)]] if os.path.basename(s.name) in mapping
+        else _account_candidates(relative[s.name])
+    ) for s in sources}
+
+    known = set(
+        BankAccount.objects
+        .filter(account_number__in={c for cs in candidates.values() for c in cs})
+        .values_list("account_number", flat=True)
+    )
+    for s in sources:
+        s.account_number = next((c for c in candidates[s.name] if c in known), None)
+    return sources
+
+
+# ---------- ordering ----------
+
+def first_transaction_date(file, profile: Optional[BankParsingProfile] = None,
+                           reader_class=CsvStatementReader) -> Optional[date]:
+    """
+    Date of the first parseable row, reading only as far as that row. None
+    for files that can't be read; the ingest reports why.
+    """
+    try:
+        statement = open_statement(file, profile=profile, reader_class=reader_class)
+        return next((r["transaction_date"] for _n, r in statement if r is not None), None)
+    except Exception:
+        return None
+
+
+def _reader_class(source: StatementSource, account: BankAccount):
+    return readers.reader_for(source.name, bank_name=account.bank_name) or CsvStatementReader
+
+
+def _statement_order(source: StatementSource, first_date: Optional[date]) -> tuple:
+    # oldest statement first; files without a date go last
+    return (first_date is None, first_date or date.min, source.name)
+
+
+# ---------- bulk upload (background jobs) ----------
+
+def enqueue_archive(file, *, loader: str = DEFAULT_LOADER, engine: str = DEFAULT_ENGINE,
+                    uploaded_by=None) -> Tuple[List[BankUploadBatch], List[str]]:
+    """
+    Queue every mapped statement file in an uploaded zip as its own background batch.
+    Each account's files are queued oldest statement first; the job worker
+    claims them in that order and never runs two for one account at once.
+    Raises ValueError if the files unpack past max_file_size()/max_total_size().
+    Returns (batches, names of files that couldn't be mapped to an account).
+    """
+    sources = collect_sources(file)
+    mapped = [s for s in sources if s.account_number]
+    accounts = {
+        a.account_number: a
+        for a in BankAccount.objects.filter(account_number__in={s.account_number for s in mapped})
+    }
+    profiles = {
+        p.bank_account_id: p
+        for p in BankParsingProfile.objects.filter(bank_account__in=accounts.values())
+    }
+
+    with zipfile.ZipFile(file) as zf:
+        check_sizes(zf, [s.name for s in mapped])
+        # order the files first, then unpack one member at a time, copy it to
+        # storage and queue it before the next; no more than one is held at once
+        first_dates = {}
+        for s in mapped:
+            account = accounts[s.account_number]
+            with _extract(zf, s.name) as content:
+                first_dates[s.name] = first_transaction_date(content, profiles.get(account.pk), _reader_class(s, account))
+
+        batches = []
+        for s in sorted(mapped, key=lambda s: (s.account_number, _statement_order(s, first_dates[s.name]))):
+            with _extract(zf, s.name) as content:
+                batch = BankUploadBatch.objects.create(
+                    bank_account=accounts[s.account_number],
+                    file_name=content.name,
+                    uploaded_by=uploaded_by,
+                    loader=loader,
+                    engine=engine,
+                )
+                batches.append(jobs.enqueue(batch, content))
+    return batches, sorted(s.name for s in sources if not s.account_number)
+
+
+# ---------- import ----------
+
+class StatementImport:
+    """
+    Ingest `sources` with one BankUploadBatch per file. Accounts are ingested
+    concurrently (`db_workers` threads); each account's files run one after
+    another, oldest statement first, and each file streams from the reader
+    into the ingest without being held in memory.
+    `results` lists (source, batch or None) in completion order.
+    """
+
+    def __init__(self, sources: List[StatementSource], *, db_workers: int = 4,
+                 loader: str = DEFAULT_LOADER, engine: str = DEFAULT_ENGINE,
+                 uploaded_by=None, on_batch=None):
+        self.sources = sources
+        self.db_workers = db_workers
+        self.loader = loader
+        self.engine = engine
+        self.uploaded_by = uploaded_by
+        self.on_batch = on_batch
+        self.results: List[Tuple[StatementSource, Optional[BankUploadBatch]]] = []
+
+    def run(self) -> "StatementImport":
+        mapped = [s for s in self.sources if s.account_number]
+        self.results.extend((s, None) for s in self.sources if not s.account_number)
+
+        accounts = {
+            a.account_number: a
+            for a in BankAccount.objects.filter(account_number__in={s.account_number for s in mapped})
+        }
+        profiles = {
+            p.bank_account_id: p
+            for p in BankParsingProfile.objects.filter(bank_account__in=accounts.values())
+        }
+        by_account: Dict[str, List[StatementSource]] = {}
+        for s in mapped:
+            by_account.setdefault(s.account_number, []).append(s)
+
+        with ThreadPoolExecutor(max_workers=self.db_workers) as threads:
+            for f in [
+                threads.submit(self._ingest_account, accounts[number], profiles.get(accounts[number].pk), sources)
+                for number, sources in by_account.items()
+            ]:
+                f.result()
+        return self
+
+    def _ingest_account(self, account: BankAccount, profile: Optional[BankParsingProfile],
+                        sources: List[StatementSource]) -> None:
+        try:
+            first_dates = {}
+            for s in sources:
+                try:
+                    with s.open() as fh:
+                        first_dates[s.name] = first_transaction_date(fh, profile, _reader_class(s, account))
+                except OSError:
+                    first_dates[s.name] = None
+            for s in sorted(sources, key=lambda s: _statement_order(s, first_dates[s.name])):
+                batch = self._ingest(account, profile, s)
+                self.results.append((s, batch))
+                if self.on_batch:
+                    self.on_batch(s, batch)
+        finally:
+            connection.close()  # each thread owns its own connection
+
+    def _ingest(self, account: BankAccount, profile: Optional[BankParsingProfile],
+                source: StatementSource) -> BankUploadBatch:
+        batch = BankUploadBatch.objects.create(
+            bank_account=account,
+            file_name=os.path.basename(source.name),
+            uploaded_by=self.uploaded_by,
+            loader=self.loader,
+            engine=self.engine,
+            status=BankUploadBatch.STATUS_PROCESSING,
+            started_at=timezone.now(),
+        )
+        # one file failing (the run rolls back) must not stop the rest of the import
+        try:
+            with source.open() as fh:
+                rows = open_statement(fh, profile=profile, engine=self.engine,
+                                      reader_class=_reader_class(source, account))
+                result = StatementIngest(batch, loader=self.loader).run(rows)
+            if result.rows_parsed > result.errors:
+                BankParsingProfile.learn(account.pk, rows.layout())
+        except StatementError as e:
+            jobs.mark_failed(batch, e.payload["detail"], errors_count=1)
+        except Exception as e:
+            jobs.mark_failed(batch, f"{type(e).__name__}: {e}")
+        return batch
+
+    # ---------- report ----------
+    def summary(self) -> dict:
+        batches = [b for _s, b in self.results if b is not None]
+        return {
+            "files": len(self.results),
+            "accounts": len({b.bank_account_id for b in batches}),
+            "unmatched_files": sorted(s.name for s, b in self.results if b is None),
+            "failed_files": sum(b.status == BankUploadBatch.STATUS_FAILED for b in batches),
+            "uploaded": sum(b.uploaded_count for b in batches),
+            "skipped_duplicates": sum(b.skipped_count for b in batches),
+            "errors": sum(b.errors_count for b in batches),
+            "continuity_breaks": sum(
+                not (b.balance_continuity_in_file and b.previous_ending_balance_match)
+                for b in batches if b.status == BankUploadBatch.STATUS_COMPLETED
+            ),
+        }
@@ -0,0 +1,96 @@
+# bank_uploads/dedupe.py
+from __future__ import annotations
+
+import math
+import threading
+from collections import OrderedDict
+from typing import Iterable
+
+from .models import BankTransaction
+
+# target false-positive rate; a false positive only costs one extra IN lookup
+FALSE_POSITIVE_RATE = 0.01
+MIN_CAPACITY = 10_000
+# accounts kept in memory per process (least recently used are dropped)
+MAX_CACHED_ACCOUNTS = 64
+
+
+class DedupeKeyFilter:
+    """
+    Bloom filter over BankTransaction.dedupe_key values.
+
+    `key in f` is False  -> the key is definitely not on the account.
+    `key in f` is True   -> maybe; confirm against the database.
+
+    dedupe_key is already a sha256 hex digest, so bit positions are sliced
+    straight out of it instead of hashing again.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = FALSE_POSITIVE_RATE):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        # 64 hex chars give eight 32-bit slices
+        self.hashes = min(8, max(1, round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        size = self.size
+        for i in range(self.hashes):
+            yield int(key[i * 8:i * 8 + 8], 16) % size
+
+    def add(self, key: str) -> None:
+        bits = self.bits
+        for pos in self._positions(key):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def update(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self.add(key)
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    @property
+    def saturated(self) -> bool:
+        return self.count > self.capacity
+
+
+# ---------- per-account cache ----------
+
+_filters: "OrderedDict[int, DedupeKeyFilter]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _build(bank_account_id: int) -> DedupeKeyFilter:
+    qs = BankTransaction.objects.filter(bank_account_id=bank_account_id)
+    f = DedupeKeyFilter(capacity=max(MIN_CAPACITY, qs.count() * 2))
+    f.update(qs.values_list("dedupe_key", flat=True).iterator(chunk_size=10_000))
+    return f
+
+
+def for_account(bank_account_id: int) -> DedupeKeyFilter:
+    """Cached filter for an account, built lazily from its active rows."""
+    bank_account_id = int(bank_account_id)
+    with _lock:
+        f = _filters.get(bank_account_id)
+        if f is not None and not f.saturated:
+            _filters.move_to_end(bank_account_id)
+            return f
+
+    f = _build(bank_account_id)
+    with _lock:
+        _filters[bank_account_id] = f
+        _filters.move_to_end(bank_account_id)
+        while len(_filters) > MAX_CACHED_ACCOUNTS:
+            _filters.popitem(last=False)
+    return f
+
+
+def invalidate(bank_account_id: int) -> None:
+    """Drop the cached filter (e.g. after a restore makes old keys live again)."""
+    with _lock:
+        _filters.pop(int(bank_account_id), None)
@@ -0,0 +1,359 @@
+# bank_uploads/ingest.py
+from __future__ import annotations
+
+import csv
+from contextlib import nullcontext
+from io import StringIO
+from decimal import Decimal
+from itertools import accumulate
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from banks.models import BankAccount
+from . import balances, dedupe
+from .models import BankTransaction, BankUploadBatch
+
+# rows buffered in memory before each flush to the database
+INSERT_BATCH_SIZE = 1000
+
+# duplicate row numbers echoed back to the client (the count is always exact)
+DUPLICATE_ROWS_LIMIT = 1000
+
+
+# ---------- Loaders ----------
+# A loader writes one buffer of prepared BankTransaction objects and returns
+# the set of dedupe_keys that actually landed (conflicts are skipped).
+# Selectable per upload via `loader=`.
+
+def _orm_load(batch: BankUploadBatch, objs: List[BankTransaction]) -> Set[str]:
+    """
+    Multi-row INSERTs through the ORM (works on every backend).
+    Rows arrive already pre-checked, so try a plain bulk_create first; if a
+    key slipped in from another process, redo the buffer with a pre-filter
+    against the account's existing keys (one IN query).
+    """
+    try:
+        with transaction.atomic():
+            BankTransaction.all_objects.bulk_create(objs)
+        return {o.dedupe_key for o in objs}
+    except IntegrityError:
+        pass
+
+    existing = set(
+        BankTransaction.objects
+        .filter(bank_account_id=batch.bank_account_id, dedupe_key__in=[o.dedupe_key for o in objs])
+        .values_list("dedupe_key", flat=True)
+    )
+    fresh = [o for o in objs if o.dedupe_key not in existing]
+    BankTransaction.all_objects.bulk_create(fresh, ignore_conflicts=True)
+    return {o.dedupe_key for o in fresh}
+
+
+# per-row columns shipped through COPY; the rest are constant per batch
+_STAGING_TABLE = "bank_uploads_staging"
+_COPY_COLUMNS = [
+    "transaction_date", "narration", "credit_amount", "debit_amount",
+    "balance_amount", "utr_number", "signed_amount", "dedupe_key",
+]
+
+
+def _pgcopy_load(batch: BankUploadBatch, objs: List[BankTransaction]) -> Set[str]:
+    """
+    COPY the buffer into a temp staging table, then one
+    INSERT ... SELECT ... ON CONFLICT DO NOTHING RETURNING against the partial
+    unique index uniq_txn_per_account_dedupekey_active. PostgreSQL only.
+    """
+    if connection.vendor != "postgresql":
+        return _orm_load(batch, objs)
+
+    table = BankTransaction._meta.db_table
+    buf = StringIO()
+    # everything is quoted; FORCE_NULL below turns "" back into NULL for the
+    # nullable columns while an empty narration stays an empty string
+    writer = csv.writer(buf, quoting=csv.QUOTE_NONNUMERIC, lineterminator="\n")
+    for idx, o in enumerate(objs):
+        writer.writerow([idx] + [getattr(o, c) for c in _COPY_COLUMNS])
+    buf.seek(0)
+
+    with connection.cursor() as cursor:
+        # ON COMMIT DROP: lives for the ingest transaction, reused across flushes
+        cursor.execute(f"""
+            CREATE TEMP TABLE IF NOT EXISTS {_STAGING_TABLE} (
+                row_no integer,
+                transaction_date date,
+                narration text,
+                credit_amount numeric(12, 2),
+                debit_amount numeric(12, 2),
+                balance_amount numeric(12, 2),
+                utr_number varchar(100),
+                signed_amount numeric(12, 2),
+                dedupe_key varchar(64)
+            ) ON COMMIT DROP
+        """)
+        cursor.execute(f"TRUNCATE {_STAGING_TABLE}")
+        cursor.copy_expert(
+            f"COPY {_STAGING_TABLE} (row_no, {', '.join(_COPY_COLUMNS)}) FROM STDIN "
+            "WITH (FORMAT csv, FORCE_NULL (credit_amount, debit_amount, utr_number))",
+            buf,
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (
+                bank_account_id, upload_batch_id, {', '.join(_COPY_COLUMNS)},
+                source, created_at, is_deleted,
+                classification_status, active_classification_count, version
+            )
+            SELECT %s, %s, {', '.join('s.' + c for c in _COPY_COLUMNS)},
+                   'BANK', %s, FALSE,
+                   %s, 0, 0
+            FROM {_STAGING_TABLE} s
+            ORDER BY s.row_no
+            ON CONFLICT (bank_account_id, dedupe_key) WHERE NOT is_deleted DO NOTHING
+            RETURNING dedupe_key
+            """,
+            [batch.bank_account_id, batch.id, timezone.now(), BankTransaction.STATUS_UNCLASSIFIED],
+        )
+        return {key for (key,) in cursor.fetchall()}
+
+
+LOADERS = {
+    "orm": _orm_load,
+    "pgcopy": _pgcopy_load,
+}
+DEFAULT_LOADER = "orm"
+
+
+class BalanceContinuity:
+    """
+    Incremental running-balance check: feed rows in file order and read `.ok`
+    at the end. Same result as checking the whole file at once, O(1) memory.
+    """
+
+    def __init__(self):
+        self.ok = True
+        self.opening_balance = None  # implied balance before the first row
+        self._prev_balance = None
+
+    def feed(self, row: dict) -> None:
+        if self._prev_balance is None:
+            self.opening_balance = row["balance_amount"] - row["signed_amount"]
+            self._prev_balance = self.opening_balance
+        if self._prev_balance + row["signed_amount"] != row["balance_amount"]:
+            self.ok = False
+        self._prev_balance = row["balance_amount"]
+
+    def feed_chunk(self, chunk) -> None:
+        """
+        Feed a parsing.ColumnChunk. With exact paise columns the whole chunk is
+        checked with one running sum (every balance must equal the previous
+        balance plus the signed amounts so far); otherwise row by row.
+        """
+        parsed = [row for _row_no, row in chunk.rows if row is not None]
+        signed, balances = chunk.signed_cents, chunk.balance_cents
+        if parsed and signed is not None and self._prev_balance is None:
+            # the very first row only sets the opening balance
+            self.feed(parsed[0])
+            parsed, signed, balances = parsed[1:], signed[1:], balances[1:]
+        if not parsed:
+            return
+
+        prev = self._prev_balance.scaleb(2) if self._prev_balance is not None else None
+        if signed is None or not (prev.is_finite() and prev == prev.to_integral_value()):
+            for row in parsed:
+                self.feed(row)
+            return
+        if self.ok:
+            running = accumulate(signed, initial=int(prev))
+            next(running)
+            self.ok = all(map(int.__eq__, running, balances))
+        self._prev_balance = parsed[-1]["balance_amount"]
+
+def checked_rows(rows, continuity: BalanceContinuity):
+    """
+    Pass (row_no, row) pairs through while feeding `continuity`; statements
+    that parse in chunks (parsing.ColumnarStatement) are checked a chunk at a time.
+    """
+    if hasattr(rows, "iter_chunks"):
+        for chunk in rows.iter_chunks():
+            continuity.feed_chunk(chunk)
+            yield from chunk.rows
+        return
+    for row_no, row in rows:
+        if row is not None:
+            continuity.feed(row)
+        yield row_no, row
+
+
+class StatementIngest:
+    """
+    Streams parsed statement rows into BankTransaction in fixed-size batches.
+
+    Usage:
+        result = StatementIngest(batch).run(open_statement(file))
+
+    Only one buffer of `batch_size` rows is held at a time, so peak memory does
+    not grow with the file. By default the whole ingest runs in one
+    transaction; `atomic=False` commits buffer by buffer instead so progress
+    (`on_progress`, called after every flush) is visible to other sessions.
+    `loader` picks the write path, see LOADERS.
+
+    Known duplicates are dropped before the loader sees them: the account's
+    dedupe filter clears most rows as definitely new, and only the "maybe
+    seen" ones are confirmed with one IN query per buffer.
+    """
+
+    def __init__(self, batch: BankUploadBatch, *, loader: str = DEFAULT_LOADER,
+                 batch_size: int = INSERT_BATCH_SIZE, atomic: bool = True,
+                 on_progress: Optional[Callable[["StatementIngest"], None]] = None):
+        if loader not in LOADERS:
+            raise ValueError(f"Unknown loader {loader!r}; expected one of: {', '.join(LOADERS)}")
+        self.batch = batch
+        self.bank_account_id = batch.bank_account_id
+        self.batch_size = batch_size
+        self.atomic = atomic
+        self.on_progress = on_progress
+        self._load = LOADERS[loader]
+
+        self.continuity = BalanceContinuity()
+        self.rows_parsed = 0
+        self.created = 0
+        self.skipped = 0
+        self.errors = 0
+        self.duplicate_rows: List[int] = []  # first DUPLICATE_ROWS_LIMIT only
+        # batch totals over the rows that landed; the final balance is the
+        # last one in (transaction_date, file order)
+        self.total_credit = Decimal("0")
+        self.total_debit = Decimal("0")
+        self.final_balance = Decimal("0")
+        self._final_date = None
+        self._buffer: List[Tuple[int, dict]] = []
+
+    # ---------- pipeline ----------
+    def run(self, rows: Iterable[Tuple[int, Optional[dict]]]) -> "StatementIngest":
+        with transaction.atomic() if self.atomic else nullcontext():
+            with transaction.atomic(savepoint=False):
+                self._lock_account()
+                self._seen = dedupe.for_account(self.bank_account_id)
+
+                # must be read before our own rows land
+                state = balances.checkpoint(self.bank_account_id)
+                prev_balance = state.last_balance if state.last_transaction_date else None
+
+            for row_no, row in checked_rows(rows, self.continuity):
+                self.rows_parsed += 1
+                if row is None:
+                    self.errors += 1
+                    continue
+                self._buffer.append((row_no, row))
+                if len(self._buffer) >= self.batch_size:
+                    self._commit_buffer()
+            self._commit_buffer()
+
+            previous_ending_balance_match = True
+            if prev_balance is not None and self.continuity.opening_balance is not None:
+                previous_ending_balance_match = (prev_balance == self.continuity.opening_balance)
+
+            batch = self.batch
+            batch.balance_continuity_in_file = self.continuity.ok
+            batch.previous_ending_balance_match = previous_ending_balance_match
+            batch.rows_parsed = self.rows_parsed
+            batch.uploaded_count = self.created
+            batch.skipped_count = self.skipped
+            batch.errors_count = self.errors
+            batch.total_credit = self.total_credit
+            batch.total_debit = self.total_debit
+            batch.final_balance = self.final_balance
+            batch.status = BankUploadBatch.STATUS_COMPLETED
+            batch.finished_at = timezone.now()
+            batch.save(update_fields=[
+                "rows_parsed", "uploaded_count", "skipped_count", "errors_count",
+                "balance_continuity_in_file", "previous_ending_balance_match",
+                "total_credit", "total_debit", "final_balance",
+                "status", "finished_at",
+            ])
+        return self
+
+    def _lock_account(self) -> None:
+        # serialise ingests per account so the dedupe pre-check and the
+        # previous-balance lookup can't race another upload
+        BankAccount.objects.select_for_update().filter(pk=self.bank_account_id).exists()
+
+    def _commit_buffer(self) -> None:
+        if not self._buffer:
+            return
+        # no-op wrapper inside an outer atomic; its own transaction otherwise
+        with transaction.atomic(savepoint=False):
+            self._lock_account()
+            self._flush()
+        if self.on_progress:
+            self.on_progress(self)
+
+    def _flush(self) -> None:
+        if not self._buffer:
+            return
+
+        objs: List[BankTransaction] = []
+        for _row_no, r in self._buffer:
+            o = BankTransaction(
+                bank_account_id=self.bank_account_id,
+                upload_batch=self.batch,
+                transaction_date=r["transaction_date"],
+                narration=r["narration"],
+                credit_amount=r["credit_amount"],
+                debit_amount=r["debit_amount"],
+                balance_amount=r["balance_amount"],
+                utr_number=r["utr_number"],
+                source="BANK",
+            )
+            # Precompute derived fields since bulk_create skips model.save()
+            o.signed_amount = o._compute_signed_amount()
+            o.dedupe_key = o._build_dedupe_key()
+            objs.append(o)
+
+        # confirm only the rows the filter has (maybe) seen before
+        maybe_seen = [o.dedupe_key for o in objs if o.dedupe_key in self._seen]
+        existing = set()
+        if maybe_seen:
+            existing = set(
+                BankTransaction.objects
+                .filter(bank_account_id=self.bank_account_id, dedupe_key__in=maybe_seen)
+                .values_list("dedupe_key", flat=True)
+            )
+
+        candidates: List[BankTransaction] = []
+        for o in objs:
+            if o.dedupe_key not in existing:
+                existing.add(o.dedupe_key)  # also drops repeats within the buffer
+                candidates.append(o)
+
+        inserted = self._load(self.batch, candidates) if candidates else set()
+        # extra keys only cause false positives, so adding before commit is safe
+        self._seen.update(inserted)
+        if inserted:
+            dates = [o.transaction_date for o in candidates if o.dedupe_key in inserted]
+            balances.refresh(self.bank_account_id, min(dates), max(dates))
+
+        # first occurrence of an inserted key is the row that landed;
+        # everything else was already on the account (or repeated in the file)
+        for (row_no, _r), o in zip(self._buffer, objs):
+            if o.dedupe_key in inserted:
+                inserted.discard(o.dedupe_key)
+                self.created += 1
+                self._add_to_totals(o)
+            else:
+                self.skipped += 1
+                if len(self.duplicate_rows) < DUPLICATE_ROWS_LIMIT:
+                    self.duplicate_rows.append(row_no)
+        self._buffer = []
+
+    def _add_to_totals(self, o: BankTransaction) -> None:
+        # rounded the way the 2dp columns store them, so totals match a SUM()
+        if o.credit_amount is not None:
+            self.total_credit += o._q2(o.credit_amount)
+        if o.debit_amount is not None:
+            self.total_debit += o._q2(o.debit_amount)
+        if self._final_date is None or o.transaction_date >= self._final_date:
+            self._final_date = o.transaction_date
+            self.final_balance = o._q2(o.balance_amount)
@@ -0,0 +1,124 @@
+# bank_uploads/jobs.py
+"""
+DB-backed job queue for background bank uploads.
+
+The BankUploadBatch row is the job: the upload view stores the file and
+leaves the batch PENDING, `manage.py process_bank_uploads` claims pending
+batches with SELECT ... FOR UPDATE SKIP LOCKED and runs the normal ingest
+pipeline, committing buffer by buffer so the status endpoint can report
+progress while it runs.
+"""
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import Optional
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from banks.models import BankAccount
+
+from .ingest import StatementIngest
+from .models import BankParsingProfile, BankUploadBatch
+from . import readers
+from .parsing import CsvStatementReader, StatementError, open_statement
+
+# pending batches looked at per claim attempt
+CLAIM_SCAN = 20
+
+
+def enqueue(batch: BankUploadBatch, file) -> BankUploadBatch:
+    """Persist the uploaded file on the batch and mark it PENDING."""
+    batch.source_file.save(file.name, file, save=False)
+    batch.status = BankUploadBatch.STATUS_PENDING
+    batch.save(update_fields=["source_file", "status"])
+    return batch
+
+
+def claim_next() -> Optional[BankUploadBatch]:
+    """
+    Claim the oldest pending batch. Rows other workers hold are skipped, and
+    so are accounts that already have a batch in flight (keeps per-account
+    order so previous_ending_balance_match stays meaningful).
+    """
+    with transaction.atomic():
+        candidates = (
+            BankUploadBatch.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=BankUploadBatch.STATUS_PENDING)
+            .order_by("created_at")[:CLAIM_SCAN]
+        )
+        for batch in candidates:
+            # the account row lock serialises claimers (and running ingests)
+            # per account; re-check for an in-flight batch once we hold it
+            if not BankAccount.objects.select_for_update(skip_locked=True).filter(pk=batch.bank_account_id).exists():
+                continue
+            if BankUploadBatch.objects.filter(
+                bank_account_id=batch.bank_account_id,
+                status=BankUploadBatch.STATUS_PROCESSING,
+            ).exists():
+                continue
+
+            batch.status = BankUploadBatch.STATUS_PROCESSING
+            batch.started_at = batch.heartbeat_at = timezone.now()
+            batch.save(update_fields=["status", "started_at", "heartbeat_at"])
+            return batch
+    return None
+
+
+def requeue_stale(older_than: timedelta) -> int:
+    """
+    Put batches whose worker died mid-run back in the queue: PROCESSING
+    batches with no heartbeat for older_than. A live worker bumps the
+    heartbeat after every flush, so its batch is never taken from it.
+    """
+    cutoff = timezone.now() - older_than
+    return (
+        BankUploadBatch.objects
+        .filter(status=BankUploadBatch.STATUS_PROCESSING)
+        .filter(Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff))
+        .update(status=BankUploadBatch.STATUS_PENDING)
+    )
+
+
+def _save_progress(ingest: StatementIngest) -> None:
+    BankUploadBatch.objects.filter(pk=ingest.batch.pk).update(
+        rows_parsed=ingest.rows_parsed,
+        uploaded_count=ingest.created,
+        skipped_count=ingest.skipped,
+        errors_count=ingest.errors,
+        heartbeat_at=timezone.now(),
+    )
+
+
+def process(batch: BankUploadBatch) -> BankUploadBatch:
+    """
+    Run the ingest for a claimed batch. Rows committed before a failure stay;
+    re-running the batch is safe because duplicates are skipped.
+    """
+    try:
+        with batch.source_file.open("rb") as fh:
+            profile = BankParsingProfile.objects.filter(bank_account_id=batch.bank_account_id).first()
+            reader_class = readers.reader_for(batch.source_file.name, batch.bank_account.bank_name) or CsvStatementReader
+            rows = open_statement(fh, profile=profile, engine=batch.engine, reader_class=reader_class)
+            result = StatementIngest(
+                batch, loader=batch.loader, atomic=False, on_progress=_save_progress,
+            ).run(rows)
+        if result.rows_parsed > result.errors:
+            BankParsingProfile.learn(batch.bank_account_id, rows.layout())
+    except StatementError as e:
+        mark_failed(batch, e.payload["detail"], errors_count=1)
+    except Exception as e:
+        mark_failed(batch, f"{type(e).__name__}: {e}")
+    return batch
+
+
+def mark_failed(batch: BankUploadBatch, message: str, **counters) -> None:
+    """Record why a batch stopped; `counters` are extra fields to save with it."""
+    batch.status = BankUploadBatch.STATUS_FAILED
+    batch.error_message = message
+    batch.finished_at = timezone.now()
+    for k, v in counters.items():
+        setattr(batch, k, v)
+    batch.save(update_fields=["status", "error_message", "finished_at", *counters])
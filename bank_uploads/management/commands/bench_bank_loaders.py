@@ -0,0 +1,77 @@
+# bank_uploads/management/commands/bench_bank_loaders.py
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from banks.models import BankAccount
+from bank_uploads.ingest import LOADERS, StatementIngest
+from bank_uploads.models import BankUploadBatch
+
+
+class _Rollback(Exception):
+    pass
+
+
+def synthetic_rows(n: int, seed: int = 42):
+    """Yields (row_no, parsed_row) shaped like parsing.iter_parsed_rows output."""
+    rnd = random.Random(seed)
+    balance = Decimal("100000.00")
+    day = date(2020, 1, 1)
+    for i in range(n):
+        amount = Decimal(rnd.randint(1, 5_000_00)) / 100
+        credit = rnd.random() < 0.5
+        balance = balance + amount if credit else balance - amount
+        yield i + 2, {
+            "transaction_date": day,
+            "narration": f"{'NEFT CR' if credit else 'UPI DR'} BENCH {seed} {i}",
+            "credit_amount": amount if credit else None,
+            "debit_amount": None if credit else amount,
+            "balance_amount": balance,
+            "utr_number": f"BENCH{seed}{i:09d}",
+            "signed_amount": amount if credit else -amount,
+        }
+        if i % 50 == 49:
+            day += timedelta(days=1)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the bank upload loaders (rows/sec) on synthetic statements. "
+        "Everything runs inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000)
+        parser.add_argument("--bank-account-id", type=int, help="defaults to the first bank account")
+        parser.add_argument("--loader", action="append", choices=sorted(LOADERS),
+                            help="repeatable; defaults to all loaders")
+        parser.add_argument("--batch-size", type=int, default=None)
+
+    def handle(self, *args, **opts):
+        account = (
+            BankAccount.objects.filter(pk=opts["bank_account_id"]).first()
+            if opts["bank_account_id"] else BankAccount.objects.order_by("id").first()
+        )
+        if not account:
+            raise CommandError("No bank account found; pass --bank-account-id.")
+
+        extra = {"batch_size": opts["batch_size"]} if opts["batch_size"] else {}
+        n = opts["rows"]
+        for loader in opts["loader"] or sorted(LOADERS):
+            started = time.perf_counter()
+            try:
+                with transaction.atomic():
+                    batch = BankUploadBatch.objects.create(bank_account=account, file_name=f"bench-{loader}.csv")
+                    result = StatementIngest(batch, loader=loader, **extra).run(synthetic_rows(n))
+                    elapsed = time.perf_counter() - started
+                    raise _Rollback
+            except _Rollback:
+                pass
+            self.stdout.write(
+                f"{loader:>8}: {n} rows in {elapsed:.2f}s "
+                f"({n / elapsed:,.0f} rows/s, inserted={result.created}, skipped={result.skipped})"
+            )
@@ -0,0 +1,91 @@
+# bank_uploads/management/commands/bench_statement_parsing.py
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from bank_uploads.ingest import BalanceContinuity, checked_rows
+from bank_uploads.parsing import ENGINES, open_statement
+
+
+def write_synthetic_csv(path: str, n: int, seed: int = 42) -> None:
+    """A bank-style statement CSV with a consistent running balance."""
+    rnd = random.Random(seed)
+    balance = Decimal("100000.00")
+    day = date(2020, 1, 1)
+    with open(path, "w", encoding="utf-8", newline="") as fh:
+        fh.write("Date,Narration,Chq./Ref.No.,Withdrawal Amt.,Deposit Amt.,Closing Balance\n")
+        for i in range(n):
+            amount = Decimal(rnd.randint(1, 5_000_00)) / 100
+            credit = rnd.random() < 0.5
+            balance = balance + amount if credit else balance - amount
+            amt = f'"{amount:,}"'  # thousands separators, so quoted
+            fh.write(
+                f"{day:%d/%m/%Y},{'NEFT CR' if credit else 'UPI DR'} BENCH {i},BENCH{seed}{i:09d},"
+                f"{'' if credit else amt},{amt if credit else ''},\"{balance:,}\"\n"
+            )
+            if i % 50 == 49:
+                day += timedelta(days=1)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the statement parsing engines (parse + balance continuity, "
+        "no database writes) on synthetic CSV statements."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, action="append",
+                            help="repeatable; defaults to 100000 and 1000000")
+        parser.add_argument("--engine", action="append", choices=sorted(ENGINES),
+                            help="repeatable; defaults to all engines")
+        parser.add_argument("--check", action="store_true",
+                            help="also verify every engine yields the same rows as the row engine")
+
+    def handle(self, *args, **opts):
+        engines = opts["engine"] or sorted(ENGINES)
+        for n in opts["rows"] or [100_000, 1_000_000]:
+            if n < 1:
+                raise CommandError("--rows must be positive")
+            fd, path = tempfile.mkstemp(suffix=".csv")
+            os.close(fd)
+            try:
+                write_synthetic_csv(path, n)
+                self.stdout.write(f"{n} rows ({os.path.getsize(path) / 1_048_576:.1f} MiB)")
+                for engine in engines:
+                    self._time(path, n, engine)
+                if opts["check"]:
+                    self._check(path, engines)
+            finally:
+                os.unlink(path)
+
+    def _time(self, path: str, n: int, engine: str) -> None:
+        with open(path, "rb") as fh:
+            started = time.perf_counter()
+            continuity = BalanceContinuity()
+            errors = 0
+            for _row_no, row in checked_rows(open_statement(File(fh), engine=engine), continuity):
+                if row is None:
+                    errors += 1
+            elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"  {engine:>8}: {elapsed:.2f}s ({n / elapsed:,.0f} rows/s, "
+            f"errors={errors}, continuity={continuity.ok})"
+        )
+
+    def _check(self, path: str, engines) -> None:
+        with open(path, "rb") as a, open(path, "rb") as b:
+            for engine in engines:
+                if engine == "row":
+                    continue
+                a.seek(0)
+                reference = open_statement(File(a), engine="row")
+                for (n1, r1), (n2, r2) in zip(reference, open_statement(File(b), engine=engine)):
+                    if n1 != n2 or r1 != r2:
+                        raise CommandError(f"{engine}: row {n1} differs from the row engine")
+                self.stdout.write(f"  {engine:>8}: identical to row engine")
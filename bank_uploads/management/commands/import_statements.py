@@ -0,0 +1,83 @@
+# bank_uploads/management/commands/import_statements.py
+import json
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from bank_uploads.bulk_import import StatementImport, collect_sources
+from bank_uploads.ingest import DEFAULT_LOADER, LOADERS
+from bank_uploads.parsing import DEFAULT_ENGINE, ENGINES
+
+
+class Command(BaseCommand):
+    help = (
+        "Import a directory or zip of bank statement files (CSV/XLSX), one upload batch per file. "
+        "Files map to accounts via manifest.csv (file,account_number) or by name "
+        "(<account_number>/x.csv, <account_number>_x.csv). Accounts are imported "
+        "concurrently; each account's files are streamed in oldest first, one at a time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="directory or .zip of statement files")
+        parser.add_argument("--manifest", help="CSV with file,account_number columns (overrides manifest.csv)")
+        parser.add_argument("--db-workers", type=int, default=4, help="accounts inserted concurrently")
+        parser.add_argument("--loader", choices=sorted(LOADERS), default=DEFAULT_LOADER)
+        parser.add_argument("--engine", choices=sorted(ENGINES), default=DEFAULT_ENGINE)
+        parser.add_argument("--user", help="username recorded as uploaded_by")
+        parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+
+    def handle(self, *args, **opts):
+        uploaded_by = None
+        if opts["user"]:
+            User = get_user_model()
+            uploaded_by = User.objects.filter(**{User.USERNAME_FIELD: opts["user"]}).first()
+            if uploaded_by is None:
+                raise CommandError(f"No user {opts['user']!r}.")
+
+        try:
+            sources = collect_sources(opts["path"], manifest=opts["manifest"])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        if not sources:
+            raise CommandError("No statement files found.")
+
+        lock = threading.Lock()
+
+        def report(source, batch):
+            line = (
+                f"{source.name} -> {source.account_number}: {batch.status} "
+                f"uploaded={batch.uploaded_count} skipped={batch.skipped_count} errors={batch.errors_count}"
+            )
+            if batch.error_message:
+                line += f" - {batch.error_message}"
+            elif not (batch.balance_continuity_in_file and batch.previous_ending_balance_match):
+                line += " (needs review)"
+            with lock:
+                self.stdout.write(line)
+
+        started = time.perf_counter()
+        result = StatementImport(
+            sources,
+            db_workers=max(1, opts["db_workers"]),
+            loader=opts["loader"],
+            engine=opts["engine"],
+            uploaded_by=uploaded_by,
+            on_batch=None if opts["json"] else report,
+        ).run()
+        summary = result.summary()
+        summary["seconds"] = round(time.perf_counter() - started, 2)
+
+        if opts["json"]:
+            self.stdout.write(json.dumps(summary, indent=2))
+            return
+        for name in summary["unmatched_files"]:
+            self.stdout.write(self.style.WARNING(f"{name}: no matching bank account, skipped"))
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['files']} file(s), {summary['accounts']} account(s) in {summary['seconds']}s: "
+            f"uploaded={summary['uploaded']} skipped_duplicates={summary['skipped_duplicates']} "
+            f"errors={summary['errors']} failed_files={summary['failed_files']} "
+            f"unmatched_files={len(summary['unmatched_files'])} "
+            f"continuity_breaks={summary['continuity_breaks']}"
+        ))
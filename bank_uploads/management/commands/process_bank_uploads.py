@@ -0,0 +1,66 @@
+# bank_uploads/management/commands/process_bank_uploads.py
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from bank_uploads import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Process background bank uploads (batches left PENDING by upload/?async=1). "
+        "Safe to run several instances; jobs are claimed with SKIP LOCKED."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=2, help="worker threads in this process")
+        parser.add_argument("--poll-interval", type=float, default=2.0, help="seconds to sleep when idle")
+        parser.add_argument("--once", action="store_true", help="drain the queue and exit")
+        parser.add_argument("--requeue-stale", type=int, default=30, metavar="MINUTES",
+                            help="requeue PROCESSING batches without a heartbeat for this long at startup (0 = off)")
+
+    def handle(self, *args, **opts):
+        if opts["requeue_stale"]:
+            n = jobs.requeue_stale(timedelta(minutes=opts["requeue_stale"]))
+            if n:
+                self.stdout.write(f"Requeued {n} stale batch(es).")
+
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=self._work, args=(stop, opts), name=f"bank-upload-{i}", daemon=True)
+            for i in range(max(1, opts["workers"]))
+        ]
+        for t in threads:
+            t.start()
+        try:
+            for t in threads:
+                while t.is_alive():
+                    t.join(timeout=1)
+        except KeyboardInterrupt:
+            stop.set()
+            for t in threads:
+                t.join()
+
+    def _work(self, stop, opts):
+        try:
+            while not stop.is_set():
+                batch = jobs.claim_next()
+                if batch is None:
+                    if opts["once"]:
+                        return
+                    stop.wait(opts["poll_interval"])
+                    continue
+
+                started = time.perf_counter()
+                jobs.process(batch)
+                self.stdout.write(
+                    f"[{threading.current_thread().name}] {batch.file_name} ({batch.id}): "
+                    f"{batch.status} uploaded={batch.uploaded_count} skipped={batch.skipped_count} "
+                    f"errors={batch.errors_count} in {time.perf_counter() - started:.1f}s"
+                    + (f" - {batch.error_message}" if batch.error_message else "")
+                )
+        finally:
+            connection.close()  # each thread owns its own connection
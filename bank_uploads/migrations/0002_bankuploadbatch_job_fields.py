@@ -0,0 +1,62 @@
+# Generated by Django 5.2.4 on 2026-10-18 00:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_existing_completed(apps, schema_editor):
+    # every batch created before background jobs existed was processed inline
+    BankUploadBatch = apps.get_model('bank_uploads', 'BankUploadBatch')
+    BankUploadBatch.objects.update(status='COMPLETED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank_uploads', '0001_initial'),
+        ('banks', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bankuploadbatch',
+            name='error_message',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='bankuploadbatch',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='bankuploadbatch',
+            name='loader',
+            field=models.CharField(default='orm', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='bankuploadbatch',
+            name='rows_parsed',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='bankuploadbatch',
+            name='source_file',
+            field=models.FileField(blank=True, null=True, upload_to='bank_upload_files/'),
+        ),
+        migrations.AddField(
+            model_name='bankuploadbatch',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='bankuploadbatch',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('PROCESSING', 'Processing'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='PENDING', max_length=12),
+        ),
+        migrations.AddIndex(
+            model_name='bankuploadbatch',
+            index=models.Index(fields=['status', 'created_at'], name='bank_upload_status_03b80f_idx'),
+        ),
+        migrations.RunPython(mark_existing_completed, migrations.RunPython.noop),
+    ]
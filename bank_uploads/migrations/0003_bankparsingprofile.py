@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 00:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank_uploads', '0002_bankuploadbatch_job_fields'),
+        ('banks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BankParsingProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delimiter', models.CharField(default=',', max_length=1)),
+                ('quotechar', models.CharField(default='"', max_length=1)),
+                ('doublequote', models.BooleanField(default=True)),
+                ('header_map', models.JSONField(default=dict)),
+                ('date_format', models.CharField(blank=True, default='', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('bank_account', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='parsing_profile', to='banks.bankaccount')),
+            ],
+        ),
+    ]
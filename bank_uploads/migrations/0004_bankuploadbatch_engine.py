@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 00:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank_uploads', '0003_bankparsingprofile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bankuploadbatch',
+            name='engine',
+            field=models.CharField(default='row', max_length=10),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.4 on 2026-10-18 00:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank_uploads', '0004_bankuploadbatch_engine'),
+        ('banks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BankBalanceState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_transaction_date', models.DateField(blank=True, null=True)),
+                ('last_balance', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('bank_account', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='balance_state', to='banks.bankaccount')),
+                ('last_transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='bank_uploads.banktransaction')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BalanceBreak',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('BALANCE', 'Balance break'), ('DATE_GAP', 'Date gap')], max_length=10)),
+                ('transaction_date', models.DateField()),
+                ('previous_date', models.DateField()),
+                ('expected_balance', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('actual_balance', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('gap_days', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('bank_account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_breaks', to='banks.bankaccount')),
+                ('previous_transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='bank_uploads.banktransaction')),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='bank_uploads.banktransaction')),
+            ],
+            options={
+                'ordering': ['bank_account', 'transaction_date', 'id'],
+                'indexes': [models.Index(fields=['bank_account', 'transaction_date'], name='bank_upload_bank_ac_3361f5_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-18 00:57
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_totals(apps, schema_editor):
+    BankUploadBatch = apps.get_model('bank_uploads', 'BankUploadBatch')
+    BankTransaction = apps.get_model('bank_uploads', 'BankTransaction')
+    for batch in BankUploadBatch.objects.only('id').iterator():
+        active = BankTransaction.objects.filter(upload_batch_id=batch.id, is_deleted=False)
+        aggs = active.aggregate(total_credit=Sum('credit_amount'), total_debit=Sum('debit_amount'))
+        last_tx = active.order_by('-transaction_date', '-created_at', '-id').first()
+        BankUploadBatch.objects.filter(pk=batch.id).update(
+            total_credit=aggs['total_credit'] or Decimal('0'),
+            total_debit=aggs['total_debit'] or Decimal('0'),
+            final_balance=last_tx.balance_amount if last_tx else Decimal('0'),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank_uploads', '0005_balance_state_and_breaks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bankuploadbatch',
+            name='final_balance',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='bankuploadbatch',
+            name='total_credit',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=16),
+        ),
+        migrations.AddField(
+            model_name='bankuploadbatch',
+            name='total_debit',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=16),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
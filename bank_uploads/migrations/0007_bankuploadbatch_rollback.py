@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank_uploads', '0006_bankuploadbatch_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bankuploadbatch',
+            name='rolled_back_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='bankuploadbatch',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('PROCESSING', 'Processing'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed'), ('ROLLED_BACK', 'Rolled back')], default='PENDING', max_length=12),
+        ),
+    ]
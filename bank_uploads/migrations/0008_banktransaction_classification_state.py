@@ -0,0 +1,63 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:12
+
+from django.db import migrations, models
+from django.db.models import Case, Count, IntegerField, Max, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+
+def backfill_classification_state(apps, schema_editor):
+    BankTransaction = apps.get_model('bank_uploads', 'BankTransaction')
+    Classification = apps.get_model('tx_classify', 'Classification')
+    active = (Classification.objects
+              .filter(bank_transaction=OuterRef('pk'), is_active_classification=True)
+              .order_by()
+              .values('bank_transaction'))
+    classified = BankTransaction.objects.filter(
+        pk__in=Classification.objects.filter(is_active_classification=True).values('bank_transaction')
+    )
+    classified.update(
+        active_classification_count=Coalesce(
+            Subquery(active.annotate(n=Count('pk')).values('n'), output_field=IntegerField()), 0
+        ),
+        last_classified_at=Subquery(active.annotate(last=Max('created_at')).values('last')),
+    )
+    BankTransaction.objects.filter(active_classification_count__gt=0).update(classification_status=Case(
+        When(active_classification_count=1, then=Value('CLASSIFIED')),
+        default=Value('SPLIT'),
+    ))
+
+
+class Migration(migrations.Migration):
+    # PostgreSQL won't build the index in the transaction that ran the backfill
+    # ("pending trigger events"), so operations run outside one migration
+    # transaction; the backfill gets its own through RunPython(atomic=True)
+    atomic = False
+
+    dependencies = [
+        ('bank_uploads', '0007_bankuploadbatch_rollback'),
+        ('banks', '0001_initial'),
+        ('tx_classify', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='banktransaction',
+            name='active_classification_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='banktransaction',
+            name='classification_status',
+            field=models.CharField(choices=[('UNCLASSIFIED', 'Unclassified'), ('CLASSIFIED', 'Classified'), ('SPLIT', 'Split')], default='UNCLASSIFIED', max_length=12),
+        ),
+        migrations.AddField(
+            model_name='banktransaction',
+            name='last_classified_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_classification_state, migrations.RunPython.noop, atomic=True),
+        migrations.AddIndex(
+            model_name='banktransaction',
+            index=models.Index(condition=models.Q(('classification_status', 'UNCLASSIFIED'), ('is_deleted', False)), fields=['bank_account', '-transaction_date', '-created_at', '-id'], name='bank_txn_unclassified_idx'),
+        ),
+    ]
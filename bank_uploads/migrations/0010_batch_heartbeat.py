@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank_uploads', '0009_banktransaction_version_claims'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bankuploadbatch',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
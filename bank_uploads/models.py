@@ -1,17 +1,29 @@
 # bank_uploads/models.py
 from __future__ import annotations
 
+import csv
 from decimal import Decimal, ROUND_HALF_UP
 import hashlib
 import uuid
 
 from django.conf import settings
-from django.db import models
-from django.db.models import Q
+from django.db import connection, models, transaction
+from django.db.models import F, Max, Min, Q
 from django.utils import timezone
 
 
-class ActiveTransactionManager(models.Manager):
+class BankTransactionQuerySet(models.QuerySet):
+    def soft_delete(self, **fields) -> int:
+        """
+        Set-based soft delete: one UPDATE for the whole queryset, no per-row
+        save(); `fields` are set in the same statement. Returns the number of
+        rows deleted. Callers refresh balance breaks and batch totals
+        themselves (see BankUploadBatch.rollback).
+        """
+        return self.filter(is_deleted=False).update(is_deleted=True, deleted_at=timezone.now(), **fields)
+
+
+class ActiveTransactionManager(models.Manager.from_queryset(BankTransactionQuerySet)):
     def get_queryset(self):
         return super().get_queryset().filter(is_deleted=False)
 
@@ -20,7 +32,21 @@ class BankUploadBatch(models.Model):
     """
     One row per uploaded file (batch).
     Drives the 'Recent Uploads' table and lets us show filename & counts.
+    Also doubles as the job row for background uploads (status/progress).
     """
+    STATUS_PENDING = 'PENDING'
+    STATUS_PROCESSING = 'PROCESSING'
+    STATUS_COMPLETED = 'COMPLETED'
+    STATUS_FAILED = 'FAILED'
+    STATUS_ROLLED_BACK = 'ROLLED_BACK'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+        (STATUS_ROLLED_BACK, 'Rolled back'),
+    ]
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     bank_account = models.ForeignKey(
         'banks.BankAccount',
@@ -44,19 +70,112 @@ class BankUploadBatch(models.Model):
     balance_continuity_in_file = models.BooleanField(default=True)
     previous_ending_balance_match = models.BooleanField(default=True)
 
+    # background processing (see bank_uploads/jobs.py)
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    source_file = models.FileField(upload_to='bank_upload_files/', null=True, blank=True)
+    loader = models.CharField(max_length=10, default='orm')
+    engine = models.CharField(max_length=10, default='row')
+    rows_parsed = models.PositiveIntegerField(default=0)
+
+    # totals over the batch's active transactions, stored at ingest (see refresh_totals)
+    total_credit = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0'))
+    total_debit = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0'))
+    final_balance = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0'))
+    error_message = models.TextField(blank=True, default='')
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # bumped by the background worker after every flush; see jobs.requeue_stale
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    rolled_back_at = models.DateTimeField(null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['bank_account', 'created_at']),
+            models.Index(fields=['status', 'created_at']),
         ]
 
     def __str__(self):
         return f"Batch {self.id} | {self.file_name} | {self.uploaded_count} txns"
 
+    def refresh_totals(self, save: bool = True) -> None:
+        """Recompute the stored totals from the batch's active transactions."""
+        active = BankTransaction.objects.filter(upload_batch=self)
+        aggs = active.aggregate(total_credit=models.Sum('credit_amount'), total_debit=models.Sum('debit_amount'))
+        last_tx = active.order_by('-transaction_date', '-created_at', '-id').only('balance_amount').first()
+        self.total_credit = aggs['total_credit'] or Decimal('0')
+        self.total_debit = aggs['total_debit'] or Decimal('0')
+        self.final_balance = last_tx.balance_amount if last_tx else Decimal('0')
+        if save:
+            self.save(update_fields=['total_credit', 'total_debit', 'final_balance'])
+
+    def rollback(self) -> dict:
+        """
+        Undo the upload: deactivate the classifications of its active
+        transactions and soft-delete those transactions, one UPDATE each,
+        then re-derive balance breaks over the batch's date range and zero
+        the counters/totals. Returns how many rows were touched.
+        """
+        from banks.models import BankAccount
+        from reports import ledger
+        from tx_classify.models import Classification
+        from . import balances
+
+        with transaction.atomic():
+            # same lock order as uploads: account first, then the batch
+            BankAccount.objects.select_for_update().filter(pk=self.bank_account_id).exists()
+            BankUploadBatch.objects.select_for_update().filter(pk=self.pk).exists()
+
+            active = BankTransaction.objects.filter(upload_batch=self)
+            span = active.aggregate(date_from=Min('transaction_date'), date_to=Max('transaction_date'))
+            # set-based throughout: no id list is loaded into Python. UPDATE ... FROM
+            # rather than IN (subquery): a just-uploaded batch isn't in the planner's
+            # statistics yet, and the IN form then re-scans the batch per classification
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE {Classification._meta.db_table} c SET is_active_classification = FALSE"
+                    f" FROM {BankTransaction._meta.db_table} t"
+                    " WHERE t.id = c.bank_transaction_id AND t.upload_batch_id = %s"
+                    " AND NOT t.is_deleted AND c.is_active_classification",
+                    [self.pk],
+                )
+                classifications = cursor.rowcount
+            ledger.remove_bank_transactions(active)
+            # every classification is now inactive, so reset the denormalised state in the same UPDATE
+            transactions = active.soft_delete(
+                classification_status=BankTransaction.STATUS_UNCLASSIFIED,
+                active_classification_count=0,
+                last_classified_at=None,
+                version=F('version') + 1,
+                claimed_by=None,
+                claimed_until=None,
+            )
+            if transactions:
+                balances.refresh(self.bank_account_id, span['date_from'], span['date_to'])
+
+            self.status = self.STATUS_ROLLED_BACK
+            self.rolled_back_at = timezone.now()
+            self.uploaded_count = 0
+            self.refresh_totals(save=False)
+            self.save(update_fields=[
+                'status', 'rolled_back_at', 'uploaded_count',
+                'total_credit', 'total_debit', 'final_balance',
+            ])
+        return {'transactions': transactions, 'classifications': classifications}
+
 
 class BankTransaction(models.Model):
+    STATUS_UNCLASSIFIED = 'UNCLASSIFIED'
+    STATUS_CLASSIFIED = 'CLASSIFIED'
+    STATUS_SPLIT = 'SPLIT'
+    CLASSIFICATION_STATUS_CHOICES = [
+        (STATUS_UNCLASSIFIED, 'Unclassified'),
+        (STATUS_CLASSIFIED, 'Classified'),
+        (STATUS_SPLIT, 'Split'),
+    ]
+
     bank_account = models.ForeignKey(
         'banks.BankAccount',
         on_delete=models.CASCADE,
@@ -89,13 +208,37 @@ class BankTransaction(models.Model):
     source = models.CharField(max_length=10, default='BANK')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # denormalised from active tx_classify classifications; maintained by
+    # tx_classify.services.refresh_classification_state() wherever those change
+    classification_status = models.CharField(
+        max_length=12, choices=CLASSIFICATION_STATUS_CHOICES, default=STATUS_UNCLASSIFIED
+    )
+    active_classification_count = models.PositiveIntegerField(default=0)
+    last_classified_at = models.DateTimeField(null=True, blank=True)
+
+    # optimistic concurrency: bumped with every change to the classification state,
+    # so a client can send the version it read and get a 409 if it moved on
+    version = models.PositiveIntegerField(default=0)
+    # work queue (tx_classify claim/): the row is reserved for claimed_by until
+    # claimed_until; an expired claim is simply ignored. No index: claims are
+    # only looked up among rows the inbox index already narrows down.
+    claimed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='claimed_bank_transactions',
+        db_index=False,
+    )
+    claimed_until = models.DateTimeField(null=True, blank=True)
+
     # Soft delete support
     is_deleted = models.BooleanField(default=False)
     deleted_at = models.DateTimeField(null=True, blank=True)
 
     # Managers
-    objects = ActiveTransactionManager()   # Excludes soft-deleted
-    all_objects = models.Manager()         # Includes soft-deleted
+    objects = ActiveTransactionManager()               # Excludes soft-deleted
+    all_objects = BankTransactionQuerySet.as_manager()  # Includes soft-deleted
 
     class Meta:
         ordering = ['-transaction_date', '-created_at']
@@ -103,6 +246,12 @@ class BankTransaction(models.Model):
             models.Index(fields=['bank_account']),
             models.Index(fields=['bank_account', 'transaction_date']),
             models.Index(fields=['utr_number']),
+            # the unclassified inbox: one account's unclassified rows, newest first
+            models.Index(
+                fields=['bank_account', '-transaction_date', '-created_at', '-id'],
+                condition=Q(is_deleted=False, classification_status='UNCLASSIFIED'),
+                name='bank_txn_unclassified_idx',
+            ),
         ]
         # Prevent duplicates per bank account (ignore soft-deleted rows)
         constraints = [
@@ -139,14 +288,23 @@ class BankTransaction(models.Model):
 
     # ---------- soft delete helpers ----------
     def soft_delete(self):
+        from . import balances
+
         self.is_deleted = True
         self.deleted_at = timezone.now()
         self.save(update_fields=['is_deleted', 'deleted_at'])
+        balances.refresh_for([self])
+        self.upload_batch.refresh_totals()
 
     def restore(self):
+        from . import balances, dedupe
+
         self.is_deleted = False
         self.deleted_at = None
         self.save(update_fields=['is_deleted', 'deleted_at'])
+        dedupe.invalidate(self.bank_account_id)
+        balances.refresh_for([self])
+        self.upload_batch.refresh_totals()
 
     # ---------- lifecycle ----------
     def save(self, *args, **kwargs):
@@ -158,3 +316,105 @@ class BankTransaction(models.Model):
     def __str__(self):
         amt = self.credit_amount or self.debit_amount
         return f"{self.transaction_date} | {self.narration[:40]} | ₹{amt}"
+
+
+class BankParsingProfile(models.Model):
+    """
+    What we learned about an account's statement layout on its last good
+    upload: CSV dialect, which file column feeds each canonical field, and
+    the date format that matched. Lets later uploads skip sniffing and
+    header matching and go straight to the right date parser.
+    """
+    bank_account = models.OneToOneField(
+        'banks.BankAccount', on_delete=models.CASCADE, related_name='parsing_profile'
+    )
+    delimiter = models.CharField(max_length=1, default=',')
+    quotechar = models.CharField(max_length=1, default='"')
+    doublequote = models.BooleanField(default=True)
+    header_map = models.JSONField(default=dict)   # canonical -> column as it appears in the file
+    date_format = models.CharField(max_length=20, blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Parsing profile | {self.bank_account_id} | {self.delimiter!r} {self.date_format}"
+
+    def csv_dialect(self):
+        return type('ProfileDialect', (csv.excel,), {
+            'delimiter': self.delimiter,
+            'quotechar': self.quotechar,
+            'doublequote': self.doublequote,
+        })
+
+    def match(self, fieldnames) -> dict | None:
+        """The stored mapping if every column it names is in `fieldnames`, else None."""
+        present = set(fieldnames or [])
+        if self.header_map and all(col in present for col in self.header_map.values()):
+            return dict(self.header_map)
+        return None
+
+    @classmethod
+    def learn(cls, bank_account_id: int, layout: dict) -> None:
+        """Store a statement's detected layout (parsing.Statement.layout()); writes only when it changed."""
+        profile = cls.objects.filter(bank_account_id=bank_account_id).first()
+        if profile and all(getattr(profile, k) == v for k, v in layout.items()):
+            return
+        cls.objects.update_or_create(bank_account_id=bank_account_id, defaults=layout)
+
+
+class BankBalanceState(models.Model):
+    """
+    Per-account checkpoint: the latest active transaction in history order
+    (transaction_date, created_at, id) and its balance. Kept current by
+    balances.refresh() so uploads don't have to look the tail up each time.
+    """
+    bank_account = models.OneToOneField(
+        'banks.BankAccount', on_delete=models.CASCADE, related_name='balance_state'
+    )
+    last_transaction = models.ForeignKey(
+        BankTransaction, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    last_transaction_date = models.DateField(null=True, blank=True)
+    last_balance = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Balance state | {self.bank_account_id} | {self.last_transaction_date} {self.last_balance}"
+
+
+class BalanceBreak(models.Model):
+    """
+    A discontinuity between two consecutive active transactions of an
+    account: the running balance doesn't add up, or too many days passed.
+    Attached to the later transaction; maintained by balances.refresh().
+    """
+    KIND_BALANCE = 'BALANCE'
+    KIND_DATE_GAP = 'DATE_GAP'
+    KIND_CHOICES = [
+        (KIND_BALANCE, 'Balance break'),
+        (KIND_DATE_GAP, 'Date gap'),
+    ]
+
+    bank_account = models.ForeignKey(
+        'banks.BankAccount', on_delete=models.CASCADE, related_name='balance_breaks'
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    transaction = models.ForeignKey(BankTransaction, on_delete=models.CASCADE, related_name='+')
+    previous_transaction = models.ForeignKey(BankTransaction, on_delete=models.CASCADE, related_name='+')
+    transaction_date = models.DateField()
+    previous_date = models.DateField()
+    expected_balance = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    actual_balance = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    gap_days = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['bank_account', 'transaction_date', 'id']
+        indexes = [
+            models.Index(fields=['bank_account', 'transaction_date']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} | {self.bank_account_id} | {self.previous_date} -> {self.transaction_date}"
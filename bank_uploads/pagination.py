@@ -0,0 +1,94 @@
+# bank_uploads/pagination.py
+"""
+Keyset (cursor) pagination helpers.
+
+Instead of OFFSET, a page starts right after the last row of the previous
+one: WHERE (a, b, id) > (last_a, last_b, last_id) in the requested order,
+which stays an index range scan however deep the client pages. Cursors are
+opaque URL-safe strings holding the ordering values of that last row.
+
+    rows, next_cursor = keyset_page(qs, ("-transaction_date", "-created_at", "-id"),
+                                    cursor=request.query_params.get("cursor"), limit=100)
+
+The ordering must end in a unique field (normally id) so no row is skipped
+or repeated between pages, and its fields must be non-nullable.
+"""
+from __future__ import annotations
+
+import base64
+import json
+from typing import List, Optional, Sequence, Tuple
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q, QuerySet
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values: Sequence) -> str:
+    raw = json.dumps([None if v is None else str(v) for v in values]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, count: int) -> List[str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidCursor("Invalid cursor.")
+    # encode_cursor only ever writes strings (ordering fields are non-null)
+    if not isinstance(values, list) or len(values) != count or not all(isinstance(v, str) for v in values):
+        raise InvalidCursor("Invalid cursor.")
+    return values
+
+
+def parse_limit(value, default: int = DEFAULT_PAGE_SIZE, maximum: int = MAX_PAGE_SIZE) -> int:
+    """Page size from a query param; falls back to `default`, capped at `maximum`."""
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(limit, maximum))
+
+
+def _after(ordering: Sequence[str], values: Sequence) -> Q:
+    """Rows strictly after `values` in `ordering` (lexicographic, per-field direction)."""
+    q = Q()
+    for i in reversed(range(len(ordering))):
+        field = ordering[i].lstrip("-")
+        op = "lt" if ordering[i].startswith("-") else "gt"
+        step = Q(**{f"{field}__{op}": values[i]})
+        if i < len(ordering) - 1:
+            step |= Q(**{field: values[i]}) & q
+        q = step
+    return q
+
+
+def keyset_page(qs: QuerySet, ordering: Sequence[str], cursor: Optional[str] = None,
+                limit: int = DEFAULT_PAGE_SIZE) -> Tuple[list, Optional[str]]:
+    """
+    One page of `qs` in `ordering` after `cursor` (None = first page).
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    Raises InvalidCursor for a cursor that doesn't decode for this ordering.
+    """
+    model = qs.model
+    fields = [o.lstrip("-") for o in ordering]
+    if cursor:
+        raw = decode_cursor(cursor, len(fields))
+        try:
+            values = [model._meta.get_field(f).to_python(v) for f, v in zip(fields, raw)]
+            qs = qs.filter(_after(ordering, values))
+        except (ValidationError, ValueError, TypeError):
+            raise InvalidCursor("Invalid cursor.")
+
+    rows = list(qs.order_by(*ordering)[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([getattr(last, model._meta.get_field(f).attname) for f in fields])
@@ -0,0 +1,582 @@
+# bank_uploads/parsing.py
+from __future__ import annotations
+
+import codecs
+import csv
+import re
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+# ---------- Header mapping & parsing helpers ----------
+
+# canonical -> list of synonyms (lowercased, trimmed)
+HEADER_MAP: Dict[str, List[str]] = {
+    # dates
+    "date": [
+        "date", "transaction date", "value date", "posting date",
+        "tran date", "txn date", "value dt", "val dt",
+    ],
+    # narration/desc
+    "narration": [
+        "narration", "description", "details", "particulars", "remarks", "transaction remarks",
+        "narration/description",
+    ],
+    # amounts split
+    "credit": [
+        "credit", "cr", "deposit", "credit amount", "cr amount",
+        "deposit amt.", "deposit amt", "deposit amount", "deposit (cr)",
+    ],
+    "debit": [
+        "debit", "dr", "withdrawal", "debit amount", "dr amount",
+        "withdrawal amt.", "withdrawal amt", "withdrawal amount", "withdrawal (dr)",
+    ],
+    # running/closing balance
+    "balance": [
+        "balance", "running balance", "closing balance", "available balance",
+        "balance amt.", "balance amount", "closing bal", "available bal",
+    ],
+    # references / UTR / cheque
+    "utr": [
+        "utr", "utr number", "utr no", "utr#", "reference", "transaction id",
+        "ref no", "chq/ref no", "cheque/ref no", "reference no", "ref#", "rrn", "upi ref no",
+    ],
+    # optional: some banks give Type + Amount instead of separate debit/credit
+    "type": ["type", "txn type", "transaction type", "dr/cr", "cr/dr"],
+    "amount": ["amount", "txn amount", "transaction amount", "amt."],
+}
+
+REQUIRED_COLUMNS = {"date", "narration", "balance"}
+
+DATE_FORMATS = [
+    "%d-%b-%y",  # 06-Aug-25
+    "%d-%b-%Y",  # 06-Aug-2025
+    "%d/%m/%Y",
+    "%Y-%m-%d",
+    "%d-%m-%Y",
+    "%d.%m.%Y",
+]
+
+# streaming read size for uploaded statements
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class StatementError(Exception):
+    """
+    File-level problem (unreadable file, missing columns).
+    `payload` is what the upload endpoints send back with a 400.
+    """
+
+    def __init__(self, detail: str, **extra):
+        super().__init__(detail)
+        self.payload = {"detail": detail, **extra}
+
+
+def _norm(s: Optional[str]) -> str:
+    return (s or "").strip().lower()
+
+# alias -> [(canonical, rank)], compiled once; lower rank = listed earlier
+_ALIAS_INDEX: Dict[str, List[Tuple[str, int]]] = {}
+for _canonical, _aliases in HEADER_MAP.items():
+    for _rank, _alias in enumerate(_aliases):
+        _ALIAS_INDEX.setdefault(_alias, []).append((_canonical, _rank))
+
+def _map_headers(fieldnames: List[str]) -> Dict[str, str]:
+    # earliest-listed alias wins per canonical; on a tie the later column wins
+    best: Dict[str, Tuple[int, str]] = {}
+    for col in fieldnames or []:
+        for canonical, rank in _ALIAS_INDEX.get(_norm(col), ()):
+            if canonical not in best or rank <= best[canonical][0]:
+                best[canonical] = (rank, col)
+    return {canonical: col for canonical, (_rank, col) in best.items()}
+
+def _parse_date_or_raise(value: str):
+    v = (value or "").strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(v, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognized date format: {value!r}")
+
+# ---------- Fast date parsing ----------
+# Regex/ordinal parsers for each DATE_FORMATS entry. They only accept the
+# unambiguous shape of their format (4-digit %Y etc.), so a hit always
+# agrees with what strptime would have returned; anything else falls back.
+
+_MONTHS = {m: i for i, m in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], start=1)}
+
+def _fast_dmy(sep: str) -> Callable[[str], Optional[date]]:
+    rx = re.compile(rf"(\d{{1,2}}){re.escape(sep)}(\d{{1,2}}){re.escape(sep)}(\d{{4}})\Z")
+
+    def parse(v: str) -> Optional[date]:
+        m = rx.match(v)
+        return date(int(m[3]), int(m[2]), int(m[1])) if m else None
+    return parse
+
+def _fast_ymd(v: str) -> Optional[date]:
+    m = _YMD_RX.match(v)
+    return date(int(m[1]), int(m[2]), int(m[3])) if m else None
+
+def _fast_d_mon_y(year_digits: int) -> Callable[[str], Optional[date]]:
+    rx = re.compile(rf"(\d{{1,2}})-([A-Za-z]{{3}})-(\d{{{year_digits}}})\Z")
+
+    def parse(v: str) -> Optional[date]:
+        m = rx.match(v)
+        if not m or m[2].lower() not in _MONTHS:
+            return None
+        year = int(m[3])
+        if year_digits == 2:
+            year += 2000 if year <= 68 else 1900  # strptime's %y pivot
+        return date(year, _MONTHS[m[2].lower()], int(m[1]))
+    return parse
+
+_YMD_RX = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})\Z")
+
+_FAST_DATE_PARSERS: Dict[str, Callable[[str], Optional[date]]] = {
+    "%d-%b-%y": _fast_d_mon_y(2),
+    "%d-%b-%Y": _fast_d_mon_y(4),
+    "%d/%m/%Y": _fast_dmy("/"),
+    "%Y-%m-%d": _fast_ymd,
+    "%d-%m-%Y": _fast_dmy("-"),
+    "%d.%m.%Y": _fast_dmy("."),
+}
+
+
+class DateParser:
+    """
+    Drop-in for _parse_date_or_raise that remembers the winning format.
+    Tries `preferred` with its fast parser first and only scans every
+    DATE_FORMATS entry with strptime on a miss (which re-learns `preferred`).
+    """
+
+    def __init__(self, preferred: Optional[str] = None):
+        self.preferred = preferred if preferred in _FAST_DATE_PARSERS else None
+
+    def __call__(self, value: str):
+        v = (value or "").strip()
+        if self.preferred:
+            try:
+                d = _FAST_DATE_PARSERS[self.preferred](v)
+            except ValueError:
+                d = None
+            if d is not None:
+                return d
+        for fmt in DATE_FORMATS:
+            try:
+                d = datetime.strptime(v, fmt).date()
+            except ValueError:
+                continue
+            self.preferred = fmt
+            return d
+        raise ValueError(f"Unrecognized date format: {value!r}")
+
+
+def _to_decimal(val: Optional[str]) -> Optional[Decimal]:
+    if val is None:
+        return None
+    s = str(val).strip()
+    if not s or _norm(s) in {"na", "n/a", "null", "-"}:
+        return None
+    # remove currency marks and thousands separators
+    s = (
+        s.replace("₹", "")
+         .replace("INR", "")
+         .replace(",", "")
+         .replace("\u00a0", " ")
+         .strip()
+    )
+    # handle parentheses = negative e.g. (1,234.50)
+    if s.startswith("(") and s.endswith(")"):
+        s = "-" + s[1:-1]
+    return Decimal(s)
+
+
+# ---------- Streaming CSV reader ----------
+
+def iter_text_lines(chunks: Iterable[bytes], encoding: str = "utf-8-sig") -> Iterator[str]:
+    """
+    Decode a byte-chunk stream into text lines without holding the whole file.
+    Splits on '\\n' only so csv can still stitch quoted multi-line fields together.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="ignore")
+    tail = ""
+    for chunk in chunks:
+        lines = (tail + decoder.decode(chunk)).split("\n")
+        tail = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def open_csv_reader(file, dialect=None) -> csv.DictReader:
+    """
+    Open an uploaded file (anything with read/seek/chunks) as a streaming DictReader.
+    Handles BOMs, sniffs the delimiter from the first 4KB (unless a known
+    `dialect` is passed in) and trims spaces.
+    """
+    if dialect is None:
+        file.seek(0)
+        sample = file.read(4096).decode("utf-8-sig", errors="ignore")
+        try:
+            dialect = csv.Sniffer().sniff(sample)
+        except Exception:
+            dialect = csv.excel  # default to comma
+
+    lines = iter_text_lines(file.chunks(chunk_size=READ_CHUNK_SIZE))
+    return csv.DictReader(lines, dialect=dialect, skipinitialspace=True)
+
+
+class CsvStatementReader:
+    """
+    Statement records from a CSV file, the default format. Readers expose
+    `fieldnames` (the header row), iterate as dicts keyed by it, yield plain
+    lists from records(), pair each with its file row number in numbered()
+    (row engine) and numbered_records() (columnar engine), and report
+    layout() for parsing profiles. Other formats live in readers.py.
+    """
+    extensions = (".csv",)
+    first_row_no = 2  # header is row 1
+
+    def __init__(self, file, profile=None):
+        self._reader = open_csv_reader(file, dialect=profile.csv_dialect() if profile else None)
+
+    @property
+    def fieldnames(self) -> List[str]:
+        return self._reader.fieldnames or []
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self._reader)
+
+    def records(self) -> Iterator[List[str]]:
+        return (r for r in self._reader.reader if r)  # DictReader skips blank lines too
+
+    def numbered(self) -> Iterator[Tuple[int, dict]]:
+        return enumerate(self, start=self.first_row_no)
+
+    def numbered_records(self) -> Iterator[Tuple[int, List[str]]]:
+        return enumerate(self.records(), start=self.first_row_no)
+
+    def layout(self) -> dict:
+        dialect = self._reader.reader.dialect
+        return {
+            "delimiter": dialect.delimiter,
+            "quotechar": dialect.quotechar or '"',
+            "doublequote": bool(dialect.doublequote),
+        }
+
+
+# ---------- Row normalisation ----------
+
+def parse_row(raw: dict, header_map: Dict[str, str], parse_date=_parse_date_or_raise) -> dict:
+    """Normalise one raw statement row; raises on anything unparseable."""
+    date_val = raw.get(header_map["date"], "")
+    narration_val = raw.get(header_map["narration"], "")
+    balance_val = raw.get(header_map["balance"], "")
+
+    credit_val = raw.get(header_map.get("credit", ""), None) if "credit" in header_map else None
+    debit_val = raw.get(header_map.get("debit", ""), None) if "debit" in header_map else None
+    utr_val = raw.get(header_map.get("utr", ""), None) if "utr" in header_map else None
+    type_val = raw.get(header_map.get("type", ""), None) if "type" in header_map else None
+    amount_val = raw.get(header_map.get("amount", ""), None) if "amount" in header_map else None
+
+    # date (strict)
+    transaction_date = parse_date(date_val)
+
+    narration = narration_val
+    balance = _to_decimal(balance_val) or Decimal("0")
+    credit = _to_decimal(credit_val)
+    debit = _to_decimal(debit_val)
+    utr = (utr_val or "").strip() or None
+
+    # If only "Type (CR/DR)" + "Amount" is present
+    if credit is None and debit is None and (amount_val is not None) and (type_val is not None):
+        amt = _to_decimal(amount_val) or Decimal("0")
+        t = _norm(type_val)
+        if t in {"cr", "credit"}:
+            credit = amt
+        elif t in {"dr", "debit"}:
+            debit = amt
+
+    if credit is not None:
+        signed = credit
+    elif debit is not None:
+        signed = Decimal("0") - debit
+    else:
+        signed = Decimal("0")
+
+    return {
+        "transaction_date": transaction_date,
+        "narration": narration,
+        "credit_amount": credit,
+        "debit_amount": debit,
+        "balance_amount": balance,
+        "utr_number": utr,
+        "signed_amount": signed,
+    }
+
+
+def iter_parsed_rows(numbered: Iterable[Tuple[int, dict]], header_map: Dict[str, str],
+                     parse_date=_parse_date_or_raise) -> Iterator[Tuple[int, Optional[dict]]]:
+    """
+    Yields (row_number, parsed_row) one at a time for (row_number, raw_row)
+    pairs (a reader's numbered()); parsed_row is None for rows that failed to
+    parse so callers can count them as errors.
+    """
+    for idx, raw in numbered:
+        try:
+            yield idx, parse_row(raw, header_map, parse_date)
+        except Exception:
+            yield idx, None  # skip bad rows
+
+
+class Statement:
+    """
+    An opened statement: iterate it for (row_number, parsed_row) pairs.
+    Keeps what was detected while opening it (file layout, column mapping,
+    winning date format) so a parsing profile can be learned afterwards.
+    """
+
+    def __init__(self, reader, header_map: Dict[str, str], parse_date: DateParser):
+        self.reader = reader
+        self.header_map = header_map
+        self.parse_date = parse_date
+
+    def layout(self) -> dict:
+        """What was detected, as plain BankParsingProfile field values."""
+        return {
+            **self.reader.layout(),
+            "header_map": self.header_map,
+            "date_format": self.parse_date.preferred or "",
+        }
+
+    def __iter__(self) -> Iterator[Tuple[int, Optional[dict]]]:
+        return iter_parsed_rows(self.reader.numbered(), self.header_map, self.parse_date)
+
+
+# ---------- Columnar engine ----------
+# Parses COLUMNAR_CHUNK_ROWS records at a time column by column: plain
+# amounts go through one regex (and come out as exact integer cents too),
+# repeated dates are parsed once per chunk, and only odd-looking values fall
+# back to _to_decimal. Produces exactly the rows the row engine does.
+
+COLUMNAR_CHUNK_ROWS = 10_000
+
+# what _to_decimal reduces to a bare Decimal literal with at most 2 dp
+_PLAIN_AMOUNT = re.compile(r"-?\d+(?:\.\d{1,2})?\Z")
+
+
+def _amount_column(values: List[Optional[str]], bad: Set[int]):
+    """
+    -> (decimals, cents, exact). `cents` holds integer paise for present
+    values; `exact` is False if any value doesn't fit in whole paise (more
+    than 2 dp, NaN, ...), in which case `cents` must not be used.
+    """
+    decimals: List[Optional[Decimal]] = []
+    cents: List[Optional[int]] = []
+    exact = True
+    for i, v in enumerate(values):
+        s = v.strip() if v else ""
+        if not s:
+            decimals.append(None)
+            cents.append(None)
+            continue
+        if "," in s:
+            s = s.replace(",", "")
+        if _PLAIN_AMOUNT.match(s):
+            whole, _, frac = s.partition(".")
+            decimals.append(Decimal(s))
+            cents.append(int(whole + frac.ljust(2, "0")))
+            continue
+        try:
+            d = _to_decimal(v)
+        except Exception:
+            bad.add(i)
+            decimals.append(None)
+            cents.append(None)
+            continue
+        decimals.append(d)
+        c = None
+        if d is not None:
+            if d.is_finite() and d.scaleb(2) == d.scaleb(2).to_integral_value():
+                c = int(d.scaleb(2))
+            else:
+                exact = False
+        cents.append(c)
+    return decimals, cents, exact
+
+
+def _date_column(values: List[Optional[str]], parse_date, bad: Set[int]) -> List[Optional[date]]:
+    memo: Dict[Optional[str], Optional[date]] = {}
+    out: List[Optional[date]] = []
+    for i, v in enumerate(values):
+        if v in memo:
+            d = memo[v]
+        else:
+            try:
+                d = parse_date(v)
+            except Exception:
+                d = None
+            memo[v] = d
+        if d is None:
+            bad.add(i)
+        out.append(d)
+    return out
+
+
+class ColumnChunk:
+    """
+    One parsed block of a columnar statement. `signed_cents`/`balance_cents`
+    line up with the rows that parsed; they are None when some amount in the
+    block isn't a whole number of paise (callers then use the Decimals).
+    """
+
+    def __init__(self, rows, signed_cents, balance_cents):
+        self.rows: List[Tuple[int, Optional[dict]]] = rows
+        self.signed_cents: Optional[List[int]] = signed_cents
+        self.balance_cents: Optional[List[int]] = balance_cents
+
+
+class ColumnarStatement(Statement):
+    """Statement parsed a chunk of records at a time; see iter_chunks()."""
+
+    chunk_rows = COLUMNAR_CHUNK_ROWS
+
+    def iter_chunks(self) -> Iterator[ColumnChunk]:
+        # same lookup DictReader does: a repeated header name resolves to its last column
+        index = {name: i for i, name in enumerate(self.reader.fieldnames)}
+        records = self.reader.numbered_records()
+        while True:
+            numbered = list(islice(records, self.chunk_rows))
+            if not numbered:
+                return
+            row_nos, block = zip(*numbered)
+            yield self._parse_block(row_nos, list(block), index)
+
+    def __iter__(self) -> Iterator[Tuple[int, Optional[dict]]]:
+        for chunk in self.iter_chunks():
+            yield from chunk.rows
+
+    def _parse_block(self, row_nos: Sequence[int], block: List[List[str]], index: Dict[str, int]) -> ColumnChunk:
+        header_map = self.header_map
+        n = len(block)
+
+        def column(key: str) -> List[Optional[str]]:
+            if key not in header_map:
+                return [None] * n
+            i = index[header_map[key]]
+            return [r[i] if i < len(r) else None for r in block]  # short rows read as None
+
+        bad: Set[int] = set()
+        dates = _date_column(column("date"), self.parse_date, bad)
+        narrations = column("narration")
+        balances, balance_c, balance_exact = _amount_column(column("balance"), bad)
+        credits, credit_c, credit_exact = _amount_column(column("credit"), bad)
+        debits, debit_c, debit_exact = _amount_column(column("debit"), bad)
+        utrs = column("utr")
+        exact = balance_exact and credit_exact and debit_exact
+
+        # Type (CR/DR) + Amount layout: only rows with neither credit nor debit
+        types = column("type")
+        amount_raw = column("amount")
+        amount_raw = [
+            a if credits[i] is None and debits[i] is None and types[i] is not None else None
+            for i, a in enumerate(amount_raw)
+        ]
+        amounts, amount_c, amount_exact = _amount_column(amount_raw, bad)
+        exact = exact and amount_exact
+
+        rows: List[Tuple[int, Optional[dict]]] = []
+        signed_cents: List[int] = []
+        balance_cents: List[int] = []
+        for i in range(n):
+            row_no = row_nos[i]
+            if i in bad:
+                rows.append((row_no, None))
+                continue
+            try:
+                balance, bc = balances[i], balance_c[i]
+                if not balance:
+                    balance, bc = Decimal("0"), 0
+                credit, cc = credits[i], credit_c[i]
+                debit, dc = debits[i], debit_c[i]
+
+                if credit is None and debit is None and amount_raw[i] is not None:
+                    amt, ac = amounts[i], amount_c[i]
+                    if not amt:
+                        amt, ac = Decimal("0"), 0
+                    t = _norm(types[i])
+                    if t in {"cr", "credit"}:
+                        credit, cc = amt, ac
+                    elif t in {"dr", "debit"}:
+                        debit, dc = amt, ac
+
+                if credit is not None:
+                    signed, sc = credit, cc
+                elif debit is not None:
+                    signed, sc = Decimal("0") - debit, (-dc if dc is not None else None)
+                else:
+                    signed, sc = Decimal("0"), 0
+            except Exception:
+                rows.append((row_no, None))
+                continue
+
+            rows.append((row_no, {
+                "transaction_date": dates[i],
+                "narration": narrations[i],
+                "credit_amount": credit,
+                "debit_amount": debit,
+                "balance_amount": balance,
+                "utr_number": (utrs[i] or "").strip() or None,
+                "signed_amount": signed,
+            }))
+            signed_cents.append(sc)
+            balance_cents.append(bc)
+
+        if not exact:
+            return ColumnChunk(rows, None, None)
+        return ColumnChunk(rows, signed_cents, balance_cents)
+
+
+# upload `engine=` choices
+ENGINES = {
+    "row": Statement,
+    "columnar": ColumnarStatement,
+}
+DEFAULT_ENGINE = "row"
+
+
+def open_statement(file, profile=None, engine: str = DEFAULT_ENGINE,
+                   reader_class=CsvStatementReader) -> Statement:
+    """
+    Open an uploaded statement for parsing with the given engine (see ENGINES)
+    and file reader (see readers.reader_for; CSV by default).
+    With a BankParsingProfile, its dialect and column mapping are used straight
+    away; if the file no longer matches them we fall back to detection.
+    Raises StatementError if the file can't be read or lacks required columns.
+    """
+    statement_class = ENGINES[engine]
+    parse_date = DateParser(profile.date_format if profile else None)
+    try:
+        if profile is not None:
+            reader = reader_class(file, profile=profile)
+            header_map = profile.match(reader.fieldnames)
+            if header_map:
+                return statement_class(reader, header_map, parse_date)
+
+        reader = reader_class(file)
+        header_map = _map_headers(reader.fieldnames)
+    except Exception as e:
+        raise StatementError(f"Invalid file: {e}")
+
+    missing = [k for k in REQUIRED_COLUMNS if k not in header_map]
+    if missing:
+        raise StatementError(
+            f"Missing required column(s): {', '.join(missing)}",
+            detected_headers=reader.fieldnames,
+        )
+    return statement_class(reader, header_map, parse_date)
@@ -0,0 +1,131 @@
+# bank_uploads/readers.py
+"""
+Statement file formats.
+
+A reader turns an uploaded file into a header row (`fieldnames`) plus
+records, which then go through the usual header mapping and row
+normalisation in parsing.py. See parsing.CsvStatementReader for the
+interface. Readers are picked by file extension; a bank whose export needs
+special handling can register its own reader for an extension:
+
+    readers.register(MyBankXlsxReader, bank_name="My Bank")
+"""
+from __future__ import annotations
+
+import os
+from datetime import date, datetime
+from itertools import chain
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from openpyxl import load_workbook
+
+from .parsing import REQUIRED_COLUMNS, CsvStatementReader, _map_headers
+
+# rows searched for the header row (bank exports put account details above it)
+HEADER_SCAN_ROWS = 30
+
+
+def _cell_text(value) -> str:
+    """Render a spreadsheet cell the way it would appear in a CSV export."""
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))  # 1500.0 -> "1500", long reference numbers stay intact
+    return str(value)
+
+
+class XlsxStatementReader:
+    """
+    Statement records from the active sheet of an XLSX workbook, streamed
+    with openpyxl's read-only mode so the workbook is never fully loaded.
+    The header is the first row (within HEADER_SCAN_ROWS) that maps to all
+    required columns, or matches the account's parsing profile. Blank rows
+    are skipped but keep their place in the numbering: records are reported
+    with their sheet row numbers. Date cells arrive as YYYY-MM-DD.
+    """
+    extensions = (".xlsx", ".xlsm")
+
+    def __init__(self, file, profile=None):
+        file.seek(0)
+        self._workbook = load_workbook(file, read_only=True, data_only=True)
+        # read-only iter_rows() yields every row from row 1, gaps included
+        rows = (
+            (row_no, [_cell_text(v) for v in row])
+            for row_no, row in enumerate(self._workbook.active.iter_rows(values_only=True), start=1)
+        )
+        self._rows = ((row_no, r) for row_no, r in rows if any(v.strip() for v in r))
+        self.fieldnames, self.first_row_no, self._pending = self._find_header(profile)
+
+    def _find_header(self, profile) -> Tuple[List[str], int, List[Tuple[int, List[str]]]]:
+        scanned: List[Tuple[int, List[str]]] = []
+        for row_no, row in self._rows:
+            scanned.append((row_no, row))
+            if (profile is not None and profile.match(row)) or REQUIRED_COLUMNS <= _map_headers(row).keys():
+                return row, row_no + 1, []
+            if len(scanned) >= HEADER_SCAN_ROWS:
+                break
+        # no recognisable header: take the first row so the caller can report what it saw
+        if not scanned:
+            return [], 2, []
+        return scanned[0][1], scanned[0][0] + 1, scanned[1:]
+
+    def numbered_records(self) -> Iterator[Tuple[int, List[str]]]:
+        try:
+            yield from chain(self._pending, self._rows)
+        finally:
+            self._workbook.close()
+
+    def records(self) -> Iterator[List[str]]:
+        return (r for _row_no, r in self.numbered_records())
+
+    def numbered(self) -> Iterator[Tuple[int, dict]]:
+        fieldnames = self.fieldnames
+        width = len(fieldnames)
+        for row_no, r in self.numbered_records():
+            # same shape DictReader gives a CSV row
+            yield row_no, dict(zip(fieldnames, r + [None] * (width - len(r))))
+
+    def __iter__(self) -> Iterator[dict]:
+        return (r for _row_no, r in self.numbered())
+
+    def layout(self) -> dict:
+        return {}
+
+
+# ---------- registry ----------
+
+_READERS: Dict[str, type] = {}                     # extension -> reader
+_BANK_READERS: Dict[Tuple[str, str], type] = {}    # (bank name, extension) -> reader
+
+
+def register(reader_class: type, *, extensions=None, bank_name: Optional[str] = None) -> type:
+    """Register a reader for its `extensions` (or the ones given), optionally for one bank only."""
+    for ext in extensions or reader_class.extensions:
+        ext = ext.lower()
+        if bank_name:
+            _BANK_READERS[(bank_name.strip().lower(), ext)] = reader_class
+        else:
+            _READERS[ext] = reader_class
+    return reader_class
+
+
+def reader_for(filename: str, bank_name: Optional[str] = None) -> Optional[type]:
+    """The reader for a file name (bank-specific first), or None if unsupported."""
+    ext = os.path.splitext(filename or "")[1].lower()
+    if bank_name:
+        reader_class = _BANK_READERS.get((bank_name.strip().lower(), ext))
+        if reader_class is not None:
+            return reader_class
+    return _READERS.get(ext)
+
+
+def supported_extensions() -> List[str]:
+    return sorted(set(_READERS) | {ext for _bank, ext in _BANK_READERS})
+
+
+register(CsvStatementReader)
+register(XlsxStatementReader)
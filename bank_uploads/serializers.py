@@ -1,6 +1,6 @@
 # bank_uploads/serializers.py
 from rest_framework import serializers
-from .models import BankTransaction, BankUploadBatch
+from .models import BalanceBreak, BankTransaction, BankUploadBatch
 from banks.serializers import BankAccountSerializer  # optional nested read
 
 
@@ -21,7 +21,9 @@ class BankTransactionSerializer(serializers.ModelSerializer):
         exclude = ['is_deleted', 'deleted_at', 'dedupe_key']
         read_only_fields = [
             'id', 'created_at', 'bank_account', 'amount', 'transaction_type',
-            'signed_amount', 'upload_batch', 'source'
+            'signed_amount', 'upload_batch', 'source',
+            'classification_status', 'active_classification_count', 'last_classified_at',
+            'version', 'claimed_by', 'claimed_until',
         ]
 
     def get_amount(self, obj):
@@ -54,6 +56,22 @@ class BankUploadBatchSerializer(serializers.ModelSerializer):
             'id', 'bank_account', 'file_name', 'uploaded_by',
             'uploaded_count', 'skipped_count', 'errors_count',
             'balance_continuity_in_file', 'previous_ending_balance_match',
+            'status', 'loader', 'engine', 'rows_parsed', 'error_message', 'started_at', 'finished_at',
+            'heartbeat_at', 'rolled_back_at',
+            'total_credit', 'total_debit', 'final_balance',
             'created_at'
         ]
         read_only_fields = fields
+
+
+class BalanceBreakSerializer(serializers.ModelSerializer):
+    kind_display = serializers.CharField(source='get_kind_display', read_only=True)
+
+    class Meta:
+        model = BalanceBreak
+        fields = [
+            'id', 'kind', 'kind_display',
+            'transaction', 'transaction_date', 'previous_transaction', 'previous_date',
+            'expected_balance', 'actual_balance', 'gap_days',
+        ]
+        read_only_fields = fields
@@ -1,3 +1,569 @@
-from django.test import TestCase
+# bank_uploads/tests.py
+import base64
+import hashlib
+import io
+import json
+import random
+import tempfile
+import zipfile
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from banks.models import BankAccount
+from companies.models import Company
+from cost_centres.models import CostCentre
+from entities.models import Entity
+from reports.models import LedgerEntry
+from transaction_types.models import TransactionType
+from tx_classify.models import Classification
+from tx_classify.services import refresh_classification_state
+from users.models import User
+
+from . import balances, bulk_import, jobs
+from .dedupe import FALSE_POSITIVE_RATE, DedupeKeyFilter
+from .ingest import BalanceContinuity, StatementIngest, _orm_load, _pgcopy_load, checked_rows
+from .models import BalanceBreak, BankTransaction, BankUploadBatch
+from .pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_page
+from .parsing import ColumnarStatement, open_statement
+
+
+def _key(i) -> str:
+    return hashlib.sha256(f"txn-{i}".encode()).hexdigest()
+
+
+# ---------- dedupe ----------
+
+class DedupeKeyFilterTests(SimpleTestCase):
+    def test_no_false_negatives(self):
+        f = DedupeKeyFilter(capacity=5000)
+        keys = [_key(i) for i in range(5000)]
+        f.update(keys)
+        self.assertTrue(all(k in f for k in keys))
+        self.assertEqual(f.count, 5000)
+
+    def test_false_positive_rate_near_target(self):
+        f = DedupeKeyFilter(capacity=5000)
+        f.update(_key(i) for i in range(5000))
+        absent = [_key(f"absent-{i}") for i in range(20000)]
+        rate = sum(k in f for k in absent) / len(absent)
+        self.assertLess(rate, FALSE_POSITIVE_RATE * 3)
+
+    def test_saturated_past_capacity(self):
+        f = DedupeKeyFilter(capacity=10)
+        f.update(_key(i) for i in range(10))
+        self.assertFalse(f.saturated)
+        f.add(_key(10))
+        self.assertTrue(f.saturated)
+
+
+# ---------- parsing engines ----------
+
+# messy cell values both engines must treat the same way
+ODD_AMOUNTS = ["", " ", "NA", "-", "1,234.50", "(1,000.25)", "1.234", "abc", "1e3", "+5", "0.00"]
+ODD_DATES = ["", "bad", "31/02/2024", "2025-08-06", "6-Aug-25"]
+
+
+def _statement_csv(n: int, seed: int, messy: float = 0.0, break_at=None) -> bytes:
+    rnd = random.Random(seed)
+    lines = ["Date,Narration,Debit,Credit,Balance,UTR"]
+    balance = Decimal("1000.00")
+    for i in range(n):
+        if rnd.random() < messy:
+            lines.append(",".join([
+                rnd.choice(ODD_DATES), f"odd {i}", f'"{rnd.choice(ODD_AMOUNTS)}"',
+                f'"{rnd.choice(ODD_AMOUNTS)}"', f'"{rnd.choice(ODD_AMOUNTS)}"', "",
+            ]))
+            continue
+        amount = Decimal(rnd.randint(1, 999_999)) / 100
+        credit = rnd.random() < 0.5
+        balance += amount if credit else -amount
+        shown = balance + Decimal("0.01") if i == break_at else balance
+        lines.append(",".join([
+            "06/08/2025", f"txn {i}", "" if credit else str(amount), str(amount) if credit else "",
+            str(shown), f"U{i}",
+        ]))
+    return ("\n".join(lines) + "\n").encode()
+
+
+def _parse(data: bytes, engine: str, chunk_rows: int = 7):
+    with mock.patch.object(ColumnarStatement, "chunk_rows", chunk_rows):
+        statement = open_statement(SimpleUploadedFile("s.csv", data), engine=engine)
+        continuity = BalanceContinuity()
+        rows = list(checked_rows(statement, continuity))
+    return rows, continuity
+
+
+class EngineEquivalenceTests(SimpleTestCase):
+    """The columnar engine must produce exactly what the row engine does."""
+
+    def assertSameResult(self, data: bytes):
+        row_rows, row_cont = _parse(data, "row")
+        for chunk_rows in (1, 7, 1000):
+            col_rows, col_cont = _parse(data, "columnar", chunk_rows)
+            self.assertEqual(col_rows, row_rows)
+            self.assertEqual(
+                (col_cont.ok, col_cont.opening_balance), (row_cont.ok, row_cont.opening_balance)
+            )
+        return row_rows, row_cont
+
+    def test_clean_statement(self):
+        rows, continuity = self.assertSameResult(_statement_csv(60, seed=1))
+        self.assertEqual(len(rows), 60)
+        self.assertTrue(all(row is not None for _row_no, row in rows))
+        self.assertTrue(continuity.ok)
+        self.assertEqual(continuity.opening_balance, Decimal("1000.00"))
+
+    def test_messy_statement(self):
+        for seed in range(20):
+            with self.subTest(seed=seed):
+                self.assertSameResult(_statement_csv(40, seed=seed, messy=0.3))
+
+    def test_row_numbers_are_file_lines(self):
+        rows, _ = self.assertSameResult(_statement_csv(5, seed=2))
+        self.assertEqual([row_no for row_no, _row in rows], [2, 3, 4, 5, 6])
+
+
+class BalanceContinuityTests(SimpleTestCase):
+    """feed_chunk()'s running sum in paise agrees with feeding rows one by one."""
+
+    def test_running_sum_accepts_a_continuous_statement(self):
+        _, continuity = _parse(_statement_csv(500, seed=3), "columnar", chunk_rows=64)
+        self.assertTrue(continuity.ok)
+
+    def test_running_sum_finds_a_break(self):
+        for break_at in (1, 63, 64, 65, 499):
+            with self.subTest(break_at=break_at):
+                data = _statement_csv(500, seed=3, break_at=break_at)
+                _, columnar = _parse(data, "columnar", chunk_rows=64)
+                _, row = _parse(data, "row")
+                self.assertFalse(columnar.ok)
+                self.assertFalse(row.ok)
+
+    def test_sub_paise_amounts_fall_back_to_decimals(self):
+        data = _statement_csv(10, seed=4).replace(b"\n", b"\n06/08/2025,x,,0.001,1000.001,\n", 1)
+        _, columnar = _parse(data, "columnar", chunk_rows=4)
+        _, row = _parse(data, "row")
+        self.assertEqual(columnar.ok, row.ok)
+
+
+# ---------- keyset pagination ----------
+
+ORDERING = ("-transaction_date", "-created_at", "-id")
+
+
+def _raw_cursor(values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+class CursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        values = [date(2025, 8, 6), datetime(2025, 8, 6, 10, 30, 1, 5, tzinfo=timezone.utc), 42]
+        raw = decode_cursor(encode_cursor(values), 3)
+        fields = [BankTransaction._meta.get_field(o.lstrip("-")) for o in ORDERING]
+        self.assertEqual([f.to_python(v) for f, v in zip(fields, raw)], values)
+
+    def test_round_trip_keeps_text(self):
+        values = ["ünïcode / + =", "0", ""]
+        self.assertEqual(decode_cursor(encode_cursor(values), 3), values)
+
+    def test_rejects_bad_cursors(self):
+        for cursor in ("", "!!!", encode_cursor([1, 2]), "e30",   # e30 is {}
+                       encode_cursor([None, "1", "2"]), _raw_cursor(["1", 2, "3"]), _raw_cursor([[], {}, "3"])):
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                decode_cursor(cursor, 3)
+
+    def test_rejects_values_the_fields_cant_take(self):
+        qs = BankTransaction.objects.all()
+        for values in (["not a date", "2025-08-06T10:30:01+00:00", "1"], ["2025-08-06", "2025-08-06", "x"]):
+            with self.subTest(values=values), self.assertRaises(InvalidCursor):
+                keyset_page(qs, ORDERING, cursor=encode_cursor(values))
+
+
+
+# ---------- ingest (database) ----------
+
+class IngestTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name="Acme", pan="ABCDE1234F")
+        cls.user = User.objects.create_superuser("tester", "pw", full_name="Tester", role="SUPER_USER")
+        cls.account = BankAccount.objects.create(
+            company=cls.company, account_name="Main", account_number="111", bank_name="HDFC", ifsc="HDFC0000001",
+        )
+
+    def _batch(self, account=None, **fields) -> BankUploadBatch:
+        return BankUploadBatch.objects.create(bank_account=account or self.account, file_name="s.csv", **fields)
+
+    def _ingest(self, data: bytes, loader: str = "orm", account=None, **kwargs) -> StatementIngest:
+        batch = self._batch(account, loader=loader, status=BankUploadBatch.STATUS_PROCESSING)
+        statement = open_statement(SimpleUploadedFile("s.csv", data))
+        return StatementIngest(batch, loader=loader, **kwargs).run(statement)
+
+    def _objs(self, batch: BankUploadBatch, data: bytes) -> list:
+        """BankTransactions the way StatementIngest prepares them for a loader."""
+        objs = []
+        for _row_no, r in open_statement(SimpleUploadedFile("s.csv", data)):
+            o = BankTransaction(bank_account=self.account, upload_batch=batch, source="BANK", **r)
+            o.signed_amount = o._compute_signed_amount()
+            o.dedupe_key = o._build_dedupe_key()
+            objs.append(o)
+        return objs
+
+
+class OrmLoaderTests(IngestTestCase):
+    def test_ingest_stores_every_row_and_the_batch_totals(self):
+        data = _statement_csv(30, seed=5)
+        result = self._ingest(data, batch_size=7)
+        batch = result.batch
+        batch.refresh_from_db()
+        stored = BankTransaction.objects.filter(upload_batch=batch)
+        self.assertEqual((result.created, result.skipped, stored.count()), (30, 0, 30))
+        self.assertEqual(batch.status, BankUploadBatch.STATUS_COMPLETED)
+        self.assertEqual(batch.total_credit, sum(t.credit_amount or 0 for t in stored))
+        self.assertEqual(batch.total_debit, sum(t.debit_amount or 0 for t in stored))
+        self.assertTrue(batch.balance_continuity_in_file)
+
+    def test_falls_back_when_a_key_slipped_past_the_precheck(self):
+        self._ingest(_statement_csv(10, seed=6))
+        batch = self._batch()
+        objs = self._objs(batch, _statement_csv(15, seed=6))   # rows 0-9 are already stored
+        self.assertEqual(_orm_load(batch, objs), {o.dedupe_key for o in objs[10:]})
+        # the failed bulk insert only rolled back its savepoint
+        self.assertEqual(BankTransaction.objects.filter(bank_account=self.account).count(), 15)
+
+    def test_sync_upload_marks_the_batch_failed(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        def upload(data):
+            return client.post("/api/bank-uploads/upload/", {
+                "bank_account_id": self.account.pk, "file": SimpleUploadedFile("s.csv", data),
+            }, format="multipart")
+
+        overflow = b"Date,Narration,Debit,Credit,Balance,UTR\n06/08/2025,x,,1,99999999999999.00,U1\n"
+        with mock.patch("django.core.handlers.exception.log_response"):
+            bad_data = upload(overflow)
+            with mock.patch.object(StatementIngest, "run", side_effect=RuntimeError("boom")):
+                crashed = upload(_statement_csv(3, seed=7))
+        self.assertEqual(bad_data.status_code, 400)
+        self.assertEqual((crashed.status_code, crashed.data), (500, {"detail": "RuntimeError: boom"}))
+        for batch in BankUploadBatch.objects.filter(bank_account=self.account):
+            self.assertEqual(batch.status, BankUploadBatch.STATUS_FAILED)
+            self.assertTrue(batch.error_message and batch.finished_at)
+        self.assertFalse(BankTransaction.objects.filter(bank_account=self.account).exists())
+
+
+STORED_FIELDS = ("transaction_date", "narration", "credit_amount", "debit_amount", "balance_amount",
+                 "utr_number", "signed_amount", "dedupe_key", "classification_status", "version")
+
+
+class PgCopyLoaderTests(IngestTestCase):
+    def _stored(self, account):
+        return list(BankTransaction.objects.filter(bank_account=account).order_by("id").values_list(*STORED_FIELDS))
+
+    def test_stores_what_the_orm_loader_stores(self):
+        other = BankAccount.objects.create(
+            company=self.company, account_name="Copy", account_number="222", bank_name="HDFC", ifsc="HDFC0000001",
+        )
+        data = _statement_csv(40, seed=8)
+        self._ingest(data, loader="orm")
+        result = self._ingest(data, loader="pgcopy", account=other, batch_size=9)
+        self.assertEqual((result.created, result.skipped), (40, 0))
+        self.assertEqual(self._stored(other), self._stored(self.account))
+
+    def test_returns_only_the_keys_that_landed(self):
+        self._ingest(_statement_csv(10, seed=9), loader="pgcopy")
+        batch = self._batch()
+        objs = self._objs(batch, _statement_csv(15, seed=9))   # rows 0-9 conflict
+        self.assertEqual(_pgcopy_load(batch, objs), {o.dedupe_key for o in objs[10:]})
+        self.assertEqual(BankTransaction.objects.filter(upload_batch=batch).count(), 5)
+
+    def test_round_trips_nulls_and_awkward_text(self):
+        batch = self._batch()
+        objs = self._objs(batch, _statement_csv(3, seed=10))
+        objs[0].narration, objs[0].utr_number = "", None
+        objs[1].narration = 'comma, "quote"\nnewline \\N'
+        for o in objs:
+            o.dedupe_key = o._build_dedupe_key()
+        self.assertEqual(len(_pgcopy_load(batch, objs)), 3)
+        stored = {t.dedupe_key: t for t in BankTransaction.objects.filter(upload_batch=batch)}
+        for o in objs:
+            t = stored[o.dedupe_key]
+            self.assertEqual(
+                (t.narration, t.utr_number, t.credit_amount, t.debit_amount, t.balance_amount),
+                (o.narration, o.utr_number, o.credit_amount, o.debit_amount, o.balance_amount),
+            )
+
+
+class DuplicateCountTests(IngestTestCase):
+    def test_overlapping_statement(self):
+        for loader in ("orm", "pgcopy"):
+            with self.subTest(loader=loader):
+                seed = 11 if loader == "orm" else 12
+                self._ingest(_statement_csv(20, seed=seed), loader=loader)
+                result = self._ingest(_statement_csv(30, seed=seed), loader=loader, batch_size=6)
+                self.assertEqual((result.created, result.skipped), (10, 20))
+                self.assertEqual(result.duplicate_rows, list(range(2, 22)))   # file lines of rows 0-19
+                result.batch.refresh_from_db()
+                self.assertEqual((result.batch.uploaded_count, result.batch.skipped_count), (10, 20))
+
+    def test_repeats_within_a_file_across_buffers(self):
+        lines = _statement_csv(6, seed=13).decode().splitlines()
+        data = "\n".join(lines + [lines[1], lines[5], lines[1]]).encode() + b"\n"
+        for loader in ("orm", "pgcopy"):
+            with self.subTest(loader=loader):
+                result = self._ingest(data, loader=loader, batch_size=4, account=BankAccount.objects.create(
+                    company=self.company, account_name=loader, account_number=loader, bank_name="HDFC",
+                    ifsc="HDFC0000001",
+                ))
+                self.assertEqual((result.created, result.skipped), (6, 3))
+                self.assertEqual(result.duplicate_rows, [8, 9, 10])
+
+    def test_duplicate_rows_are_truncated_but_counts_stay_exact(self):
+        self._ingest(_statement_csv(12, seed=14))
+        with mock.patch("bank_uploads.ingest.DUPLICATE_ROWS_LIMIT", 5):
+            result = self._ingest(_statement_csv(12, seed=14))
+        self.assertEqual((result.created, result.skipped), (0, 12))
+        self.assertEqual(result.duplicate_rows, [2, 3, 4, 5, 6])
+
+
+# ---------- background jobs ----------
+
+class MediaTestCase(IngestTestCase):
+    """Stored statement files go to a throwaway MEDIA_ROOT; "222" is a second account."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        overridden = override_settings(MEDIA_ROOT=media.name)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        self.other = BankAccount.objects.create(
+            company=self.company, account_name="Other", account_number="222", bank_name="HDFC", ifsc="HDFC0000001",
+        )
+
+
+class JobQueueTests(MediaTestCase):
+    def _enqueue(self, data: bytes, account=None) -> BankUploadBatch:
+        return jobs.enqueue(self._batch(account), SimpleUploadedFile("s.csv", data))
+
+    def _finish(self, batch):
+        batch.status = BankUploadBatch.STATUS_COMPLETED
+        batch.save(update_fields=["status"])
+
+    def test_claims_oldest_first_and_one_batch_per_account(self):
+        first = self._enqueue(_statement_csv(3, seed=20))
+        second = self._enqueue(_statement_csv(3, seed=21))
+        other = self._enqueue(_statement_csv(3, seed=22), account=self.other)
+
+        self.assertEqual(jobs.claim_next(), first)
+        self.assertEqual(jobs.claim_next(), other)   # second waits for first
+        self.assertIsNone(jobs.claim_next())
+        self._finish(first)
+        claimed = jobs.claim_next()
+        self.assertEqual(claimed, second)
+        self.assertEqual(claimed.status, BankUploadBatch.STATUS_PROCESSING)
+        self.assertIsNotNone(claimed.heartbeat_at)
+
+    def test_requeues_only_batches_without_a_recent_heartbeat(self):
+        now = datetime.now(timezone.utc)
+        stale = self._batch(status=BankUploadBatch.STATUS_PROCESSING, started_at=now,
+                            heartbeat_at=now - timedelta(minutes=30))
+        never_beat = self._batch(status=BankUploadBatch.STATUS_PROCESSING, started_at=now - timedelta(minutes=30))
+        alive = self._batch(status=BankUploadBatch.STATUS_PROCESSING, started_at=now - timedelta(hours=1),
+                            heartbeat_at=now)
+        self.assertEqual(jobs.requeue_stale(timedelta(minutes=10)), 2)
+        statuses = dict(BankUploadBatch.objects.values_list("pk", "status"))
+        self.assertEqual(statuses[stale.pk], BankUploadBatch.STATUS_PENDING)
+        self.assertEqual(statuses[never_beat.pk], BankUploadBatch.STATUS_PENDING)
+        self.assertEqual(statuses[alive.pk], BankUploadBatch.STATUS_PROCESSING)
+
+    def test_process_ingests_the_stored_file(self):
+        self._enqueue(_statement_csv(25, seed=23))
+        batch = jobs.process(jobs.claim_next())
+        batch.refresh_from_db()
+        self.assertEqual(batch.status, BankUploadBatch.STATUS_COMPLETED)
+        self.assertEqual((batch.rows_parsed, batch.uploaded_count), (25, 25))
+        self.assertEqual(BankTransaction.objects.filter(upload_batch=batch).count(), 25)
+
+    def test_process_marks_an_unreadable_file_failed(self):
+        self._enqueue(b"foo,bar\n1,2\n")
+        batch = jobs.process(jobs.claim_next())
+        batch.refresh_from_db()
+        self.assertEqual((batch.status, batch.errors_count), (BankUploadBatch.STATUS_FAILED, 1))
+        self.assertIn("Missing required column", batch.error_message)
+        self.assertIsNotNone(batch.finished_at)
+
+
+# ---------- balance breaks ----------
+
+HEADER = "Date,Narration,Debit,Credit,Balance,UTR"
+
+
+def _ledger_lines(n: int, seed: int, start=date(2025, 1, 1), step_days: int = 3) -> list:
+    """A continuous account history, one statement line per transaction."""
+    rnd = random.Random(seed)
+    balance = Decimal("1000.00")
+    lines = []
+    for i in range(n):
+        amount = Decimal(rnd.randint(1, 99_999)) / 100
+        credit = rnd.random() < 0.5
+        balance += amount if credit else -amount
+        day = start + timedelta(days=i * step_days)
+        lines.append(",".join([
+            day.strftime("%d/%m/%Y"), f"txn {i}", "" if credit else str(amount), str(amount) if credit else "",
+            str(balance), f"L{seed}-{i}",
+        ]))
+    return lines
+
+
+def _csv(lines) -> bytes:
+    return ("\n".join([HEADER, *lines]) + "\n").encode()
+
+
+class BalanceBreakTests(IngestTestCase):
+    def _breaks(self):
+        return sorted(
+            BalanceBreak.objects.filter(bank_account=self.account)
+            .values_list("transaction__utr_number", "previous_transaction__utr_number", "kind")
+        )
+
+    def assertMatchesRebuild(self):
+        """Incrementally refreshed breaks and checkpoint equal a rebuild from scratch."""
+        refreshed = self._breaks()
+        state = balances.checkpoint(self.account.pk)
+        tail = (state.last_transaction_id, state.last_transaction_date, state.last_balance)
+        rebuilt = balances.rebuild(self.account.pk)
+        self.assertEqual(refreshed, self._breaks())
+        self.assertEqual(tail, (rebuilt.last_transaction_id, rebuilt.last_transaction_date, rebuilt.last_balance))
+        return refreshed
+
+    def test_filling_a_hole_clears_its_breaks(self):
+        lines = _ledger_lines(30, seed=30)
+        self._ingest(_csv(lines[:10]))
+        self.assertEqual(self.assertMatchesRebuild(), [])
+
+        self._ingest(_csv(lines[20:]))
+        self.assertEqual(self.assertMatchesRebuild(), [
+            ("L30-20", "L30-9", BalanceBreak.KIND_BALANCE),
+            ("L30-20", "L30-9", BalanceBreak.KIND_DATE_GAP),
+        ])
+        self.assertEqual(balances.checkpoint(self.account.pk).last_transaction.utr_number, "L30-29")
+
+        middle = self._ingest(_csv(lines[10:20]))
+        self.assertEqual(self.assertMatchesRebuild(), [])
+        self.assertFalse(middle.batch.previous_ending_balance_match)   # compared with the tail, L30-29
+
+    def test_a_wrong_balance_breaks_its_row_and_the_next(self):
+        lines = _ledger_lines(8, seed=31)
+        fields = lines[4].split(",")
+        fields[4] = str(Decimal(fields[4]) + 1)
+        lines[4] = ",".join(fields)
+        self._ingest(_csv(lines))
+        self.assertEqual(self.assertMatchesRebuild(), [
+            ("L31-4", "L31-3", BalanceBreak.KIND_BALANCE),
+            ("L31-5", "L31-4", BalanceBreak.KIND_BALANCE),
+        ])
+
+
+# ---------- rollback ----------
+
+class RollbackTests(IngestTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.cost_centre = CostCentre.objects.create(company=cls.company, name="Ops")
+        cls.transaction_type = TransactionType.objects.create(
+            company=cls.company, name="Sales", cost_centre=cls.cost_centre, direction="Credit", is_credit=True,
+        )
+        cls.entity = Entity.objects.create(company=cls.company, name="HQ", entity_type="Internal")
+
+    def _classify(self, txns) -> None:
+        Classification.objects.bulk_create([
+            Classification(bank_transaction=t, transaction_type=self.transaction_type, cost_centre=self.cost_centre,
+                           entity=self.entity, amount=abs(t.signed_amount), value_date=t.transaction_date)
+            for t in txns
+        ])
+        refresh_classification_state([t.pk for t in txns])
+
+    def test_rollback_undoes_only_its_batch(self):
+        lines = _ledger_lines(20, seed=40)
+        kept = self._ingest(_csv(lines[:10])).batch
+        undone = self._ingest(_csv(lines[10:])).batch
+        kept_txns = list(BankTransaction.objects.filter(upload_batch=kept)[:2])
+        undone_txns = list(BankTransaction.objects.filter(upload_batch=undone)[:3])
+        self._classify(kept_txns + undone_txns)
+        self.assertEqual(LedgerEntry.objects.filter(company=self.company).count(), 5)
+
+        self.assertEqual(undone.rollback(), {"transactions": 10, "classifications": 3})
+
+        self.assertFalse(BankTransaction.objects.filter(upload_batch=undone).exists())
+        for t in BankTransaction.all_objects.filter(upload_batch=undone):
+            self.assertTrue(t.is_deleted)
+            self.assertEqual((t.classification_status, t.active_classification_count), ("UNCLASSIFIED", 0))
+        self.assertEqual(Classification.objects.filter(is_active_classification=True).count(), 2)
+        self.assertEqual(
+            set(LedgerEntry.objects.values_list("bank_transaction_id", flat=True)), {t.pk for t in kept_txns},
+        )
+        undone.refresh_from_db()
+        self.assertEqual((undone.status, undone.uploaded_count, undone.total_credit, undone.total_debit),
+                         (BankUploadBatch.STATUS_ROLLED_BACK, 0, 0, 0))
+        self.assertEqual(balances.checkpoint(self.account.pk).last_transaction.utr_number, "L40-9")
+
+        # the rows can be uploaded again
+        self.assertEqual(self._ingest(_csv(lines[10:])).created, 10)
+
+    def test_rollback_view_rejects_unfinished_and_repeated_rollbacks(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        done = self._ingest(_csv(_ledger_lines(3, seed=41))).batch
+        pending = self._batch()
+
+        def rollback(batch_id):
+            with mock.patch("django.core.handlers.exception.log_response"):
+                return client.post("/api/bank-uploads/rollback/", {"batch_id": str(batch_id)}, format="json")
+
+        self.assertEqual(rollback(pending.pk).status_code, 400)
+        response = rollback(done.pk)
+        self.assertEqual((response.status_code, response.data["rolled_back"]), (200, 3))
+        self.assertEqual(rollback(done.pk).status_code, 400)
+        self.assertEqual(rollback("not-a-uuid").status_code, 404)
+
+
+# ---------- bulk upload ----------
+
+def _zip(files: dict) -> SimpleUploadedFile:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in files.items():
+            zf.writestr(name, data)
+    return SimpleUploadedFile("statements.zip", buf.getvalue())
+
+
+class BulkUploadTests(MediaTestCase):
+    def test_queues_each_accounts_files_oldest_first(self):
+        lines = _ledger_lines(20, seed=50)
+        archive = _zip({
+            "111_a.csv": _csv(lines[10:]), "111_b.csv": _csv(lines[:10]),
+            "222/x.csv": _csv(_ledger_lines(3, seed=51)), "999_unknown.csv": _csv(lines),
+        })
+        batches, unmatched = bulk_import.enqueue_archive(archive)
+        self.assertEqual([(b.bank_account.account_number, b.file_name) for b in batches],
+                         [("111", "111_b.csv"), ("111", "111_a.csv"), ("222", "x.csv")])
+        self.assertEqual(unmatched, ["999_unknown.csv"])
+        with batches[0].source_file.open("rb") as fh:
+            self.assertEqual(fh.read(), _csv(lines[:10]))
+
+    def test_rejects_members_past_the_size_limits(self):
+        archive = {"111_a.csv": _csv(_ledger_lines(20, seed=52)), "111_b.csv": _csv(_ledger_lines(20, seed=53))}
+        size = len(archive["111_a.csv"])
+        for settings in ({"BANK_UPLOADS_ZIP_MAX_FILE_SIZE": size - 1},
+                         {"BANK_UPLOADS_ZIP_MAX_TOTAL_SIZE": size + 1}):
+            with self.subTest(**settings), override_settings(**settings), self.assertRaises(ValueError):
+                bulk_import.enqueue_archive(_zip(archive))
+        self.assertFalse(BankUploadBatch.objects.exists())
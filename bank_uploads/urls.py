@@ -1,9 +1,21 @@
 # bank_uploads/urls.py
 from django.urls import path
-from .views import UploadBankTransactionsView, BatchTransactionsView, RecentUploadsView
+from .views import (
+    UploadBankTransactionsView,
+    BulkUploadView,
+    BatchTransactionsView,
+    RollbackBatchView,
+    RecentUploadsView,
+    UploadStatusView,
+    BalanceBreaksView,
+)
 
 urlpatterns = [
     path('upload/', UploadBankTransactionsView.as_view(), name='upload-bank-transactions'),
+    path('bulk-upload/', BulkUploadView.as_view(), name='bulk-bank-upload'),
     path('batch-transactions/', BatchTransactionsView.as_view(), name='batch-transactions'),
+    path('rollback/', RollbackBatchView.as_view(), name='rollback-bank-upload'),
     path('recent-uploads/', RecentUploadsView.as_view(), name='recent-bank-uploads'),
+    path('upload-status/', UploadStatusView.as_view(), name='bank-upload-status'),
+    path('balance-breaks/', BalanceBreaksView.as_view(), name='bank-balance-breaks'),
 ]
@@ -2,125 +2,32 @@
 from __future__ import annotations
 
 import csv
-from datetime import datetime
-from decimal import Decimal
-from io import StringIO
-from typing import Dict, List, Optional
+import zipfile
 
-from django.db import transaction
-from django.db.models import Sum
+from django.core.exceptions import ValidationError
+from django.db import DataError
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.views import APIView
 
-from .models import BankTransaction, BankUploadBatch
+from banks.models import BankAccount
+
+from . import balances, bulk_import, jobs, readers
+from .ingest import DEFAULT_LOADER, LOADERS, StatementIngest
+from .models import BalanceBreak, BankParsingProfile, BankTransaction, BankUploadBatch
+from .pagination import InvalidCursor, keyset_page, parse_limit
+from .parsing import DEFAULT_ENGINE, ENGINES, StatementError, open_statement
 from .serializers import (
+    BalanceBreakSerializer,
     BankUploadBatchSerializer,
     BankTransactionSerializer,
 )
 
-# ---------- Header mapping & parsing helpers ----------
-
-# canonical -> list of synonyms (lowercased, trimmed)
-HEADER_MAP: Dict[str, List[str]] = {
-    # dates
-    "date": [
-        "date", "transaction date", "value date", "posting date",
-        "tran date", "txn date", "value dt", "val dt",
-    ],
-    # narration/desc
-    "narration": [
-        "narration", "description", "details", "particulars", "remarks", "transaction remarks",
-        "narration/description",
-    ],
-    # amounts split
-    "credit": [
-        "credit", "cr", "deposit", "credit amount", "cr amount",
-        "deposit amt.", "deposit amt", "deposit amount", "deposit (cr)",
-    ],
-    "debit": [
-        "debit", "dr", "withdrawal", "debit amount", "dr amount",
-        "withdrawal amt.", "withdrawal amt", "withdrawal amount", "withdrawal (dr)",
-    ],
-    # running/closing balance
-    "balance": [
-        "balance", "running balance", "closing balance", "available balance",
-        "balance amt.", "balance amount", "closing bal", "available bal",
-    ],
-    # references / UTR / cheque
-    "utr": [
-        "utr", "utr number", "utr no", "utr#", "reference", "transaction id",
-        "ref no", "chq/ref no", "cheque/ref no", "reference no", "ref#", "rrn", "upi ref no",
-    ],
-    # optional: some banks give Type + Amount instead of separate debit/credit
-    "type": ["type", "txn type", "transaction type", "dr/cr", "cr/dr"],
-    "amount": ["amount", "txn amount", "transaction amount", "amt."],
-}
-
-DATE_FORMATS = [
-    "%d-%b-%y",  # 06-Aug-25
-    "%d-%b-%Y",  # 06-Aug-2025
-    "%d/%m/%Y",
-    "%Y-%m-%d",
-    "%d-%m-%Y",
-    "%d.%m.%Y",
-]
-
-def _norm(s: Optional[str]) -> str:
-    return (s or "").strip().lower()
-
-def _map_headers(fieldnames: List[str]) -> Dict[str, str]:
-    present = {_norm(c): c for c in fieldnames or []}
-    result: Dict[str, str] = {}
-    for canonical, aliases in HEADER_MAP.items():
-        for alias in aliases:
-            if alias in present:
-                result[canonical] = present[alias]
-                break
-    return result
-
-def _parse_date_or_raise(value: str):
-    v = (value or "").strip()
-    for fmt in DATE_FORMATS:
-        try:
-            return datetime.strptime(v, fmt).date()
-        except ValueError:
-            continue
-    raise ValueError(f"Unrecognized date format: {value!r}")
-
-def _to_decimal(val: Optional[str]) -> Optional[Decimal]:
-    if val is None:
-        return None
-    s = str(val).strip()
-    if not s or _norm(s) in {"na", "n/a", "null", "-"}:
-        return None
-    # remove currency marks and thousands separators
-    s = (
-        s.replace("₹", "")
-         .replace("INR", "")
-         .replace(",", "")
-         .replace("\u00a0", " ")
-         .strip()
-    )
-    # handle parentheses = negative e.g. (1,234.50)
-    if s.startswith("(") and s.endswith(")"):
-        s = "-" + s[1:-1]
-    return Decimal(s)
-
-def _balance_continuity(rows: List[dict]) -> bool:
-    if not rows:
-        return True
-    prev_balance = rows[0]["balance_amount"] - rows[0]["signed_amount"]
-    for r in rows:
-        expected = prev_balance + r["signed_amount"]
-        if expected != r["balance_amount"]:
-            return False
-        prev_balance = r["balance_amount"]
-    return True
-
-
 # ---------- Endpoints ----------
 
 class UploadBankTransactionsView(APIView):
@@ -130,8 +37,12 @@ class UploadBankTransactionsView(APIView):
     def post(self, request, *args, **kwargs):
         """
         multipart/form-data:
-          - file: CSV
+          - file: CSV or XLSX (see readers.py for registered formats)
           - bank_account_id: int
+          - loader: "orm" (default) | "pgcopy" (COPY via staging table, PostgreSQL)
+          - engine: "row" (default) | "columnar" (parses column by column in chunks)
+          - async: "1" to queue the file for `manage.py process_bank_uploads`
+                   and return 202 right away; poll upload-status/ for progress
 
         Built to accept bank "Full Statement" CSVs with headers like:
           ['Sr.No.', 'Date', 'Type', 'Description', 'Debit', 'Credit', 'Balance']
@@ -145,161 +56,118 @@ class UploadBankTransactionsView(APIView):
         if not file:
             return Response({"detail": "file is required"}, status=400)
 
-        # ---- light format guard: CSV only (spec) ----
-        name_l = (file.name or "").lower()
-        if not (name_l.endswith(".csv")):
-            return Response({"detail": "Only CSV files are supported."}, status=400)
+        loader = request.data.get("loader") or DEFAULT_LOADER
+        if loader not in LOADERS:
+            return Response({"detail": f"loader must be one of: {', '.join(LOADERS)}"}, status=400)
+        engine = request.data.get("engine") or DEFAULT_ENGINE
+        if engine not in ENGINES:
+            return Response({"detail": f"engine must be one of: {', '.join(ENGINES)}"}, status=400)
+
+        # ---- light format guard: registered statement formats only ----
+        bank_name = BankAccount.objects.filter(pk=bank_account_id).values_list("bank_name", flat=True).first()
+        reader_class = readers.reader_for(file.name, bank_name=bank_name)
+        if reader_class is None:
+            return Response(
+                {"detail": f"Unsupported file type; expected one of: {', '.join(readers.supported_extensions())}"},
+                status=400,
+            )
+
+        run_async = request.data.get("async", "0") in ("1", "true", "True")
 
         batch = BankUploadBatch.objects.create(
             bank_account_id=bank_account_id,
             file_name=file.name,
             uploaded_by=request.user if request.user.is_authenticated else None,
+            loader=loader,
+            engine=engine,
+            status=BankUploadBatch.STATUS_PENDING if run_async else BankUploadBatch.STATUS_PROCESSING,
+            started_at=None if run_async else timezone.now(),
         )
 
-        # --- Robust CSV open: handle BOMs, sniff delimiter, trim spaces ---
-        try:
-            file_bytes = file.read()
-            sample = file_bytes[:4096].decode("utf-8-sig", errors="ignore")
-            try:
-                dialect = csv.Sniffer().sniff(sample)
-            except Exception:
-                dialect = csv.excel  # default to comma
+        if run_async:
+            jobs.enqueue(batch, file)
+            payload = BankUploadBatchSerializer(batch).data
+            payload["upload_batch_id"] = str(batch.id)
+            return Response(payload, status=status.HTTP_202_ACCEPTED)
 
-            wrapped = StringIO(file_bytes.decode("utf-8-sig", errors="ignore"))
-            reader = csv.DictReader(wrapped, dialect=dialect, skipinitialspace=True)
-            header_map = _map_headers(reader.fieldnames or [])
+        # --- Robust open: CSV handles BOMs, sniffs delimiter, trims spaces; XLSX streams read-only ---
+        # The file is read chunk by chunk; rows are never all held in memory.
+        try:
+            profile = BankParsingProfile.objects.filter(bank_account_id=batch.bank_account_id).first()
+            rows = open_statement(file, profile=profile, engine=engine, reader_class=reader_class)
+        except StatementError as e:
+            jobs.mark_failed(batch, e.payload["detail"], errors_count=1)
+            return Response(e.payload, status=400)
+
+        # Parse -> continuity check -> batched insert, all streamed.
+        # The run is one transaction, so a failure leaves no rows behind.
+        try:
+            result = StatementIngest(batch, loader=loader).run(rows)
+            if result.rows_parsed > result.errors:
+                BankParsingProfile.learn(batch.bank_account_id, rows.layout())
+        except StatementError as e:
+            jobs.mark_failed(batch, e.payload["detail"], errors_count=1)
+            return Response(e.payload, status=400)
         except Exception as e:
-            batch.errors_count = 1
-            batch.save(update_fields=["errors_count"])
-            return Response({"detail": f"Invalid file: {e}"}, status=400)
-
-        required = {"date", "narration", "balance"}
-        missing = [k for k in required if k not in header_map]
-        if missing:
-            batch.errors_count = 1
-            batch.save(update_fields=["errors_count"])
-            return Response(
-                {
-                    "detail": f"Missing required column(s): {', '.join(missing)}",
-                    "detected_headers": reader.fieldnames,
-                },
-                status=400,
-            )
-
-        parsed_rows: List[dict] = []
-        errors = 0
-
-        for idx, raw in enumerate(reader, start=2):  # header is row 1
-            try:
-                date_val = raw.get(header_map["date"], "")
-                narration_val = raw.get(header_map["narration"], "")
-                balance_val = raw.get(header_map["balance"], "")
-
-                credit_val = raw.get(header_map.get("credit", ""), None) if "credit" in header_map else None
-                debit_val = raw.get(header_map.get("debit", ""), None) if "debit" in header_map else None
-                utr_val = raw.get(header_map.get("utr", ""), None) if "utr" in header_map else None
-                type_val = raw.get(header_map.get("type", ""), None) if "type" in header_map else None
-                amount_val = raw.get(header_map.get("amount", ""), None) if "amount" in header_map else None
-
-                # date (strict)
-                transaction_date = _parse_date_or_raise(date_val)
-
-                narration = narration_val
-                balance = _to_decimal(balance_val) or Decimal("0")
-                credit = _to_decimal(credit_val)
-                debit = _to_decimal(debit_val)
-                utr = (utr_val or "").strip() or None
-
-                # If only "Type (CR/DR)" + "Amount" is present
-                if credit is None and debit is None and (amount_val is not None) and (type_val is not None):
-                    amt = _to_decimal(amount_val) or Decimal("0")
-                    t = _norm(type_val)
-                    if t in {"cr", "credit"}:
-                        credit = amt
-                    elif t in {"dr", "debit"}:
-                        debit = amt
-
-                if credit is not None:
-                    signed = credit
-                elif debit is not None:
-                    signed = Decimal("0") - debit
-                else:
-                    signed = Decimal("0")
-
-                parsed_rows.append({
-                    "transaction_date": transaction_date,
-                    "narration": narration,
-                    "credit_amount": credit,
-                    "debit_amount": debit,
-                    "balance_amount": balance,
-                    "utr_number": utr,
-                    "signed_amount": signed,
-                })
-            except Exception:
-                errors += 1  # skip bad rows
-
-        # Balance continuity & previous ending balance checks
-        balance_continuity_in_file = _balance_continuity(parsed_rows)
-        previous_ending_balance_match = True
-        if parsed_rows:
-            first_row_opening = parsed_rows[0]["balance_amount"] - parsed_rows[0]["signed_amount"]
-            prev_tx = (
-                BankTransaction.objects
-                .filter(bank_account_id=bank_account_id)
-                .order_by("-transaction_date", "-created_at")
-                .first()
-            )
-            if prev_tx:
-                previous_ending_balance_match = (prev_tx.balance_amount == first_row_opening)
-
-        batch.balance_continuity_in_file = balance_continuity_in_file
-        batch.previous_ending_balance_match = previous_ending_balance_match
-
-        # Insert rows with DB-level dedupe enforcement
-        objs: List[BankTransaction] = []
-        for r in parsed_rows:
-            objs.append(BankTransaction(
-                bank_account_id=bank_account_id,
-                upload_batch=batch,
-                transaction_date=r["transaction_date"],
-                narration=r["narration"],
-                credit_amount=r["credit_amount"],
-                debit_amount=r["debit_amount"],
-                balance_amount=r["balance_amount"],
-                utr_number=r["utr_number"],
-                signed_amount=r["signed_amount"],  # recomputed in save, but we set it for bulk_create
-                source="BANK",
-            ))
-
-        with transaction.atomic():
-            # Precompute derived fields since bulk_create skips model.save()
-            for o in objs:
-                o.signed_amount = o._compute_signed_amount()
-                o.dedupe_key = o._build_dedupe_key()
-
-            inserted = BankTransaction.all_objects.bulk_create(
-                objs, ignore_conflicts=True, batch_size=1000
-            )
-            created = len(inserted)
-            skipped = max(0, len(objs) - created)
-
-            batch.uploaded_count = created
-            batch.skipped_count = skipped
-            batch.errors_count = errors
-            batch.save(update_fields=[
-                "uploaded_count", "skipped_count", "errors_count",
-                "balance_continuity_in_file", "previous_ending_balance_match",
-            ])
+            jobs.mark_failed(batch, f"{type(e).__name__}: {e}")
+            bad_data = isinstance(e, (DataError, ValueError, csv.Error))   # UnicodeDecodeError is a ValueError
+            return Response({"detail": batch.error_message}, status=400 if bad_data else 500)
 
         # Frontend expects these fields
         payload = BankUploadBatchSerializer(batch).data
         payload["upload_batch_id"] = str(batch.id)
-        payload["uploaded"] = created
-        payload["skipped_duplicates"] = skipped
-        payload["balance_continuity"] = "Valid" if balance_continuity_in_file else "Invalid"
+        payload["uploaded"] = result.created
+        payload["skipped_duplicates"] = result.skipped
+        payload["duplicate_rows"] = result.duplicate_rows
+        payload["duplicate_rows_truncated"] = result.skipped > len(result.duplicate_rows)
+        payload["balance_continuity"] = "Valid" if batch.balance_continuity_in_file else "Invalid"
         return Response(payload, status=status.HTTP_201_CREATED)
 
 
+class BulkUploadView(APIView):
+    """
+    Queue a zip of statement files (one background batch per file).
+    multipart/form-data:
+      - file: .zip of CSV/XLSX statements; files map to accounts via an optional manifest.csv
+              (file,account_number) or by name: <account_number>/x.csv, <account_number>_x.csv
+      - loader, engine: as for upload/
+    400 if a file, or all of them together, unpack past BANK_UPLOADS_ZIP_MAX_FILE_SIZE /
+    BANK_UPLOADS_ZIP_MAX_TOTAL_SIZE.
+    Returns 202 with the queued batches; poll upload-status/ for each.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request, *args, **kwargs):
+        file = request.FILES.get("file")
+        if not file:
+            return Response({"detail": "file is required"}, status=400)
+        if not (file.name or "").lower().endswith(".zip"):
+            return Response({"detail": "Only ZIP files are supported."}, status=400)
+
+        loader = request.data.get("loader") or DEFAULT_LOADER
+        if loader not in LOADERS:
+            return Response({"detail": f"loader must be one of: {', '.join(LOADERS)}"}, status=400)
+        engine = request.data.get("engine") or DEFAULT_ENGINE
+        if engine not in ENGINES:
+            return Response({"detail": f"engine must be one of: {', '.join(ENGINES)}"}, status=400)
+
+        try:
+            batches, unmatched = bulk_import.enqueue_archive(
+                file, loader=loader, engine=engine,
+                uploaded_by=request.user if request.user.is_authenticated else None,
+            )
+        except (ValueError, zipfile.BadZipFile) as e:
+            return Response({"detail": f"Invalid file: {e}"}, status=400)
+        if not batches and not unmatched:
+            return Response({"detail": "No statement files found in the zip."}, status=400)
+
+        return Response({
+            "batches": BankUploadBatchSerializer(batches, many=True).data,
+            "unmatched_files": unmatched,
+        }, status=status.HTTP_202_ACCEPTED)
+
+
 class BatchTransactionsView(APIView):
     """
     Returns transactions + totals for a given batch_id:
@@ -309,33 +177,174 @@ class BatchTransactionsView(APIView):
       "total_debit": 67.89,
       "final_balance": 456.78
     }
+    Newest first. Totals are stored on the batch at ingest.
+
+    Optional query params:
+      - limit / cursor: one keyset page on (transaction_date, created_at, id);
+        adds "next_cursor" (null on the last page). Without them every
+        transaction is returned, as before.
+      - stream=1: stream the full list as it is read from the database
+        instead of building the whole response in memory.
     """
     permission_classes = [IsAuthenticated]
 
+    ORDERING = ("-transaction_date", "-created_at", "-id")
+    STREAM_CHUNK_SIZE = 500
+
     def get(self, request, *args, **kwargs):
         batch_id = request.query_params.get("batch_id")
         if not batch_id:
             return Response({"detail": "batch_id is required"}, status=400)
 
+        try:
+            batch = BankUploadBatch.objects.filter(pk=batch_id).first()
+        except (ValueError, ValidationError):
+            batch = None
+        if not batch:
+            return Response({"detail": "Batch not found."}, status=404)
+
         qs = (BankTransaction.objects
-              .filter(upload_batch_id=batch_id)
-              .order_by("-transaction_date", "-created_at"))
+              .filter(upload_batch_id=batch.pk)
+              .select_related("bank_account__company"))
+        totals = {
+            "total_credit": batch.total_credit,
+            "total_debit": batch.total_debit,
+            "final_balance": batch.final_balance,
+        }
+
+        if request.query_params.get("stream") in ("1", "true", "True"):
+            return StreamingHttpResponse(self._stream(qs, totals), content_type="application/json")
+
+        cursor = request.query_params.get("cursor")
+        limit = request.query_params.get("limit")
+        if cursor or limit:
+            try:
+                rows, next_cursor = keyset_page(qs, self.ORDERING, cursor=cursor, limit=parse_limit(limit))
+            except InvalidCursor as e:
+                return Response({"detail": str(e)}, status=400)
+            return Response(
+                {"transactions": BankTransactionSerializer(rows, many=True).data, **totals, "next_cursor": next_cursor},
+                status=200,
+            )
 
-        txns = BankTransactionSerializer(qs, many=True).data
+        txns = BankTransactionSerializer(qs.order_by(*self.ORDERING), many=True).data
+        return Response({"transactions": txns, **totals}, status=200)
+
+    def _stream(self, qs, totals):
+        # same encoder the JSON renderer uses, so values render identically
+        encoder = JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+        yield encoder.encode(totals)[:-1] + ',"transactions":['
+        buf = []
+        first = True
+        for tx in qs.order_by(*self.ORDERING).iterator(chunk_size=self.STREAM_CHUNK_SIZE):
+            buf.append(("" if first else ",") + encoder.encode(BankTransactionSerializer(tx).data))
+            first = False
+            if len(buf) >= self.STREAM_CHUNK_SIZE:
+                yield "".join(buf)
+                buf = []
+        buf.append("]}")
+        yield "".join(buf)
+
+
+class RollbackBatchView(APIView):
+    """
+    Undo an upload (e.g. statement loaded into the wrong account):
+    POST { "batch_id": "<uuid>" }
+    Soft-deletes every transaction of the batch and deactivates their
+    classifications in set-based UPDATEs, then refreshes the batch counters,
+    totals and the account's balance breaks. Returns the updated batch plus
+    "rolled_back" / "classifications_deactivated" counts.
+    """
+    permission_classes = [IsAuthenticated]
 
-        aggs = qs.aggregate(total_credit=Sum("credit_amount"), total_debit=Sum("debit_amount"))
-        total_credit = aggs["total_credit"] or Decimal("0")
-        total_debit = aggs["total_debit"] or Decimal("0")
+    def post(self, request, *args, **kwargs):
+        batch_id = request.data.get("batch_id")
+        if not batch_id:
+            return Response({"detail": "batch_id is required"}, status=400)
 
-        last_tx = qs.order_by("transaction_date", "created_at").last()
-        final_balance = last_tx.balance_amount if last_tx else Decimal("0")
+        try:
+            batch = BankUploadBatch.objects.select_related("bank_account").filter(pk=batch_id).first()
+        except (ValueError, ValidationError):
+            batch = None
+        if not batch:
+            return Response({"detail": "Batch not found."}, status=404)
+        if batch.status == BankUploadBatch.STATUS_ROLLED_BACK:
+            return Response({"detail": "Batch is already rolled back."}, status=400)
+        if batch.status in (BankUploadBatch.STATUS_PENDING, BankUploadBatch.STATUS_PROCESSING):
+            return Response({"detail": "Batch is still being processed."}, status=400)
+
+        counts = batch.rollback()
+
+        payload = BankUploadBatchSerializer(batch).data
+        payload["rolled_back"] = counts["transactions"]
+        payload["classifications_deactivated"] = counts["classifications"]
+        return Response(payload, status=200)
+
+
+class UploadStatusView(APIView):
+    """
+    Progress of a (background) upload batch:
+    { "status": "PROCESSING", "rows_parsed": 12000, "uploaded_count": 11800, ... }
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        batch_id = request.query_params.get("batch_id")
+        if not batch_id:
+            return Response({"detail": "batch_id is required"}, status=400)
+
+        try:
+            batch = BankUploadBatch.objects.select_related("bank_account").filter(pk=batch_id).first()
+        except (ValueError, ValidationError):
+            batch = None
+        if not batch:
+            return Response({"detail": "Batch not found."}, status=404)
+
+        payload = BankUploadBatchSerializer(batch).data
+        payload["done"] = batch.status in (
+            BankUploadBatch.STATUS_COMPLETED, BankUploadBatch.STATUS_FAILED, BankUploadBatch.STATUS_ROLLED_BACK,
+        )
+        return Response(payload, status=200)
+
+
+class BalanceBreaksView(APIView):
+    """
+    Balance breaks and date gaps across an account's whole history:
+    GET ?bank_account_id=1[&kind=BALANCE|DATE_GAP]
+    {
+      "bank_account_id": 1,
+      "last_transaction_date": "2025-08-06",
+      "last_balance": "1234.50",
+      "count": 2,
+      "breaks": [...]
+    }
+    Reads the maintained BalanceBreak rows, so the cost is O(breaks).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        bank_account_id = request.query_params.get("bank_account_id")
+        if not bank_account_id:
+            return Response({"detail": "bank_account_id is required"}, status=400)
+        if not str(bank_account_id).isdigit() or not BankAccount.objects.filter(pk=bank_account_id).exists():
+            return Response({"detail": "Bank account not found."}, status=404)
+        kind = request.query_params.get("kind")
+        if kind and kind not in dict(BalanceBreak.KIND_CHOICES):
+            return Response({"detail": f"kind must be one of: {', '.join(dict(BalanceBreak.KIND_CHOICES))}"}, status=400)
+
+        state = balances.checkpoint(bank_account_id)
+        qs = BalanceBreak.objects.filter(bank_account_id=bank_account_id).order_by("transaction_date", "id")
+        if kind:
+            qs = qs.filter(kind=kind)
+        breaks = BalanceBreakSerializer(qs, many=True).data
 
         return Response(
             {
-                "transactions": txns,
-                "total_credit": total_credit,
-                "total_debit": total_debit,
-                "final_balance": final_balance,
+                "bank_account_id": int(bank_account_id),
+                "last_transaction_date": state.last_transaction_date,
+                "last_balance": state.last_balance,
+                "count": len(breaks),
+                "breaks": breaks,
             },
             status=200,
         )
@@ -359,8 +368,11 @@ class RecentUploadsView(APIView):
 
         rows = []
         for b in qs:
-            status_txt = "Passed" if (b.balance_continuity_in_file and b.previous_ending_balance_match and b.errors_count == 0) \
-                         else "Needs Review"
+            if b.status != BankUploadBatch.STATUS_COMPLETED:
+                status_txt = b.get_status_display()
+            else:
+                status_txt = "Passed" if (b.balance_continuity_in_file and b.previous_ending_balance_match and b.errors_count == 0) \
+                             else "Needs Review"
             rows.append({
                 "batch_id": str(b.id),
                 "upload_date": b.created_at.strftime("%Y-%m-%d %H:%M"),
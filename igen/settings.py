@@ -107,10 +107,22 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+# creates the tables reports/0004 expects on a fresh test database
+TEST_RUNNER = 'igen.test_runner.TestRunner'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# classification suggestion models (manage.py train_classification_suggestions)
+TX_CLASSIFY_MODEL_DIR = BASE_DIR / 'var' / 'tx_classify'
+# entity-report result cache (per worker): LRU size, and seconds an entry is
+# served at most
+REPORTS_CACHE_MAX_ENTRIES = 256
+REPORTS_CACHE_MAX_AGE = 300
+# bulk statement uploads (zip): largest unpacked size per file and in total
+BANK_UPLOADS_ZIP_MAX_FILE_SIZE = 50 * 1024 * 1024
+BANK_UPLOADS_ZIP_MAX_TOTAL_SIZE = 500 * 1024 * 1024
+
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
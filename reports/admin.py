@@ -1,8 +1,8 @@
 from django.contrib import admin
-from .models import TransactionLedgerCombined
+from .models import LedgerEntry
 
-@admin.register(TransactionLedgerCombined)
-class TransactionLedgerCombinedAdmin(admin.ModelAdmin):
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
     list_display = (
         'date',
         'source',
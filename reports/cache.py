@@ -0,0 +1,154 @@
+# reports/cache.py
+"""
+In-process LRU cache for entity-report results (list pages and summaries).
+
+Keys are the action, the normalised query parameters and the caller's
+company scope. Every key also carries the LedgerVersion of each company in
+scope (the sum over all companies for superusers), read with one query per
+request. reports.ledger bumps a company's version in the same transaction
+as every write to its entries, so once that commits no worker matches the
+old keys any more; they age out of the LRU. settings.REPORTS_CACHE_MAX_AGE
+caps how long any entry is served.
+
+    key = make_key("summary", request, company_ids)
+    data = results().get(key)
+    if data is None:
+        data = ...
+        results().put(key, data)
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Sum
+
+from .models import LedgerVersion
+
+# parameters that don't change the result
+IGNORED_PARAMS = ("format",)
+
+
+def _max_entries() -> int:
+    return getattr(settings, "REPORTS_CACHE_MAX_ENTRIES", 256)
+
+
+def _max_age() -> int:
+    return getattr(settings, "REPORTS_CACHE_MAX_AGE", 300)
+
+
+# ---------- ledger versions ----------
+
+def _versions(company_ids: Optional[list]) -> list:
+    """Versions of these companies (missing rows are 0); None: the sum over all of them."""
+    if company_ids is None:
+        return [LedgerVersion.objects.aggregate(total=Sum("version"))["total"] or 0]
+    found = dict(LedgerVersion.objects.filter(company_id__in=company_ids).values_list("company_id", "version"))
+    return [found.get(c, 0) for c in company_ids]
+
+
+def invalidate(company_ids: Iterable[int]) -> None:
+    """
+    Bump the ledger version of these companies. Call it inside the transaction
+    that writes their entries, so the new version commits with them.
+    """
+    ids = sorted({c for c in company_ids if c is not None})   # sorted: a fixed lock order
+    if not ids:
+        return
+    table = LedgerVersion._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (company_id, version) SELECT unnest(%s::bigint[]), 1"
+            f" ON CONFLICT (company_id) DO UPDATE SET version = {table}.version + 1",
+            [ids],
+        )
+
+
+# ---------- keys ----------
+
+def make_key(action: str, request, company_ids: Optional[Iterable[int]]) -> str:
+    """company_ids=None means unscoped (superuser)."""
+    params = sorted(
+        (k, sorted(v for v in values if v != ""))
+        for k, values in request.query_params.lists()
+        if k not in IGNORED_PARAMS and any(v != "" for v in values)
+    )
+    scope = None if company_ids is None else sorted(set(company_ids))
+    versions = _versions(scope)
+    raw = json.dumps(
+        [action, request.get_host(), params, scope, versions],
+        separators=(",", ":"),
+    )
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+# ---------- LRU ----------
+
+class ReportCache:
+    """Thread-safe LRU of (stored_at, value), bounded by entry count and age."""
+
+    def __init__(self, max_entries: int, max_age: float):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expired = 0
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] >= self.max_age:
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expired": self.expired,
+            }
+
+
+_cache: Optional[ReportCache] = None
+_cache_lock = threading.Lock()
+
+
+def results() -> ReportCache:
+    """The process-wide cache, created on first use from settings."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ReportCache(_max_entries(), _max_age())
+    return _cache
@@ -0,0 +1,201 @@
+# reports/export.py
+"""
+Entity-report exports. Every format reads only the report columns with
+values_list() through a chunked server-side cursor (QuerySet.iterator()
+on PostgreSQL), never full model instances.
+
+  - xlsx: write-only workbook. openpyxl spools rows to disk as they are
+    appended and the finished file goes to a temporary file that the view
+    streams back. Write-only sheets can't be revisited, so column widths are
+    estimated from the first SAMPLE_ROWS rows before any row is written, and
+    number formats come from named styles attached to each cell.
+  - csv: generated row by row for a StreamingHttpResponse.
+  - parquet / arrow (Arrow IPC file): one record batch per CHUNK_SIZE rows
+    written to a temporary file. Needs pyarrow, which is optional;
+    columnar_available() says whether it is installed.
+"""
+from __future__ import annotations
+
+import csv
+import tempfile
+from datetime import date
+from typing import Iterator, List, Sequence
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, NamedStyle
+from openpyxl.utils import get_column_letter
+
+from .summary import summarize
+
+SHEET_TITLE = "Entity-Wise Report"
+SAMPLE_ROWS = 500
+CHUNK_SIZE = 2000
+DATE_FORMAT = "DD-MMM-YYYY"
+
+# format -> (file extension, content type)
+FORMATS = {
+    "xlsx": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": ("csv", "text/csv; charset=utf-8"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+    "arrow": ("arrow", "application/vnd.apache.arrow.file"),
+}
+COLUMNAR = ("parquet", "arrow")
+
+# (xlsx header, csv/columnar name, values_list lookup, xlsx named style or None)
+COLUMNS = (
+    ("Date", "date", "date", "ledger_date"),
+    ("Source", "source", "source", None),
+    ("Amount", "amount", "amount", "ledger_amount"),
+    ("Cost Centre", "cost_centre", "cost_centre__name", None),
+    ("Entity", "entity", "entity__name", None),
+    ("Transaction Type", "transaction_type", "transaction_type__name", None),
+    ("Asset", "asset", "asset__name", None),
+    ("Contract", "contract", "contract__vendor__vendor_name", None),
+    ("Remarks", "remarks", "remarks", None),
+)
+HEADERS = [c[0] for c in COLUMNS]
+NAMES = [c[1] for c in COLUMNS]
+LOOKUPS = [c[2] for c in COLUMNS]
+
+
+def _named_styles() -> List[NamedStyle]:
+    return [
+        NamedStyle(name="ledger_header", font=Font(bold=True)),
+        NamedStyle(name="ledger_date", number_format=DATE_FORMAT),
+        NamedStyle(name="ledger_amount", number_format="#,##0.00"),
+        NamedStyle(name="ledger_label", font=Font(bold=True)),
+    ]
+
+
+def _blank(row: tuple) -> tuple:
+    return tuple("" if v is None else v for v in row)
+
+
+def rows(qs, blank: bool = True) -> Iterator[tuple]:
+    """Report rows in COLUMNS order; missing names are "" unless blank=False."""
+    for row in qs.values_list(*LOOKUPS).iterator(chunk_size=CHUNK_SIZE):
+        yield _blank(row) if blank else row
+
+
+def sample(qs, n: int = SAMPLE_ROWS) -> List[tuple]:
+    """The first n rows(qs), for width estimates (and to tell an empty report)."""
+    return [_blank(row) for row in qs.values_list(*LOOKUPS)[:n]]
+
+
+def _width(value) -> int:
+    if isinstance(value, date):
+        return len(DATE_FORMAT)
+    return len(str(value))
+
+
+def estimate_widths(sample: Sequence[tuple]) -> List[int]:
+    widths = [len(h) for h in HEADERS]
+    for row in sample:
+        widths = [max(w, _width(v)) for w, v in zip(widths, row)]
+    return [min(max(12, w + 2), 60) for w in widths]
+
+
+def write_xlsx(qs, head: Sequence[tuple]):
+    """
+    Write the report for qs to a temporary file and return it rewound.
+    head is sample(qs), used for the column widths.
+    """
+    wb = Workbook(write_only=True)
+    for style in _named_styles():
+        wb.add_named_style(style)
+    ws = wb.create_sheet(SHEET_TITLE)
+
+    for i, width in enumerate(estimate_widths(head)):
+        ws.column_dimensions[get_column_letter(i + 1)].width = width
+
+    def cell(value, style=None):
+        c = WriteOnlyCell(ws, value=value)
+        if style:
+            c.style = style
+        return c
+
+    ws.append([cell(h, "ledger_header") for h in HEADERS])
+    styles = [c[3] for c in COLUMNS]
+    for row in rows(qs):
+        ws.append([cell(v, s) if s else v for v, s in zip(row, styles)])
+
+    totals = summarize(qs)
+    ws.append([])
+    for label, value in (
+        ("Total Credit", totals["total_credit"]),
+        ("Total Debit", totals["total_debit"]),
+        ("Net Amount", totals["net"]),
+    ):
+        ws.append([cell(label, "ledger_label"), "", cell(value, "ledger_amount")])
+
+    out = tempfile.TemporaryFile()
+    wb.save(out)
+    out.seek(0)
+    return out
+
+
+# ---------- csv ----------
+
+class _Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(qs) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow(NAMES)
+    buf = []
+    for row in rows(qs):
+        buf.append(writer.writerow(row))
+        if len(buf) >= CHUNK_SIZE:
+            yield "".join(buf)
+            buf = []
+    if buf:
+        yield "".join(buf)
+
+
+# ---------- parquet / arrow ----------
+
+def columnar_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def write_columnar(qs, fmt: str):
+    """Write the report for qs as Parquet or an Arrow IPC file; returns the temp file rewound."""
+    import pyarrow as pa
+
+    schema = pa.schema(
+        [("date", pa.date32()), ("source", pa.string()), ("amount", pa.decimal128(12, 2))]
+        + [(name, pa.string()) for name in NAMES[3:]]
+    )
+    out = tempfile.TemporaryFile()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(out, schema)
+    else:
+        writer = pa.ipc.new_file(out, schema)
+
+    def flush(buf):
+        columns = list(zip(*buf))
+        writer.write_batch(pa.record_batch(
+            [pa.array(col, type=field.type) for col, field in zip(columns, schema)], schema=schema
+        ))
+
+    with writer:
+        buf = []
+        for row in rows(qs, blank=False):
+            buf.append(row)
+            if len(buf) >= CHUNK_SIZE:
+                flush(buf)
+                buf = []
+        if buf:
+            flush(buf)
+    out.seek(0)
+    return out
@@ -0,0 +1,182 @@
+# reports/ledger.py
+"""
+Keeps reports.LedgerEntry equal to v_transaction_ledger_combined.
+
+Entries are rebuilt per source row with one DELETE and one INSERT ... SELECT
+(the view's own expressions, restricted to the given ids):
+
+  - sync_bank_transactions(ids): after classifications of those bank
+    transactions change, or the transactions themselves do. Called from
+    tx_classify.services.refresh_classification_state(); single-row saves
+    of bank transactions are covered by reports/signals.py.
+  - remove_bank_transactions(queryset): batch rollback.
+  - sync_cash_entries(ids): after cash ledger entries are saved.
+
+Deleting a bank transaction, classification or cash entry deletes its
+entries (FK cascade). rebuild() recreates everything from scratch and
+check() diffs the table against the view; both back `manage.py rebuild_ledger`.
+
+Every function here bumps the LedgerVersion of the companies whose entries
+it touched, in the same transaction, which invalidates their cached report
+results (see reports/cache.py).
+"""
+from __future__ import annotations
+
+from typing import Iterable, List, Optional, Set
+
+from django.db import connection, transaction
+
+from . import cache as report_cache
+from .models import LedgerEntry
+
+TABLE = LedgerEntry._meta.db_table
+VIEW = "v_transaction_ledger_combined"
+
+# columns shared with the view, in the order they are compared
+COLUMNS = (
+    "id", "date", "amount", "cost_centre_id", "entity_id", "transaction_type_id",
+    "asset_id", "contract_id", "remarks", "source", "company_id",
+)
+
+_INSERT = f"INSERT INTO {TABLE} ({', '.join(COLUMNS)}, bank_transaction_id, classification_id, cash_entry_id)"
+
+_BANK_SELECT = """
+SELECT
+    ('B:' || tc.classification_id::text),
+    COALESCE(bt.transaction_date, tc.value_date)::date,
+    COALESCE(
+        tc.amount,
+        bt.signed_amount,
+        CASE
+            WHEN COALESCE(bt.debit_amount, 0) <> 0 THEN -1 * bt.debit_amount
+            WHEN COALESCE(bt.credit_amount, 0) <> 0 THEN bt.credit_amount
+            ELSE 0
+        END
+    ),
+    tc.cost_centre_id, tc.entity_id, tc.transaction_type_id, tc.asset_id, tc.contract_id,
+    tc.remarks, 'BANK', ba.company_id,
+    bt.id, tc.classification_id, NULL
+FROM tx_classify_transactionclassification tc
+JOIN bank_uploads_banktransaction bt ON bt.id = tc.bank_transaction_id
+JOIN banks_bankaccount ba ON ba.id = bt.bank_account_id
+WHERE COALESCE(tc.is_active_classification, TRUE) = TRUE
+  AND COALESCE(bt.is_deleted, FALSE) = FALSE
+"""
+
+_CASH_SELECT = """
+SELECT
+    ('C:' || c.id::text), c.date::date, c.amount,
+    c.cost_centre_id, c.entity_id, c.transaction_type_id, c.asset_id, c.contract_id,
+    c.remarks, 'CASH', c.company_id,
+    NULL, NULL, c.id
+FROM cash_ledger_cashledgerregister c
+WHERE TRUE
+"""
+
+
+def _run(cursor, statement: str, params: list, companies: Set[int]) -> int:
+    """
+    Run a DELETE/INSERT ... RETURNING company_id, adding the companies it
+    touched to companies; returns the row count.
+    """
+    cursor.execute(
+        f"WITH changed AS ({statement}) SELECT company_id, count(*) FROM changed GROUP BY company_id",
+        params,
+    )
+    count = 0
+    for company_id, n in cursor.fetchall():
+        companies.add(company_id)
+        count += n
+    return count
+
+
+def _delete(cursor, where: str, params: list, companies: Set[int]) -> int:
+    return _run(cursor, f"DELETE FROM {TABLE} WHERE {where} RETURNING company_id", params, companies)
+
+
+def _insert(cursor, select: str, params: list, companies: Set[int]) -> int:
+    return _run(cursor, f"{_INSERT} {select} RETURNING company_id", params, companies)
+
+
+def sync_bank_transactions(bank_transaction_ids: Iterable[int]) -> int:
+    """Re-derive the entries of these bank transactions; returns how many exist now."""
+    ids = list(bank_transaction_ids)
+    if not ids:
+        return 0
+    with transaction.atomic(savepoint=False), connection.cursor() as cursor:
+        companies: Set[int] = set()
+        _delete(cursor, "bank_transaction_id = ANY(%s)", [ids], companies)
+        # filter on the classification side, where bank_transaction_id is indexed
+        count = _insert(cursor, f"{_BANK_SELECT} AND tc.bank_transaction_id = ANY(%s)", [ids], companies)
+        report_cache.invalidate(companies)
+    return count
+
+
+def remove_bank_transactions(bank_transactions) -> int:
+    """
+    Drop the entries of a BankTransaction queryset whose rows no longer have
+    any (e.g. a rolled back batch). The queryset runs as a subquery.
+    """
+    sql, params = bank_transactions.values("id").query.sql_with_params()
+    companies: Set[int] = set()
+    with transaction.atomic(savepoint=False), connection.cursor() as cursor:
+        count = _delete(cursor, f"bank_transaction_id IN ({sql})", list(params), companies)
+        report_cache.invalidate(companies)
+    return count
+
+
+def sync_cash_entries(cash_entry_ids: Iterable[int]) -> int:
+    ids = list(cash_entry_ids)
+    if not ids:
+        return 0
+    with transaction.atomic(savepoint=False), connection.cursor() as cursor:
+        companies: Set[int] = set()
+        _delete(cursor, "cash_entry_id = ANY(%s)", [ids], companies)
+        count = _insert(cursor, f"{_CASH_SELECT} AND c.id = ANY(%s)", [ids], companies)
+        report_cache.invalidate(companies)
+    return count
+
+
+def rebuild(company_id: Optional[int] = None) -> int:
+    """Recreate all entries (or one company's) from the source tables."""
+    with transaction.atomic(savepoint=False), connection.cursor() as cursor:
+        if company_id is None:
+            cursor.execute(f"SELECT DISTINCT company_id FROM {TABLE}")
+            companies = {row[0] for row in cursor.fetchall()}
+            cursor.execute(f"TRUNCATE {TABLE}")
+            count = _insert(cursor, _BANK_SELECT, [], companies)
+            count += _insert(cursor, _CASH_SELECT, [], companies)
+        else:
+            companies = {company_id}
+            _delete(cursor, "company_id = %s", [company_id], companies)
+            count = _insert(cursor, f"{_BANK_SELECT} AND ba.company_id = %s", [company_id], companies)
+            count += _insert(cursor, f"{_CASH_SELECT} AND c.company_id = %s", [company_id], companies)
+        report_cache.invalidate(companies)
+    return count
+
+
+def check(company_id: Optional[int] = None, sample: int = 20) -> dict:
+    """
+    Rows the view has that the table lacks ("missing") and the other way
+    round ("extra"), compared on every view column. A changed row shows up
+    in both.
+    """
+    cols = ", ".join(COLUMNS)
+    where, params = ("WHERE company_id = %s", [company_id]) if company_id is not None else ("", [])
+    out = {}
+    with connection.cursor() as cursor:
+        for name, left, right in (("missing", VIEW, TABLE), ("extra", TABLE, VIEW)):
+            cursor.execute(
+                f"""
+                SELECT id FROM (
+                    SELECT {cols} FROM {left} {where}
+                    EXCEPT ALL
+                    SELECT {cols} FROM {right} {where}
+                ) diff ORDER BY id
+                """,
+                params * 2,
+            )
+            ids: List[str] = [row[0] for row in cursor.fetchall()]
+            out[name] = {"count": len(ids), "ids": ids[:sample]}
+    out["ok"] = not out["missing"]["count"] and not out["extra"]["count"]
+    return out
@@ -0,0 +1,43 @@
+# reports/management/commands/rebuild_ledger.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from companies.models import Company
+from reports import ledger
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the materialised ledger (reports.LedgerEntry) from classifications, "
+        "bank transactions and cash entries. With --check, only compare it with "
+        "v_transaction_ledger_combined and fail if they differ."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--company", type=int, help="company id (default: all)")
+        parser.add_argument("--check", action="store_true", help="compare with the view instead of rebuilding")
+
+    def handle(self, *args, **opts):
+        company_id = opts["company"]
+        if company_id is not None and not Company.objects.filter(pk=company_id).exists():
+            raise CommandError(f"No company with id {company_id}.")
+
+        started = time.perf_counter()
+        if opts["check"]:
+            result = ledger.check(company_id)
+            for name in ("missing", "extra"):
+                diff = result[name]
+                if diff["count"]:
+                    self.stdout.write(f"{name}: {diff['count']} row(s), e.g. {', '.join(diff['ids'])}")
+            if not result["ok"]:
+                raise CommandError("Ledger differs from v_transaction_ledger_combined; run rebuild_ledger.")
+            self.stdout.write(self.style.SUCCESS(
+                f"Ledger matches the view ({time.perf_counter() - started:.1f}s)."
+            ))
+            return
+
+        count = ledger.rebuild(company_id)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {count} ledger entr{'y' if count == 1 else 'ies'} in {time.perf_counter() - started:.1f}s."
+        ))
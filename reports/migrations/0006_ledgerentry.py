@@ -0,0 +1,83 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# initial fill, same rows as v_transaction_ledger_combined (reports/ledger.py keeps it in step)
+FILL_SQL = r"""
+INSERT INTO reports_ledgerentry (
+    id, date, amount, cost_centre_id, entity_id, transaction_type_id, asset_id, contract_id,
+    remarks, source, company_id, bank_transaction_id, classification_id, cash_entry_id
+)
+SELECT
+    ('B:' || tc.classification_id::text),
+    COALESCE(bt.transaction_date, tc.value_date)::date,
+    COALESCE(
+        tc.amount,
+        bt.signed_amount,
+        CASE
+            WHEN COALESCE(bt.debit_amount, 0) <> 0 THEN -1 * bt.debit_amount
+            WHEN COALESCE(bt.credit_amount, 0) <> 0 THEN bt.credit_amount
+            ELSE 0
+        END
+    ),
+    tc.cost_centre_id, tc.entity_id, tc.transaction_type_id, tc.asset_id, tc.contract_id,
+    tc.remarks, 'BANK', ba.company_id,
+    bt.id, tc.classification_id, NULL
+FROM tx_classify_transactionclassification tc
+JOIN bank_uploads_banktransaction bt ON bt.id = tc.bank_transaction_id
+JOIN banks_bankaccount ba ON ba.id = bt.bank_account_id
+WHERE COALESCE(tc.is_active_classification, TRUE) = TRUE
+  AND COALESCE(bt.is_deleted, FALSE) = FALSE
+
+UNION ALL
+
+SELECT
+    ('C:' || c.id::text), c.date::date, c.amount,
+    c.cost_centre_id, c.entity_id, c.transaction_type_id, c.asset_id, c.contract_id,
+    c.remarks, 'CASH', c.company_id,
+    NULL, NULL, c.id
+FROM cash_ledger_cashledgerregister c;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0001_initial'),
+        ('bank_uploads', '0009_banktransaction_version_claims'),
+        ('cash_ledger', '0002_cashledgerregister_document'),
+        ('companies', '0002_company_is_active'),
+        ('contracts', '0003_remove_contract_asset'),
+        ('cost_centres', '0001_initial'),
+        ('entities', '0003_alter_entity_created_at_alter_entity_entity_type_and_more'),
+        ('reports', '0005_create_combined_ledger_view'),
+        ('transaction_types', '0002_transactiontype_is_credit'),
+        ('tx_classify', '0003_classification_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('remarks', models.TextField(blank=True, null=True)),
+                ('source', models.CharField(choices=[('BANK', 'BANK'), ('CASH', 'CASH')], max_length=10)),
+                ('asset', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, to='assets.asset')),
+                ('bank_transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='bank_uploads.banktransaction')),
+                ('cash_entry', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='cash_ledger.cashledgerregister')),
+                ('classification', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='tx_classify.classification')),
+                ('company', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, to='companies.company')),
+                ('contract', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, to='contracts.contract')),
+                ('cost_centre', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, to='cost_centres.costcentre')),
+                ('entity', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, to='entities.entity')),
+                ('transaction_type', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, to='transaction_types.transactiontype')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['company', 'entity', 'date'], name='ledger_company_entity_date')],
+            },
+        ),
+        migrations.RunSQL(FILL_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0002_company_is_active'),
+        ('reports', '0006_ledgerentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerVersion',
+            fields=[
+                ('company', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='+', serialize=False, to='companies.company')),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
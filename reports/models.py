@@ -19,3 +19,60 @@ class TransactionLedgerCombined(models.Model):
     class Meta:
         managed = False
         db_table = 'v_transaction_ledger_combined'
+
+
+class LedgerEntry(models.Model):
+    """
+    Materialised copy of v_transaction_ledger_combined (same ids, same
+    values), kept in step by reports.ledger: one row per active
+    classification of a live bank transaction ('B:<classification uuid>')
+    and one per cash ledger entry ('C:<id>'). Reports read this table; the
+    view stays as the reference `manage.py rebuild_ledger --check` compares
+    against.
+    """
+    id = models.CharField(primary_key=True, max_length=64)
+    # reference FKs are neither constrained nor indexed (like the view's);
+    # reports go through the (company, entity, date) index
+    date = models.DateField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    cost_centre = models.ForeignKey('cost_centres.CostCentre', on_delete=models.DO_NOTHING, db_constraint=False, db_index=False)
+    entity = models.ForeignKey('entities.Entity', on_delete=models.DO_NOTHING, db_constraint=False, db_index=False)
+    transaction_type = models.ForeignKey('transaction_types.TransactionType', on_delete=models.DO_NOTHING, db_constraint=False, db_index=False)
+    asset = models.ForeignKey('assets.Asset', null=True, blank=True, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False)
+    contract = models.ForeignKey('contracts.Contract', null=True, blank=True, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False)
+    remarks = models.TextField(null=True, blank=True)
+    source = models.CharField(max_length=10, choices=[('BANK', 'BANK'), ('CASH', 'CASH')])
+    company = models.ForeignKey('companies.Company', on_delete=models.DO_NOTHING, db_constraint=False, db_index=False)
+
+    # where the row came from; deleting the source deletes the entry
+    bank_transaction = models.ForeignKey(
+        'bank_uploads.BankTransaction', null=True, blank=True, on_delete=models.CASCADE,
+        related_name='ledger_entries',
+    )
+    classification = models.ForeignKey(
+        'tx_classify.Classification', null=True, blank=True, on_delete=models.CASCADE,
+        related_name='ledger_entries',
+    )
+    cash_entry = models.ForeignKey(
+        'cash_ledger.CashLedgerRegister', null=True, blank=True, on_delete=models.CASCADE,
+        related_name='ledger_entries',
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['company', 'entity', 'date'], name='ledger_company_entity_date'),
+        ]
+
+
+class LedgerVersion(models.Model):
+    """
+    Per-company version of the ledger entries. reports.ledger bumps it in the
+    same transaction as every write to a company's entries, and cached report
+    results are keyed on it (reports/cache.py). Rows are never deleted, so the
+    sum over all companies grows with every bump.
+    """
+    company = models.OneToOneField(
+        'companies.Company', primary_key=True, on_delete=models.DO_NOTHING, db_constraint=False,
+        related_name='+',
+    )
+    version = models.BigIntegerField(default=0)
@@ -1,10 +1,10 @@
 # reports/serializers.py
 from rest_framework import serializers
-from .models import TransactionLedgerCombined
+from .models import LedgerEntry
 
 
 class TransactionLedgerSerializer(serializers.ModelSerializer):
-    # Primary key coming from the SQL VIEW ('B:<uuid>' / 'C:<int>')
+    # Primary key as in the SQL VIEW ('B:<uuid>' / 'C:<int>')
     id = serializers.CharField(read_only=True)
 
     # Friendly names for display
@@ -15,7 +15,7 @@ class TransactionLedgerSerializer(serializers.ModelSerializer):
     contract_name = serializers.CharField(source='contract.name', read_only=True)
 
     class Meta:
-        model = TransactionLedgerCombined
+        model = LedgerEntry
         # keep fields explicit (stable across refactors & avoids surprises)
         fields = [
             'id',
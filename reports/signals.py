@@ -0,0 +1,97 @@
+# reports/signals.py
+"""
+Single-row saves of ledger sources (admin, cash ledger CRUD, one-off
+edits). Classification writers go through
+tx_classify.services.refresh_classification_state(), which syncs the
+ledger itself; deletes cascade, so they only need to bump the ledger
+version (in the deleting transaction), once per company per delete() call.
+Entries carry their account's company, so moving an account to another
+company re-derives its entries under the new one.
+"""
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from bank_uploads.models import BankTransaction
+from banks.models import BankAccount
+from cash_ledger.models import CashLedgerRegister
+
+from . import cache as report_cache
+from . import ledger
+
+_deleting = threading.local()
+
+
+def _delete_state(origin) -> dict:
+    """
+    Scratch state shared by the post_delete signals of one delete() call
+    (origin is the instance or queryset it was called on), until commit.
+    """
+    state = getattr(_deleting, "state", None)
+    if state is None or state[0] is not origin:
+        state = _deleting.state = (origin, {"accounts": {}, "companies": set()})
+        transaction.on_commit(_reset_delete_state)
+    return state[1]
+
+
+def _reset_delete_state():
+    _deleting.state = None
+
+
+def _invalidate_once(state: dict, company_id) -> None:
+    if company_id not in state["companies"]:
+        state["companies"].add(company_id)
+        report_cache.invalidate([company_id])
+
+
+@receiver(post_save, sender=BankTransaction)
+def sync_bank_transaction(sender, instance, created, **kwargs):
+    if not created:  # a new transaction has no classifications yet
+        ledger.sync_bank_transactions([instance.pk])
+
+
+@receiver(post_save, sender=CashLedgerRegister)
+def sync_cash_entry(sender, instance, **kwargs):
+    ledger.sync_cash_entries([instance.pk])
+
+
+@receiver(pre_save, sender=BankAccount)
+def remember_account_company(sender, instance, raw=False, **kwargs):
+    if instance.pk is not None and not raw:
+        instance._ledger_company_id = (BankAccount.objects
+                                       .filter(pk=instance.pk)
+                                       .values_list("company_id", flat=True)
+                                       .first())
+
+
+@receiver(post_save, sender=BankAccount)
+def sync_account_company(sender, instance, created, raw=False, **kwargs):
+    old_company_id = getattr(instance, "_ledger_company_id", None)
+    if created or raw or old_company_id in (None, instance.company_id):
+        return
+    with transaction.atomic(savepoint=False):
+        ledger.sync_bank_transactions(
+            BankTransaction.all_objects.filter(bank_account=instance).values_list("id", flat=True)
+        )
+        report_cache.invalidate([old_company_id, instance.company_id])
+    instance._ledger_company_id = instance.company_id
+
+
+@receiver(post_delete, sender=BankTransaction)
+def invalidate_bank_transaction(sender, instance, origin=None, **kwargs):
+    state = _delete_state(origin)
+    accounts = state["accounts"]
+    if instance.bank_account_id not in accounts:
+        # one lookup per account per delete; the account row still exists here,
+        # even when its own delete cascaded to the transactions
+        accounts[instance.bank_account_id] = (BankAccount.objects
+                                              .values_list("company_id", flat=True)
+                                              .get(pk=instance.bank_account_id))
+    _invalidate_once(state, accounts[instance.bank_account_id])
+
+
+@receiver(post_delete, sender=CashLedgerRegister)
+def invalidate_cash_entry(sender, instance, origin=None, **kwargs):
+    _invalidate_once(_delete_state(origin), instance.company_id)
@@ -0,0 +1,89 @@
+# reports/summary.py
+"""
+Credit / debit / net totals for a ledger queryset, computed with
+conditional aggregates: one query for the totals and the per-source
+breakdown, plus one GROUP BY query per requested dimension.
+
+    summarize(qs)                                # totals + by_source
+    summarize(qs, ["cost_centre", "month"])      # ... + groups
+"""
+from __future__ import annotations
+
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, Iterable, List
+
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+
+Q2 = Decimal("0.01")
+
+SOURCES = ("BANK", "CASH")
+
+# dimension -> {output key: field lookup or expression}
+DIMENSIONS = {
+    "cost_centre": {"id": "cost_centre", "name": "cost_centre__name"},
+    "transaction_type": {"id": "transaction_type", "name": "transaction_type__name"},
+    "month": {"month": TruncMonth("date")},
+}
+
+
+def _aggregates(prefix: str = "", where: Q = Q()) -> dict:
+    return {
+        f"{prefix}credit": Sum("amount", filter=where & Q(amount__gt=0)),
+        f"{prefix}debit": Sum("amount", filter=where & Q(amount__lt=0)),
+        f"{prefix}count": Count("pk", filter=where) if where else Count("pk"),
+    }
+
+
+def _totals(row: dict, prefix: str = "") -> dict:
+    credit = row[f"{prefix}credit"] or Decimal("0")
+    debit = row[f"{prefix}debit"] or Decimal("0")   # negative
+    return {
+        "credit": credit.quantize(Q2, rounding=ROUND_HALF_UP),
+        "debit": (-debit).quantize(Q2, rounding=ROUND_HALF_UP),
+        "net": (credit + debit).quantize(Q2, rounding=ROUND_HALF_UP),
+        "count": row[f"{prefix}count"],
+    }
+
+
+def parse_group_by(value: str | None) -> List[str]:
+    """'cost_centre,month' -> ['cost_centre', 'month']; raises ValueError on unknown names."""
+    names = [v.strip() for v in (value or "").split(",") if v.strip()]
+    unknown = [n for n in names if n not in DIMENSIONS]
+    if unknown:
+        raise ValueError(
+            f"Unknown group_by: {', '.join(unknown)}. Use any of: {', '.join(DIMENSIONS)}."
+        )
+    return list(dict.fromkeys(names))
+
+
+def summarize(qs, group_by: Iterable[str] = ()) -> Dict:
+    qs = qs.order_by()
+    aggregates = _aggregates()
+    for source in SOURCES:
+        aggregates.update(_aggregates(f"{source}_", Q(source=source)))
+    row = qs.aggregate(**aggregates)
+
+    totals = _totals(row)
+    out = {
+        "total_credit": totals["credit"],
+        "total_debit": totals["debit"],
+        "net": totals["net"],
+        "count": totals["count"],
+        "by_source": {source: _totals(row, f"{source}_") for source in SOURCES},
+    }
+
+    groups = {}
+    for name in group_by:
+        keys = DIMENSIONS[name]
+        lookups = [v for v in keys.values() if isinstance(v, str)]
+        expressions = {k: v for k, v in keys.items() if not isinstance(v, str)}
+        rows = qs.values(*lookups, **expressions).annotate(**_aggregates())
+        rows = rows.order_by(*lookups, *expressions)
+        groups[name] = [
+            {k: r[v if isinstance(v, str) else k] for k, v in keys.items()} | _totals(r)
+            for r in rows
+        ]
+    if groups:
+        out["groups"] = groups
+    return out
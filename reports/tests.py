@@ -1,3 +1,230 @@
-from django.test import TestCase
+# reports/tests.py
+import csv
+import io
+from datetime import date
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from bank_uploads.models import BankTransaction, BankUploadBatch
+from banks.models import BankAccount
+from companies.models import Company
+from cost_centres.models import CostCentre
+from entities.models import Entity
+from transaction_types.models import TransactionType
+from tx_classify.models import Classification
+from tx_classify.services import refresh_classification_state
+
+from . import cache, export, ledger
+from .cache import ReportCache, make_key
+from .models import LedgerEntry, LedgerVersion
+from .export import DATE_FORMAT, HEADERS, NAMES, estimate_widths, stream_csv
+from .summary import DIMENSIONS, parse_group_by
+
+
+# ---------- cache ----------
+
+class ReportCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch("reports.cache.time.monotonic", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_evicts_least_recently_used(self):
+        c = ReportCache(max_entries=2, max_age=60)
+        c.put("a", 1)
+        c.put("b", 2)
+        self.assertEqual(c.get("a"), 1)   # b is now the oldest
+        c.put("c", 3)
+        self.assertIsNone(c.get("b"))
+        self.assertEqual((c.get("a"), c.get("c")), (1, 3))
+        self.assertEqual(c.evictions, 1)
+
+    def test_put_refreshes_an_existing_key(self):
+        c = ReportCache(max_entries=2, max_age=60)
+        c.put("a", 1)
+        c.put("b", 2)
+        c.put("a", 10)
+        c.put("c", 3)
+        self.assertEqual((c.get("a"), c.get("b")), (10, None))
+
+    def test_entries_expire_after_max_age(self):
+        c = ReportCache(max_entries=10, max_age=60)
+        c.put("a", 1)
+        self.now += 59.9
+        self.assertEqual(c.get("a"), 1)   # a hit doesn't extend the age
+        self.now += 0.1
+        self.assertIsNone(c.get("a"))
+        self.assertEqual((c.expired, c.stats()["entries"]), (1, 0))
+
+    def test_stats(self):
+        c = ReportCache(max_entries=1, max_age=60)
+        self.assertIsNone(c.stats()["hit_rate"])
+        c.put("a", 1)
+        c.get("a")
+        c.get("a")
+        c.get("b")
+        c.put("b", 2)
+        self.assertEqual(c.stats(), {
+            "entries": 1, "max_entries": 1, "hits": 2, "misses": 1,
+            "hit_rate": 0.6667, "evictions": 1, "expired": 0,
+        })
+        c.clear()
+        self.assertEqual(c.stats()["entries"], 0)
+
+
+def _request(query: str) -> Request:
+    return Request(APIRequestFactory().get(f"/api/reports/entity/{query}"))
+
+
+class MakeKeyTests(SimpleTestCase):
+    def setUp(self):
+        self.versions = {}
+        patcher = mock.patch.object(cache, "_versions", side_effect=self._versions)
+        self.fetched = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _versions(self, company_ids):
+        # what LedgerVersion would hold: None is the sum over all companies
+        if company_ids is None:
+            return [sum(self.versions.values())]
+        return [self.versions.get(c, 0) for c in company_ids]
+
+    def test_parameter_order_blanks_and_ignored_params_dont_matter(self):
+        key = make_key("list", _request("?entity=1&entity=2&month=2025-08"), [1])
+        for query in ("?month=2025-08&entity=2&entity=1", "?entity=2&month=2025-08&entity=1&format=xlsx",
+                      "?entity=1&entity=2&entity=&month=2025-08&cost_centre="):
+            with self.subTest(query=query):
+                self.assertEqual(make_key("list", _request(query), [1]), key)
+
+    def test_scope_is_a_set(self):
+        self.assertEqual(make_key("list", _request(""), [2, 1, 2]), make_key("list", _request(""), [1, 2]))
+        self.fetched.assert_called_with([1, 2])
+
+    def test_distinguishes_action_params_scope_and_versions(self):
+        key = make_key("list", _request("?entity=1"), [1])
+        self.assertNotEqual(make_key("summary", _request("?entity=1"), [1]), key)
+        self.assertNotEqual(make_key("list", _request("?entity=2"), [1]), key)
+        self.assertNotEqual(make_key("list", _request("?entity=1"), [1, 2]), key)
+        self.assertNotEqual(make_key("list", _request("?entity=1"), None), key)
+        self.versions[1] = 1
+        self.assertNotEqual(make_key("list", _request("?entity=1"), [1]), key)
+
+    def test_unscoped_key_follows_every_company(self):
+        key = make_key("list", _request(""), None)
+        self.versions[7] = 1
+        self.assertNotEqual(make_key("list", _request(""), None), key)
+
+
+# ---------- summary ----------
+
+class ParseGroupByTests(SimpleTestCase):
+    def test_empty(self):
+        for value in (None, "", " , ,"):
+            self.assertEqual(parse_group_by(value), [])
+
+    def test_strips_and_dedupes_in_order(self):
+        self.assertEqual(parse_group_by(" month,cost_centre , month"), ["month", "cost_centre"])
+        self.assertEqual(parse_group_by(",".join(DIMENSIONS)), list(DIMENSIONS))
+
+    def test_rejects_unknown_names(self):
+        with self.assertRaisesMessage(ValueError, "Unknown group_by: entity, Month."):
+            parse_group_by("month,entity,Month")
+
+
+# ---------- export ----------
+
+def _row(**values) -> tuple:
+    """A report row with "" everywhere except the given columns (by csv name)."""
+    return tuple(values.get(name, "") for name in NAMES)
+
+
+class EstimateWidthsTests(SimpleTestCase):
+    def test_headers_only(self):
+        self.assertEqual(estimate_widths([]), [max(12, len(h) + 2) for h in HEADERS])
+
+    def test_widest_value_wins_within_bounds(self):
+        widths = estimate_widths([
+            _row(date=date(2025, 8, 6), amount=Decimal("-1234567.89"), entity="x" * 30),
+            _row(entity="y" * 20, remarks="z" * 500),
+        ])
+        self.assertEqual(widths[HEADERS.index("Date")], max(12, len(DATE_FORMAT) + 2))
+        self.assertEqual(widths[HEADERS.index("Amount")], len("-1234567.89") + 2)
+        self.assertEqual(widths[HEADERS.index("Entity")], 32)
+        self.assertEqual(widths[HEADERS.index("Remarks")], 60)
+
+
+class StreamCsvTests(SimpleTestCase):
+    def _stream(self, report_rows, chunk_size=2):
+        qs = object()
+        with mock.patch.object(export, "rows", return_value=iter(report_rows)) as rows, \
+                mock.patch.object(export, "CHUNK_SIZE", chunk_size):
+            chunks = list(stream_csv(qs))
+        rows.assert_called_once_with(qs)
+        return chunks
+
+    def test_header_then_rows_in_chunks(self):
+        report_rows = [
+            _row(date=date(2025, 8, 6), source="BANK", amount=Decimal("10.50"), remarks='say "hi", then\nleave'),
+            _row(date=date(2025, 8, 7), source="CASH", amount=Decimal("-3.00"), entity="Ünïcode"),
+            _row(source="BANK", amount=Decimal("0.00")),
+        ]
+        chunks = self._stream(report_rows)
+        self.assertEqual(len(chunks), 3)   # header, 2 rows, the last row
+        parsed = list(csv.reader(io.StringIO("".join(chunks))))
+        self.assertEqual(parsed[0], NAMES)
+        self.assertEqual(parsed[1:], [[str(v) for v in row] for row in report_rows])
+
+    def test_empty_report_is_just_the_header(self):
+        self.assertEqual(self._stream([]), [",".join(NAMES) + "\r\n"])
+
+
+# ---------- ledger ----------
+
+class LedgerCompanyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.acme = Company.objects.create(name="Acme", pan="ABCDE1234F")
+        cls.globex = Company.objects.create(name="Globex", pan="ZYXWV9876K")
+        cls.account = BankAccount.objects.create(
+            company=cls.acme, account_name="Main", account_number="111", bank_name="HDFC", ifsc="HDFC0000001",
+        )
+        batch = BankUploadBatch.objects.create(bank_account=cls.account, file_name="s.csv")
+        txn = BankTransaction.objects.create(
+            bank_account=cls.account, upload_batch=batch, transaction_date=date(2025, 8, 1), narration="NEFT CR",
+            credit_amount=Decimal("100.00"), balance_amount=Decimal("100.00"),
+        )
+        cost_centre = CostCentre.objects.create(company=cls.acme, name="Ops")
+        Classification.objects.create(
+            bank_transaction=txn, cost_centre=cost_centre, amount=Decimal("100.00"), value_date=txn.transaction_date,
+            transaction_type=TransactionType.objects.create(
+                company=cls.acme, name="Sales", cost_centre=cost_centre, direction="Credit", is_credit=True,
+            ),
+            entity=Entity.objects.create(company=cls.acme, name="HQ", entity_type="Internal"),
+        )
+        refresh_classification_state([txn.pk])
+
+    def _versions(self):
+        return dict(LedgerVersion.objects.values_list("company_id", "version"))
+
+    def test_moving_an_account_moves_its_entries(self):
+        self.assertEqual(list(LedgerEntry.objects.values_list("company_id", flat=True)), [self.acme.pk])
+        before = self._versions()
+
+        self.account.company = self.globex
+        self.account.save()
+        self.assertEqual(list(LedgerEntry.objects.values_list("company_id", flat=True)), [self.globex.pk])
+        after = self._versions()
+        self.assertGreater(after[self.acme.pk], before[self.acme.pk])
+        self.assertGreater(after[self.globex.pk], before.get(self.globex.pk, 0))
+        self.assertTrue(ledger.check()["ok"])
+
+    def test_other_account_edits_leave_the_ledger_alone(self):
+        before = self._versions()
+        self.account.account_name = "Renamed"
+        self.account.save()
+        self.assertEqual(self._versions(), before)
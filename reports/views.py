@@ -1,24 +1,20 @@
 # reports/views.py
 from datetime import datetime
-from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from decimal import Decimal, InvalidOperation
 
-from django.db.models import Sum
-from django.http import HttpResponse
-from django.utils.encoding import iri_to_uri
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
 from django_filters.rest_framework import DjangoFilterBackend
-from openpyxl import Workbook
-from openpyxl.styles import Alignment, Font, numbers
-from openpyxl.utils import get_column_letter
 from rest_framework import filters, permissions, viewsets
 from rest_framework.decorators import action
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 
-from .models import TransactionLedgerCombined
+from . import cache as report_cache
+from . import export
+from .models import LedgerEntry
 from .serializers import TransactionLedgerSerializer
-
-
-Q2 = Decimal("0.01")  # 2-decimal quantize helper
+from .summary import parse_group_by, summarize
 
 
 class ReportPagination(PageNumberPagination):
@@ -33,9 +29,16 @@ class TransactionLedgerViewSet(viewsets.ReadOnlyModelViewSet):
 
     Required query params: start_date, end_date, entity
     Optional: cost_centre, transaction_type, source, min_amount, max_amount
+    summary/ also takes group_by=cost_centre,transaction_type,month
+    export/ takes format=xlsx (default), csv, parquet or arrow
+
+    Reads the materialised ledger (LedgerEntry, indexed on company/entity/date)
+    rather than the v_transaction_ledger_combined view it mirrors. List pages
+    and summaries are cached per filter set until the ledger of a company in
+    scope changes (reports/cache.py; X-Report-Cache: hit|miss).
     """
     permission_classes = [permissions.IsAuthenticated]
-    queryset = TransactionLedgerCombined.objects.all().order_by("-date")
+    queryset = LedgerEntry.objects.all().order_by("-date")
     serializer_class = TransactionLedgerSerializer
     pagination_class = ReportPagination
 
@@ -54,6 +57,11 @@ class TransactionLedgerViewSet(viewsets.ReadOnlyModelViewSet):
 
     # ---- helpers -------------------------------------------------------------
 
+    def perform_content_negotiation(self, request, force=False):
+        # export/ uses ?format= for the file type, which DRF would otherwise
+        # take as a renderer override and answer with 404
+        return super().perform_content_negotiation(request, force=force or self.action == "export")
+
     def _required_params(self):
         qp = self.request.query_params
         return qp.get("start_date"), qp.get("end_date"), qp.get("entity")
@@ -70,6 +78,53 @@ class TransactionLedgerViewSet(viewsets.ReadOnlyModelViewSet):
             return None, None
         return sd, ed
 
+    def _validation_error(self):
+        # get_queryset() sets the same flags, but only once the queryset is
+        # built; check up front so bad params get a 400 instead of no rows
+        start_date, end_date, entity_id = self._required_params()
+        if not start_date or not end_date or not entity_id:
+            self._missing = {
+                "start_date": bool(start_date),
+                "end_date": bool(end_date),
+                "entity": bool(entity_id),
+            }
+        else:
+            self._parse_dates(start_date, end_date)
+
+        if getattr(self, "_date_error", False):
+            return Response({"detail": "Invalid date format. Use YYYY-MM-DD."}, status=400)
+        if getattr(self, "_range_error", False):
+            return Response({"detail": "start_date cannot be after end_date."}, status=400)
+        if getattr(self, "_missing", None):
+            missing = [k for k, ok in self._missing.items() if not ok]
+            return Response({"detail": f"Missing required filter(s): {', '.join(missing)}"}, status=400)
+        return None
+
+    def _company_scope(self):
+        """The user's company ids, or None for superusers (unscoped)."""
+        if not hasattr(self, "_scope"):
+            user = self.request.user
+            if getattr(user, "is_superuser", False):
+                self._scope = None
+            elif not hasattr(user, "companies"):
+                self._scope = []
+            else:
+                self._scope = list(user.companies.values_list("id", flat=True))
+        return self._scope
+
+    def _cached(self, action_name, compute):
+        """Response with compute()'s data, served from the report cache when the ledger hasn't changed."""
+        results = report_cache.results()
+        key = report_cache.make_key(action_name, self.request, self._company_scope())
+        data = results.get(key)
+        hit = data is not None
+        if not hit:
+            data = compute()
+            results.put(key, data)
+        resp = Response(data)
+        resp["X-Report-Cache"] = "hit" if hit else "miss"
+        return resp
+
     def _parse_decimal(self, s):
         try:
             return Decimal(s)
@@ -79,7 +134,6 @@ class TransactionLedgerViewSet(viewsets.ReadOnlyModelViewSet):
     # ---- queryset ------------------------------------------------------------
 
     def get_queryset(self):
-        user = self.request.user
         qs = (
             super()
             .get_queryset()
@@ -94,10 +148,8 @@ class TransactionLedgerViewSet(viewsets.ReadOnlyModelViewSet):
         )
 
         # Tenant scoping: user -> companies M2M
-        if not getattr(user, "is_superuser", False):
-            if not hasattr(user, "companies"):
-                return qs.none()
-            company_ids = list(user.companies.values_list("id", flat=True))
+        company_ids = self._company_scope()
+        if company_ids is not None:
             if not company_ids:
                 return qs.none()
             qs = qs.filter(company_id__in=company_ids)
@@ -136,125 +188,69 @@ class TransactionLedgerViewSet(viewsets.ReadOnlyModelViewSet):
     # ---- list with validation feedback --------------------------------------
 
     def list(self, request, *args, **kwargs):
-        if getattr(self, "_date_error", False):
-            return Response({"detail": "Invalid date format. Use YYYY-MM-DD."}, status=400)
-        if getattr(self, "_range_error", False):
-            return Response({"detail": "start_date cannot be after end_date."}, status=400)
-        if getattr(self, "_missing", None):
-            missing = [k for k, ok in self._missing.items() if not ok]
-            return Response({"detail": f"Missing required filter(s): {', '.join(missing)}"}, status=400)
-        return super().list(request, *args, **kwargs)
+        error = self._validation_error()
+        if error is not None:
+            return error
+        page = super().list
+        return self._cached("list", lambda: page(request, *args, **kwargs).data)
 
     # ---- summary -------------------------------------------------------------
 
     @action(detail=False, methods=["get"], url_path="summary")
     def summary(self, request):
-        if getattr(self, "_date_error", False):
-            return Response({"detail": "Invalid date format. Use YYYY-MM-DD."}, status=400)
-        if getattr(self, "_range_error", False):
-            return Response({"detail": "start_date cannot be after end_date."}, status=400)
-        if getattr(self, "_missing", None):
-            missing = [k for k, ok in self._missing.items() if not ok]
-            return Response({"detail": f"Missing required filter(s): {', '.join(missing)}"}, status=400)
+        error = self._validation_error()
+        if error is not None:
+            return error
 
-        qs = self.filter_queryset(self.get_queryset())
-
-        total_credit = qs.filter(amount__gt=0).aggregate(total=Sum("amount"))["total"] or Decimal("0")
-        total_debit = qs.filter(amount__lt=0).aggregate(total=Sum("amount"))["total"] or Decimal("0")
-        net = total_credit + total_debit  # debit is negative
+        try:
+            group_by = parse_group_by(request.query_params.get("group_by"))
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=400)
 
-        return Response(
-            {
-                "total_credit": total_credit.quantize(Q2, rounding=ROUND_HALF_UP),
-                "total_debit": (-total_debit if total_debit < 0 else total_debit).quantize(Q2, rounding=ROUND_HALF_UP),
-                "net": net.quantize(Q2, rounding=ROUND_HALF_UP),
-            }
+        return self._cached(
+            "summary", lambda: summarize(self.filter_queryset(self.get_queryset()), group_by)
         )
 
+    @action(detail=False, methods=["get"], url_path="cache-stats",
+            permission_classes=[permissions.IsAdminUser])
+    def cache_stats(self, request):
+        """Hit/miss counters of this worker's report cache."""
+        return Response(report_cache.results().stats())
+
     # ---- export --------------------------------------------------------------
 
     @action(detail=False, methods=["get"], url_path="export")
     def export(self, request):
-        if getattr(self, "_date_error", False):
-            return Response({"detail": "Invalid date format. Use YYYY-MM-DD."}, status=400)
-        if getattr(self, "_range_error", False):
-            return Response({"detail": "start_date cannot be after end_date."}, status=400)
-        if getattr(self, "_missing", None):
-            missing = [k for k, ok in self._missing.items() if not ok]
-            return Response({"detail": f"Missing required filter(s): {', '.join(missing)}"}, status=400)
+        error = self._validation_error()
+        if error is not None:
+            return error
+
+        fmt = request.query_params.get("format") or "xlsx"
+        if fmt not in export.FORMATS:
+            return Response(
+                {"detail": f"Unsupported format. Use one of: {', '.join(export.FORMATS)}."}, status=400
+            )
+        if fmt in export.COLUMNAR and not export.columnar_available():
+            return Response({"detail": f"{fmt} export requires pyarrow, which is not installed."}, status=400)
 
         qs = self.filter_queryset(self.get_queryset())
-        if not qs.exists():
+        head = export.sample(qs, export.SAMPLE_ROWS if fmt == "xlsx" else 1)
+        if not head:
             return Response({"detail": "No data to export."}, status=204)
 
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Entity-Wise Report"
-
-        headers = [
-            "Date",
-            "Source",
-            "Amount",
-            "Cost Centre",
-            "Entity",
-            "Transaction Type",
-            "Asset",
-            "Contract",
-            "Remarks",
-        ]
-        ws.append(headers)
-        for cell in ws[1]:
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(vertical="center")
-
-        for row in qs.iterator():
-            ws.append([
-                row.date,
-                row.source,
-                row.amount,
-                getattr(row.cost_centre, "name", ""),
-                getattr(row.entity, "name", ""),
-                getattr(row.transaction_type, "name", ""),
-                getattr(row.asset, "name", ""),
-                getattr(row.contract, "name", ""),
-                row.remarks or "",
-            ])
-
-        # formats
-        for r in range(2, ws.max_row + 1):
-            ws[f"A{r}"].number_format = numbers.FORMAT_DATE_DDMMMYYYY
-            ws[f"C{r}"].number_format = numbers.FORMAT_NUMBER_00
-
-        # summary
-        ws.append([])
-        total_credit = qs.filter(amount__gt=0).aggregate(total=Sum("amount"))["total"] or Decimal("0")
-        total_debit = qs.filter(amount__lt=0).aggregate(total=Sum("amount"))["total"] or Decimal("0")
-        net = total_credit + total_debit
-
-        for label, value in (
-            ("Total Credit", total_credit),
-            ("Total Debit", -total_debit if total_debit < 0 else total_debit),
-            ("Net Amount", net),
-        ):
-            ws.append([label, "", value])
-            ws[f"C{ws.max_row}"].number_format = numbers.FORMAT_NUMBER_00
-            ws[f"A{ws.max_row}"].font = Font(bold=True)
-
-        # simple best-fit widths
-        for col in range(1, ws.max_column + 1):
-            letter = get_column_letter(col)
-            max_len = max(len(str(c.value)) if c.value is not None else 0 for c in ws[letter])
-            ws.column_dimensions[letter].width = min(max(12, max_len + 2), 60)
-
-        entity_name = getattr(qs.first().entity, "name", "entity")
+        extension, content_type = export.FORMATS[fmt]
+        entity_name = head[0][export.LOOKUPS.index("entity__name")] or "entity"
         start_date = request.query_params.get("start_date")
         end_date = request.query_params.get("end_date")
-        fname = f"entity_wise_{entity_name}_{start_date}_to_{end_date}.xlsx"
-        fname = iri_to_uri(fname.replace(" ", "_"))
-
-        resp = HttpResponse(
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-        resp["Content-Disposition"] = f'attachment; filename="{fname}"'
-        wb.save(resp)
-        return resp
+        fname = f"entity_wise_{entity_name}_{start_date}_to_{end_date}.{extension}"
+        fname = fname.replace(" ", "_")
+
+        if fmt == "csv":
+            resp = StreamingHttpResponse(export.stream_csv(qs), content_type=content_type)
+            # the same header FileResponse builds: entity names may need quoting or RFC 5987 encoding
+            resp["Content-Disposition"] = content_disposition_header(True, fname)
+            return resp
+
+        # written to a temp file chunk by chunk, then streamed back
+        out = export.write_xlsx(qs, head) if fmt == "xlsx" else export.write_columnar(qs, fmt)
+        return FileResponse(out, as_attachment=True, filename=fname, content_type=content_type)
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Classification
+from .models import Classification, ClassificationRule
+from .services import refresh_classification_state
 
 @admin.register(Classification)
 class ClassificationAdmin(admin.ModelAdmin):
@@ -8,16 +9,17 @@ class ClassificationAdmin(admin.ModelAdmin):
         "bank_transaction",
         "amount",
         "is_active_classification",
+        "operation",
         "value_date",
         "created_at",
     )
-    list_filter = ("is_active_classification",)
+    list_filter = ("is_active_classification", "operation")
     search_fields = (
         "remarks",
         "bank_transaction__narration",
         "bank_transaction__utr_number",
     )
-    readonly_fields = ("created_at",)
+    readonly_fields = ("created_at", "operation", "operation_id", "supersedes")
     date_hierarchy = "value_date"
     ordering = ("-created_at",)
 
@@ -43,3 +45,37 @@ class ClassificationAdmin(admin.ModelAdmin):
 
     # Optional quality-of-life: reduce page size (uncomment if you like)
     # list_per_page = 50
+
+    # Admin edits skip the API write paths; keep the stored state and ledger in step
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        refresh_classification_state([obj.bank_transaction_id])
+
+    def delete_model(self, request, obj):
+        bank_transaction_id = obj.bank_transaction_id
+        super().delete_model(request, obj)
+        refresh_classification_state([bank_transaction_id])
+
+    def delete_queryset(self, request, queryset):
+        ids = set(queryset.values_list("bank_transaction_id", flat=True))
+        super().delete_queryset(request, queryset)
+        refresh_classification_state(ids)
+
+
+@admin.register(ClassificationRule)
+class ClassificationRuleAdmin(admin.ModelAdmin):
+    list_display = (
+        "name",
+        "company",
+        "priority",
+        "is_active",
+        "narration_pattern",
+        "utr_prefix",
+        "direction",
+        "transaction_type",
+    )
+    list_filter = ("company", "is_active", "direction")
+    search_fields = ("name", "narration_pattern", "utr_prefix")
+    readonly_fields = ("created_at", "updated_at")
+    list_select_related = ("company", "transaction_type")
+    raw_id_fields = ("transaction_type", "cost_centre", "entity", "contract")
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TxClassifyConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tx_classify'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (reference-data invalidation)
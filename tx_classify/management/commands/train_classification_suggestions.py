@@ -0,0 +1,41 @@
+# tx_classify/management/commands/train_classification_suggestions.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from companies.models import Company
+from tx_classify import suggest
+
+
+class Command(BaseCommand):
+    help = (
+        "Train the per-company classification suggestion models from active "
+        "classifications and write them to TX_CLASSIFY_MODEL_DIR. Web workers "
+        "pick up a new file on their next request; run it nightly or after bulk classifying."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--company", type=int, action="append", help="company id (repeatable; default: all)")
+        parser.add_argument("--min-examples", type=int, default=20,
+                            help="skip companies with fewer classified transactions than this")
+
+    def handle(self, *args, **opts):
+        companies = Company.objects.order_by("pk")
+        if opts["company"]:
+            companies = companies.filter(pk__in=opts["company"])
+            missing = set(opts["company"]) - set(companies.values_list("pk", flat=True))
+            if missing:
+                raise CommandError(f"No company with id {', '.join(map(str, sorted(missing)))}.")
+
+        for company in companies:
+            started = time.perf_counter()
+            model = suggest.NaiveBayesSuggester.train(suggest.training_rows(company.pk))
+            if model.trained_on < opts["min_examples"]:
+                self.stdout.write(f"{company}: {model.trained_on} example(s), skipped")
+                continue
+            path = suggest.model_path(company.pk)
+            model.save(path)
+            self.stdout.write(self.style.SUCCESS(
+                f"{company}: {model.trained_on} example(s), {len(model.labels)} label(s), "
+                f"{len(model.weights)} word(s) -> {path} in {time.perf_counter() - started:.1f}s"
+            ))
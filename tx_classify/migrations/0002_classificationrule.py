@@ -0,0 +1,44 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0002_company_is_active'),
+        ('contracts', '0003_remove_contract_asset'),
+        ('cost_centres', '0001_initial'),
+        ('entities', '0003_alter_entity_created_at_alter_entity_entity_type_and_more'),
+        ('transaction_types', '0002_transactiontype_is_credit'),
+        ('tx_classify', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassificationRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('priority', models.PositiveIntegerField(default=100)),
+                ('is_active', models.BooleanField(default=True)),
+                ('narration_pattern', models.CharField(blank=True, default='', max_length=255)),
+                ('utr_prefix', models.CharField(blank=True, default='', max_length=100)),
+                ('min_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True)),
+                ('max_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True)),
+                ('direction', models.CharField(choices=[('Credit', 'Credit'), ('Debit', 'Debit'), ('Both', 'Both')], default='Both', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='classification_rules', to='companies.company')),
+                ('contract', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='contracts.contract')),
+                ('cost_centre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cost_centres.costcentre')),
+                ('entity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='entities.entity')),
+                ('transaction_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='transaction_types.transactiontype')),
+            ],
+            options={
+                'ordering': ['company', 'priority', 'id'],
+                'indexes': [models.Index(fields=['company', 'is_active'], name='tx_classify_company_486db7_idx')],
+            },
+        ),
+    ]
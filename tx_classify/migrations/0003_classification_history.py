@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0001_initial'),
+        ('bank_uploads', '0008_banktransaction_classification_state'),
+        ('contracts', '0003_remove_contract_asset'),
+        ('cost_centres', '0001_initial'),
+        ('entities', '0003_alter_entity_created_at_alter_entity_entity_type_and_more'),
+        ('transaction_types', '0002_transactiontype_is_credit'),
+        ('tx_classify', '0002_classificationrule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classification',
+            name='operation',
+            field=models.CharField(blank=True, choices=[('CLASSIFY', 'Classify'), ('BULK_CLASSIFY', 'Bulk classify'), ('AUTO_CLASSIFY', 'Auto-classify'), ('SPLIT', 'Split'), ('RESPLIT', 'Re-split'), ('RECLASSIFY', 'Re-classify')], default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='classification',
+            name='operation_id',
+            field=models.UUIDField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='classification',
+            name='supersedes',
+            field=models.ForeignKey(blank=True, db_column='supersedes_id', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='superseded_by', to='tx_classify.classification'),
+        ),
+        migrations.AddIndex(
+            model_name='classification',
+            index=models.Index(fields=['operation', 'created_at'], name='tx_classify_operati_1074f3_idx'),
+        ),
+    ]
@@ -5,6 +5,7 @@ import uuid
 from django.db import models
 
 from bank_uploads.models import BankTransaction
+from companies.models import Company
 from transaction_types.models import TransactionType
 from cost_centres.models import CostCentre
 from entities.models import Entity
@@ -16,7 +17,25 @@ class Classification(models.Model):
     """
     Mirrors EXISTING table: tx_classify_transactionclassification
     DO NOT MIGRATE this model; we just map columns correctly.
+
+    History: rows are never edited, a change deactivates rows and inserts
+    replacements. `supersedes` points from a replacement to the row it
+    replaced, and every row written by one request shares `operation_id`.
     """
+    OP_CLASSIFY = "CLASSIFY"
+    OP_BULK_CLASSIFY = "BULK_CLASSIFY"
+    OP_AUTO_CLASSIFY = "AUTO_CLASSIFY"
+    OP_SPLIT = "SPLIT"
+    OP_RESPLIT = "RESPLIT"
+    OP_RECLASSIFY = "RECLASSIFY"
+    OPERATION_CHOICES = [
+        (OP_CLASSIFY, "Classify"),
+        (OP_BULK_CLASSIFY, "Bulk classify"),
+        (OP_AUTO_CLASSIFY, "Auto-classify"),
+        (OP_SPLIT, "Split"),
+        (OP_RESPLIT, "Re-split"),
+        (OP_RECLASSIFY, "Re-classify"),
+    ]
 
     # PK in DB is UUID named classification_id (NOT NULL)
     classification_id = models.UUIDField(
@@ -72,6 +91,18 @@ class Classification(models.Model):
     is_active_classification = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # history (blank on rows written before it was recorded)
+    supersedes = models.ForeignKey(
+        "self",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="superseded_by",
+        db_column="supersedes_id",
+    )
+    operation = models.CharField(max_length=20, choices=OPERATION_CHOICES, blank=True, default="")
+    operation_id = models.UUIDField(null=True, blank=True, db_index=True)
+
     class Meta:
         db_table = "tx_classify_transactionclassification"
         # managed = False
@@ -79,7 +110,74 @@ class Classification(models.Model):
         indexes = [
             models.Index(fields=["bank_transaction"]),
             models.Index(fields=["is_active_classification"]),
+            models.Index(fields=["operation", "created_at"]),
         ]
 
     def __str__(self) -> str:
         return f"{self.classification_id} | tx={self.bank_transaction_id} | ₹{self.amount}"
+
+
+class ClassificationRule(models.Model):
+    """
+    Auto-classification rule (see tx_classify/rules.py).
+
+    A rule matches a bank transaction when every condition it sets holds:
+      - narration_pattern: these words appear together, in order, in the narration
+        (case and punctuation ignored: "neft cr acme" matches "NEFT-CR/ACME Corp")
+      - utr_prefix: the UTR / reference number starts with it (case-insensitive)
+      - min_amount / max_amount: bounds on the absolute amount
+      - direction: Credit, Debit or Both
+    When several rules match, the lowest priority number wins (then the oldest rule).
+    """
+    DIRECTION_CHOICES = [
+        ("Credit", "Credit"),
+        ("Debit", "Debit"),
+        ("Both", "Both"),
+    ]
+
+    company = models.ForeignKey(
+        Company,
+        on_delete=models.CASCADE,
+        related_name="classification_rules",
+    )
+    name = models.CharField(max_length=255)
+    priority = models.PositiveIntegerField(default=100)
+    is_active = models.BooleanField(default=True)
+
+    # conditions (unset = don't care)
+    narration_pattern = models.CharField(max_length=255, blank=True, default="")
+    utr_prefix = models.CharField(max_length=100, blank=True, default="")
+    min_amount = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True)
+    max_amount = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True)
+    direction = models.CharField(max_length=10, choices=DIRECTION_CHOICES, default="Both")
+
+    # what a match is classified as
+    transaction_type = models.ForeignKey(TransactionType, on_delete=models.CASCADE, related_name="+")
+    cost_centre = models.ForeignKey(CostCentre, on_delete=models.CASCADE, related_name="+")
+    entity = models.ForeignKey(Entity, on_delete=models.CASCADE, related_name="+")
+    contract = models.ForeignKey(Contract, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["company", "priority", "id"]
+        indexes = [
+            models.Index(fields=["company", "is_active"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.name} | company={self.company_id} | priority {self.priority}"
+
+
+class ReferenceDataVersion(models.Model):
+    """
+    Version counter of a company's classification reference data (transaction
+    types, cost centres, entities, assets, contracts); bumped in the same
+    transaction as the change. See tx_classify/reference.py.
+    """
+    key = models.CharField(max_length=32, primary_key=True)   # company id, or "shared"
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"{self.key} v{self.version}"
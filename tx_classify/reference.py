@@ -0,0 +1,167 @@
+# tx_classify/reference.py
+"""
+Per-company reference data for classification: transaction types, cost
+centres, entities, assets and contracts, as plain dicts keyed by id.
+
+One snapshot per company is built with five small queries and kept in
+process; classification serializers validate ids against it and the
+reference-data/ endpoint serves it (with an ETag) to the frontend.
+
+Each snapshot is tagged with the company's ReferenceDataVersion rows (its
+own and the "shared" one for entities without a company). Saving or
+deleting any of those models bumps the version in the same transaction
+(see signals.py), so every worker sees the change as soon as it commits:
+a lookup reads the current versions with one query and rebuilds the
+snapshot if they moved. Queryset .update()/.delete() bypass the signals,
+so call invalidate() after those, inside the same transaction.
+
+    snap = for_company(company_id)
+    snap.get("transaction_types", 12)   # -> {"id": 12, "name": ..., ...} or None
+    snaps = for_companies({1, 2})       # one version query for all of them
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+
+from django.db import connection
+from django.db.models import Q
+
+from assets.models import Asset
+from contracts.models import Contract
+from cost_centres.models import CostCentre
+from entities.models import Entity
+from transaction_types.models import TransactionType
+
+from .models import ReferenceDataVersion
+
+KINDS = ("transaction_types", "cost_centres", "entities", "assets", "contracts")
+
+# request field -> snapshot kind
+FIELD_KINDS = {
+    "transaction_type_id": "transaction_types",
+    "cost_centre_id": "cost_centres",
+    "entity_id": "entities",
+    "asset_id": "assets",
+    "contract_id": "contracts",
+}
+
+_SHARED = "shared"   # entities without a company appear in every snapshot
+
+
+@dataclass(frozen=True)
+class ReferenceSnapshot:
+    company_id: int
+    version: tuple
+    etag: str
+    data: Dict[str, Dict[int, dict]]
+
+    def get(self, kind: str, pk) -> Optional[dict]:
+        return self.data[kind].get(pk)
+
+    def as_dict(self) -> dict:
+        return {
+            "company_id": self.company_id,
+            "etag": self.etag,
+            **{kind: list(rows.values()) for kind, rows in self.data.items()},
+        }
+
+
+def _rows(company_id: int) -> Dict[str, list]:
+    return {
+        "transaction_types": [
+            {"id": pk, "name": name, "direction": direction, "cost_centre_id": cc,
+             "is_active": status == "Active"}
+            for pk, name, direction, cc, status in TransactionType.objects
+            .filter(company_id=company_id).order_by("name")
+            .values_list("pk", "name", "direction", "cost_centre_id", "status")
+        ],
+        "cost_centres": [
+            {"id": pk, "name": name, "direction": direction, "is_active": active}
+            for pk, name, direction, active in CostCentre.objects
+            .filter(company_id=company_id).order_by("name")
+            .values_list("pk", "name", "transaction_direction", "is_active")
+        ],
+        "entities": [
+            {"id": pk, "name": name, "entity_type": entity_type, "is_active": status == "Active"}
+            for pk, name, entity_type, status in Entity.objects
+            .filter(Q(company_id=company_id) | Q(company__isnull=True)).order_by("name", "pk")
+            .values_list("pk", "name", "entity_type", "status")
+        ],
+        "assets": [
+            {"id": pk, "name": name, "is_active": active}
+            for pk, name, active in Asset.objects
+            .filter(company_id=company_id).order_by("name", "pk")
+            .values_list("pk", "name", "is_active")
+        ],
+        "contracts": [
+            {"id": pk, "name": vendor, "cost_centre_id": cc, "entity_id": en, "is_active": active}
+            for pk, vendor, cc, en, active in Contract.objects
+            .filter(company_id=company_id).order_by("pk")
+            .values_list("pk", "vendor__vendor_name", "cost_centre_id", "entity_id", "is_active")
+        ],
+    }
+
+
+def _versions(company_ids) -> Dict[int, tuple]:
+    """company id -> (shared version, company version), with one query; missing rows are 0."""
+    keys = [_SHARED, *(str(c) for c in company_ids)]
+    found = dict(ReferenceDataVersion.objects.filter(key__in=keys).values_list("key", "version"))
+    return {c: (found.get(_SHARED, 0), found.get(str(c), 0)) for c in company_ids}
+
+
+def invalidate(company_id: Optional[int]) -> None:
+    """
+    Mark a company's snapshot stale (None: data shared by every company).
+    Call it inside the transaction that changes the data.
+    """
+    key = _SHARED if company_id is None else str(company_id)
+    table = ReferenceDataVersion._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (key, version) VALUES (%s, 1)"
+            f" ON CONFLICT (key) DO UPDATE SET version = {table}.version + 1",
+            [key],
+        )
+
+
+_snapshots: Dict[int, ReferenceSnapshot] = {}
+_lock = threading.Lock()
+
+
+def _build(company_id: int, version: tuple) -> ReferenceSnapshot:
+    rows = _rows(company_id)
+    digest = hashlib.sha1(json.dumps(rows, sort_keys=True, default=str).encode()).hexdigest()
+    return ReferenceSnapshot(
+        company_id=company_id,
+        version=version,
+        etag=f'"{digest[:20]}"',   # content hash: unchanged data keeps its ETag across rebuilds
+        data={kind: {r["id"]: r for r in rows[kind]} for kind in KINDS},
+    )
+
+
+def for_companies(company_ids: Iterable[int]) -> Dict[int, ReferenceSnapshot]:
+    """
+    Current snapshots of these companies, rebuilding the ones whose version
+    moved. The versions are read before the rows, so a snapshot is never
+    tagged newer than its data.
+    """
+    versions = _versions({int(c) for c in company_ids})
+    out = {}
+    for company_id, version in versions.items():
+        snap = _snapshots.get(company_id)
+        if snap is None or snap.version != version:
+            with _lock:
+                snap = _snapshots.get(company_id)
+                if snap is None or snap.version != version:
+                    snap = _snapshots[company_id] = _build(company_id, version)
+        out[company_id] = snap
+    return out
+
+
+def for_company(company_id: int) -> ReferenceSnapshot:
+    """The company's current snapshot (one version query; rebuilt when invalidated)."""
+    return for_companies([company_id])[int(company_id)]
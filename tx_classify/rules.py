@@ -0,0 +1,249 @@
+# tx_classify/rules.py
+"""
+Rule-based auto-classification.
+
+A company's active ClassificationRules are compiled once into a RuleSet:
+  - narration patterns go into a single Aho-Corasick automaton over word
+    tokens, so each narration is scanned once however many rules there are;
+  - UTR prefixes go into one lookup table per prefix length;
+  - rules with neither are candidates for every transaction.
+Per transaction only the handful of rules that were hit get their remaining
+conditions (amount range, direction, UTR prefix) checked, in priority order.
+
+    result = auto_classify(bank_account_id)                 # creates Classification rows
+    result = auto_classify(bank_account_id, dry_run=True)   # counts only
+"""
+from __future__ import annotations
+
+import re
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from bank_uploads.models import BankTransaction
+from banks.models import BankAccount
+
+from . import services
+from .models import Classification, ClassificationRule
+
+# transactions read / classifications written per round trip
+CHUNK_SIZE = 2000
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokens(text: Optional[str]) -> List[str]:
+    """Lower-cased words of a narration; punctuation and spacing don't matter."""
+    return _TOKEN.findall((text or "").lower())
+
+
+def _q2(x: Decimal) -> Decimal:
+    return (x or Decimal("0")).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+class TokenAutomaton:
+    """Aho-Corasick over word sequences: which patterns occur (contiguously) in a token list."""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[tuple] = [()]
+
+    def add(self, words: Sequence[str], value) -> None:
+        state = 0
+        for w in words:
+            nxt = self._goto[state].get(w)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][w] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] += (value,)
+
+    def build(self) -> "TokenAutomaton":
+        goto, fail, out = self._goto, self._fail, self._out
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for w, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and w not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(w, 0)
+                out[nxt] += out[fail[nxt]]
+        return self
+
+    def search(self, words: Iterable[str]) -> Set:
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        state = 0
+        for w in words:
+            while state and w not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(w, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+class RuleSet:
+    """A company's rules compiled for matching; see the module docstring."""
+
+    def __init__(self, rules: Iterable[ClassificationRule]):
+        self.rules: List[ClassificationRule] = sorted(rules, key=lambda r: (r.priority, r.id))
+        self._automaton = TokenAutomaton()
+        self._by_utr_prefix: Dict[int, Dict[str, List[int]]] = {}   # prefix length -> prefix -> rules
+        self._always: List[int] = []
+        self._checks = []
+        for i, rule in enumerate(self.rules):
+            words = tokens(rule.narration_pattern)
+            prefix = (rule.utr_prefix or "").strip().lower()
+            if words:
+                self._automaton.add(words, i)
+            elif prefix:
+                self._by_utr_prefix.setdefault(len(prefix), {}).setdefault(prefix, []).append(i)
+            else:
+                self._always.append(i)
+            self._checks.append((prefix, rule.min_amount, rule.max_amount, rule.direction))
+        self._automaton.build()
+
+    @classmethod
+    def for_company(cls, company_id: int) -> "RuleSet":
+        return cls(ClassificationRule.objects.filter(company_id=company_id, is_active=True))
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def _accepts(self, i: int, utr: str, signed_amount: Decimal) -> bool:
+        prefix, lo, hi, direction = self._checks[i]
+        if prefix and not utr.startswith(prefix):
+            return False
+        amount = abs(signed_amount)
+        if lo is not None and amount < lo:
+            return False
+        if hi is not None and amount > hi:
+            return False
+        if direction == "Credit":
+            return signed_amount >= 0
+        if direction == "Debit":
+            return signed_amount < 0
+        return True
+
+    def match(self, narration: Optional[str], utr: Optional[str], signed_amount: Decimal) -> Optional[ClassificationRule]:
+        """The winning rule for a transaction, or None."""
+        hits = self._automaton.search(tokens(narration))
+        utr = (utr or "").strip().lower()
+        for length, by_prefix in self._by_utr_prefix.items():
+            hits.update(by_prefix.get(utr[:length], ()))
+        hits.update(self._always)
+        for i in sorted(hits):  # index order is priority order
+            if self._accepts(i, utr, signed_amount):
+                return self.rules[i]
+        return None
+
+
+@dataclass
+class AutoClassifyResult:
+    scanned: int = 0
+    matched: int = 0
+    created: int = 0
+    by_rule: Dict[int, int] = field(default_factory=dict)           # rule id -> transactions matched
+    created_by_rule: Dict[int, int] = field(default_factory=dict)   # rule id -> classifications created
+
+    def as_dict(self) -> dict:
+        return {
+            "scanned": self.scanned,
+            "matched": self.matched,
+            "created": self.created,
+            "by_rule": [
+                {"rule_id": k, "matched": v, "created": self.created_by_rule.get(k, 0)}
+                for k, v in sorted(self.by_rule.items())
+            ],
+        }
+
+
+def auto_classify(bank_account_id: int, *, date_from=None, date_to=None,
+                  rules: Optional[RuleSet] = None, dry_run: bool = False) -> AutoClassifyResult:
+    """
+    Classify every unclassified active transaction of an account that a rule
+    matches: one active Classification for the full amount, inserted with
+    bulk_create a chunk at a time. Zero-amount transactions, rows someone has
+    claimed and rows locked by a concurrent writer are skipped.
+    """
+    if rules is None:
+        company_id = BankAccount.objects.values_list("company_id", flat=True).get(pk=bank_account_id)
+        rules = RuleSet.for_company(company_id)
+    result = AutoClassifyResult()
+    if not len(rules):
+        return result
+
+    qs = (BankTransaction.objects
+          .filter(bank_account_id=bank_account_id, classification_status=BankTransaction.STATUS_UNCLASSIFIED)
+          .exclude(signed_amount=0))
+    if date_from:
+        qs = qs.filter(transaction_date__gte=date_from)
+    if date_to:
+        qs = qs.filter(transaction_date__lte=date_to)
+    qs = qs.order_by("id").values_list("id", "narration", "utr_number", "signed_amount", "transaction_date")
+
+    operation_id = uuid.uuid4()
+    last_id = 0
+    while True:
+        chunk = list(qs.filter(id__gt=last_id)[:CHUNK_SIZE])
+        if not chunk:
+            break
+        last_id = chunk[-1][0]
+        result.scanned += len(chunk)
+
+        new_rows = []
+        rule_of = {}   # transaction id -> rule id
+        for tx_id, narration, utr, signed, tx_date in chunk:
+            rule = rules.match(narration, utr, signed)
+            if rule is None:
+                continue
+            result.by_rule[rule.id] = result.by_rule.get(rule.id, 0) + 1
+            rule_of[tx_id] = rule.id
+            new_rows.append(Classification(
+                bank_transaction_id=tx_id,
+                transaction_type_id=rule.transaction_type_id,
+                cost_centre_id=rule.cost_centre_id,
+                entity_id=rule.entity_id,
+                contract_id=rule.contract_id,
+                amount=_q2(abs(signed)),
+                value_date=tx_date,
+                remarks=f"Auto: {rule.name}",
+                is_active_classification=True,
+                operation=Classification.OP_AUTO_CLASSIFY,
+                operation_id=operation_id,
+            ))
+        result.matched += len(new_rows)
+        if dry_run or not new_rows:
+            continue
+
+        with transaction.atomic():
+            # someone may have classified or claimed a few of these since we read them;
+            # rows another writer has locked right now are left for the next run
+            free = set(BankTransaction.objects
+                       .select_for_update(skip_locked=True)
+                       .filter(pk__in=[c.bank_transaction_id for c in new_rows],
+                               classification_status=BankTransaction.STATUS_UNCLASSIFIED)
+                       .filter(Q(claimed_until__isnull=True) | Q(claimed_until__lte=timezone.now()))
+                       .values_list("id", flat=True))
+            if len(free) < len(new_rows):
+                new_rows = [c for c in new_rows if c.bank_transaction_id in free]
+            Classification.objects.bulk_create(new_rows, batch_size=CHUNK_SIZE)
+            services.refresh_classification_state([c.bank_transaction_id for c in new_rows])
+        result.created += len(new_rows)
+        for c in new_rows:
+            rule_id = rule_of[c.bank_transaction_id]
+            result.created_by_rule[rule_id] = result.created_by_rule.get(rule_id, 0) + 1
+    return result
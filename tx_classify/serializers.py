@@ -4,39 +4,48 @@ from decimal import Decimal, ROUND_HALF_UP
 from rest_framework import serializers
 
 from bank_uploads.models import BankTransaction
-from transaction_types.models import TransactionType
-from cost_centres.models import CostCentre
-from entities.models import Entity
-from assets.models import Asset
-from contracts.models import Contract
+from banks.models import BankAccount
 
-from .models import Classification
+from . import reference
+from .models import Classification, ClassificationRule
 
 
 def _q2(x: Decimal) -> Decimal:
     return (x or Decimal("0")).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
 
+def _reference_errors(data: dict, snap: reference.ReferenceSnapshot) -> dict:
+    """
+    Reference ids in `data` (transaction_type_id, cost_centre_id, ...) that the
+    company's reference snapshot doesn't have; checked in memory, no queries.
+    """
+    return {
+        f: [f'Invalid pk "{data[f]}" - object does not exist.']
+        for f, kind in reference.FIELD_KINDS.items()
+        if data.get(f) is not None and snap.get(kind, data[f]) is None
+    }
+
+
+def _check_rows(rows: list, company_id: int) -> None:
+    snap = reference.for_company(company_id)
+    errors = [_reference_errors(r, snap) for r in rows]
+    if any(errors):
+        raise serializers.ValidationError({"rows": errors})
+
+
 class ClassificationSerializer(serializers.ModelSerializer):
     # write-only IDs → model relations
     bank_transaction_id = serializers.PrimaryKeyRelatedField(
-        source="bank_transaction", queryset=BankTransaction.objects.all(), write_only=True
-    )
-    transaction_type_id = serializers.PrimaryKeyRelatedField(
-        source="transaction_type", queryset=TransactionType.objects.all(), write_only=True
-    )
-    cost_centre_id = serializers.PrimaryKeyRelatedField(
-        source="cost_centre", queryset=CostCentre.objects.all(), write_only=True
-    )
-    entity_id = serializers.PrimaryKeyRelatedField(
-        source="entity", queryset=Entity.objects.all(), write_only=True
-    )
-    asset_id = serializers.PrimaryKeyRelatedField(
-        source="asset", queryset=Asset.objects.all(), allow_null=True, required=False, write_only=True
-    )
-    contract_id = serializers.PrimaryKeyRelatedField(
-        source="contract", queryset=Contract.objects.all(), allow_null=True, required=False, write_only=True
+        source="bank_transaction", queryset=BankTransaction.objects.select_related("bank_account"), write_only=True
     )
+    # reference ids: validated against the company's snapshot (tx_classify/reference.py)
+    transaction_type_id = serializers.IntegerField(write_only=True)
+    cost_centre_id = serializers.IntegerField(write_only=True)
+    entity_id = serializers.IntegerField(write_only=True)
+    asset_id = serializers.IntegerField(allow_null=True, required=False, write_only=True)
+    contract_id = serializers.IntegerField(allow_null=True, required=False, write_only=True)
+    # optimistic concurrency: the BankTransaction.version the client last read (409 if it moved)
+    expected_version = serializers.IntegerField(required=False, allow_null=True, min_value=0, write_only=True)
 
     class Meta:
         model = Classification
@@ -53,15 +62,20 @@ class ClassificationSerializer(serializers.ModelSerializer):
             "remarks",
             "is_active_classification",
             "created_at",
+            "expected_version",
         ]
         read_only_fields = ["classification_id", "is_active_classification", "created_at"]
 
     def validate(self, attrs):
         """
+        - Reference ids must exist for the transaction's company.
         - Default value_date to the bank transaction's date if not provided.
         - Ensure amount is positive and round to 2dp for consistency.
         """
         txn: BankTransaction = attrs["bank_transaction"]
+        errors = _reference_errors(attrs, reference.for_company(txn.bank_account.company_id))
+        if errors:
+            raise serializers.ValidationError(errors)
         attrs["value_date"] = attrs.get("value_date") or txn.transaction_date
 
         amt = _q2(attrs.get("amount") or Decimal("0"))
@@ -71,27 +85,47 @@ class ClassificationSerializer(serializers.ModelSerializer):
         return attrs
 
 
+# ----- Bulk classify payloads -----
+
+# items accepted per bulk classify request
+MAX_BULK_CLASSIFY = 1000
+
+
+class BulkClassifyItemSerializer(serializers.Serializer):
+    """
+    One row of classify/bulk/. Ids are plain integers here: the view checks the
+    reference ids against each company's reference snapshot and locks the
+    transactions with one query, instead of a lookup per field.
+    """
+    bank_transaction_id = serializers.IntegerField()
+    transaction_type_id = serializers.IntegerField()
+    cost_centre_id = serializers.IntegerField()
+    entity_id = serializers.IntegerField()
+    asset_id = serializers.IntegerField(required=False, allow_null=True)
+    contract_id = serializers.IntegerField(required=False, allow_null=True)
+    amount = serializers.DecimalField(max_digits=14, decimal_places=2)
+    value_date = serializers.DateField(required=False, allow_null=True)
+    remarks = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    expected_version = serializers.IntegerField(required=False, allow_null=True, min_value=0)
+
+
+class BulkClassifyRequestSerializer(serializers.Serializer):
+    items = BulkClassifyItemSerializer(many=True, allow_empty=False, max_length=MAX_BULK_CLASSIFY)
+
+
 # ----- Split payloads -----
 
 class SplitRowSerializer(serializers.Serializer):
+    # reference ids; the request serializer checks them against the
+    # transaction's company snapshot (tx_classify/reference.py)
     # REQUIRED due to NOT NULL constraints
-    transaction_type_id = serializers.PrimaryKeyRelatedField(
-        queryset=TransactionType.objects.all()
-    )
-    cost_centre_id = serializers.PrimaryKeyRelatedField(
-        queryset=CostCentre.objects.all()
-    )
-    entity_id = serializers.PrimaryKeyRelatedField(
-        queryset=Entity.objects.all()
-    )
+    transaction_type_id = serializers.IntegerField()
+    cost_centre_id = serializers.IntegerField()
+    entity_id = serializers.IntegerField()
 
     # optional
-    asset_id = serializers.PrimaryKeyRelatedField(
-        queryset=Asset.objects.all(), allow_null=True, required=False
-    )
-    contract_id = serializers.PrimaryKeyRelatedField(
-        queryset=Contract.objects.all(), allow_null=True, required=False
-    )
+    asset_id = serializers.IntegerField(allow_null=True, required=False)
+    contract_id = serializers.IntegerField(allow_null=True, required=False)
 
     amount = serializers.DecimalField(max_digits=14, decimal_places=2)
     value_date = serializers.DateField(required=False, allow_null=True)
@@ -105,9 +139,11 @@ class SplitRequestSerializer(serializers.Serializer):
     (i.e., no split after a prior classify/split). Kept as-is for backward compatibility.
     """
     bank_transaction_id = serializers.PrimaryKeyRelatedField(
-        queryset=BankTransaction.objects.all()
+        queryset=BankTransaction.objects.select_related("bank_account")
     )
     rows = SplitRowSerializer(many=True)
+    # optimistic concurrency: the BankTransaction.version the client last read (409 if it moved)
+    expected_version = serializers.IntegerField(required=False, allow_null=True, min_value=0)
 
     def validate(self, data):
         txn: BankTransaction = data["bank_transaction_id"]
@@ -115,13 +151,13 @@ class SplitRequestSerializer(serializers.Serializer):
         if not rows:
             raise serializers.ValidationError("At least one split row is required.")
 
-        # Each original txn can only be classified/split once (no recursive splits)
-        if Classification.objects.filter(
-            bank_transaction=txn, is_active_classification=True
-        ).exists():
+        # Each original txn can only be classified/split once (no recursive splits);
+        # stored state here, the view re-checks under the row lock
+        if txn.active_classification_count:
             raise serializers.ValidationError(
                 "This transaction has already been classified/split once."
             )
+        _check_rows(rows, txn.bank_account.company_id)
 
         # Normalize amounts to 2dp and enforce > 0; also default value_date per row
         total = Decimal("0.00")
@@ -157,14 +193,18 @@ class ResplitRequestSerializer(serializers.Serializer):
     """
     classification_id = serializers.PrimaryKeyRelatedField(
         queryset=Classification.objects.filter(is_active_classification=True)
+        .select_related("bank_transaction__bank_account")
     )
     rows = SplitRowSerializer(many=True)
+    # optimistic concurrency: the BankTransaction.version the client last read (409 if it moved)
+    expected_version = serializers.IntegerField(required=False, allow_null=True, min_value=0)
 
     def validate(self, data):
         child: Classification = data["classification_id"]
         rows = data["rows"]
         if not rows:
             raise serializers.ValidationError("At least one split row is required.")
+        _check_rows(rows, child.bank_transaction.bank_account.company_id)
 
         # Normalize amounts and default per-row value_date based on the child value_date
         total = Decimal("0.00")
@@ -200,33 +240,135 @@ class ReclassifyRequestSerializer(serializers.Serializer):
     """
     classification_id = serializers.PrimaryKeyRelatedField(
         queryset=Classification.objects.filter(is_active_classification=True)
+        .select_related("bank_transaction__bank_account")
     )
 
+    # reference ids, checked against the company snapshot (tx_classify/reference.py)
     # required fields (NOT NULL in DB)
-    transaction_type_id = serializers.PrimaryKeyRelatedField(
-        queryset=TransactionType.objects.all()
-    )
-    cost_centre_id = serializers.PrimaryKeyRelatedField(
-        queryset=CostCentre.objects.all()
-    )
-    entity_id = serializers.PrimaryKeyRelatedField(
-        queryset=Entity.objects.all()
-    )
+    transaction_type_id = serializers.IntegerField()
+    cost_centre_id = serializers.IntegerField()
+    entity_id = serializers.IntegerField()
 
     # optional
-    asset_id = serializers.PrimaryKeyRelatedField(
-        queryset=Asset.objects.all(), allow_null=True, required=False
-    )
-    contract_id = serializers.PrimaryKeyRelatedField(
-        queryset=Contract.objects.all(), allow_null=True, required=False
-    )
+    asset_id = serializers.IntegerField(allow_null=True, required=False)
+    contract_id = serializers.IntegerField(allow_null=True, required=False)
     value_date = serializers.DateField(required=False, allow_null=True)
     remarks = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    # optimistic concurrency: the BankTransaction.version the client last read (409 if it moved)
+    expected_version = serializers.IntegerField(required=False, allow_null=True, min_value=0)
 
     def validate(self, data):
         child: Classification = data["classification_id"]
+        snap = reference.for_company(child.bank_transaction.bank_account.company_id)
+        errors = _reference_errors(data, snap)
+        if errors:
+            raise serializers.ValidationError(errors)
         # Default value_date to the child's value_date if not provided
         if data.get("value_date") in (None, ""):
             data["value_date"] = child.value_date
         data["classification"] = child  # convenience for the View
         return data
+
+
+# ----- Auto-classification rules -----
+
+class ClassificationRuleSerializer(serializers.ModelSerializer):
+    transaction_type_name = serializers.CharField(source="transaction_type.name", read_only=True)
+    cost_centre_name = serializers.CharField(source="cost_centre.name", read_only=True)
+    entity_name = serializers.CharField(source="entity.name", read_only=True)
+
+    class Meta:
+        model = ClassificationRule
+        fields = [
+            "id",
+            "company",
+            "name",
+            "priority",
+            "is_active",
+            "narration_pattern",
+            "utr_prefix",
+            "min_amount",
+            "max_amount",
+            "direction",
+            "transaction_type",
+            "transaction_type_name",
+            "cost_centre",
+            "cost_centre_name",
+            "entity",
+            "entity_name",
+            "contract",
+            "created_at",
+            "updated_at",
+        ]
+        read_only_fields = ["id", "created_at", "updated_at"]
+
+    def validate(self, attrs):
+        """
+        - At least one condition, so a rule can't silently classify everything.
+        - min_amount <= max_amount.
+        - Transaction type / cost centre / entity belong to the rule's company.
+        """
+        merged = {f: getattr(self.instance, f) for f in self.Meta.fields if self.instance and hasattr(self.instance, f)}
+        merged.update(attrs)
+
+        if not any([
+            (merged.get("narration_pattern") or "").strip(),
+            (merged.get("utr_prefix") or "").strip(),
+            merged.get("min_amount") is not None,
+            merged.get("max_amount") is not None,
+            merged.get("direction") in ("Credit", "Debit"),
+        ]):
+            raise serializers.ValidationError("Set at least one condition (narration, UTR prefix, amount or direction).")
+
+        lo, hi = merged.get("min_amount"), merged.get("max_amount")
+        if lo is not None and hi is not None and lo > hi:
+            raise serializers.ValidationError("min_amount cannot be greater than max_amount.")
+
+        company = merged.get("company")
+        for f in ("transaction_type", "cost_centre", "entity"):
+            obj = merged.get(f)
+            if obj is not None and company is not None and obj.company_id not in (None, company.pk):
+                raise serializers.ValidationError({f: "Must belong to the rule's company."})
+        return attrs
+
+
+class AutoClassifyRequestSerializer(serializers.Serializer):
+    """
+    Apply the company's active rules to an account's unclassified transactions.
+    dry_run=true only reports what would be classified.
+    """
+    bank_account_id = serializers.PrimaryKeyRelatedField(queryset=BankAccount.objects.all())
+    start_date = serializers.DateField(required=False, allow_null=True)
+    end_date = serializers.DateField(required=False, allow_null=True)
+    dry_run = serializers.BooleanField(required=False, default=False)
+
+
+# ----- Work queue payloads -----
+
+# transactions handed out per claim request
+MAX_CLAIM = 200
+
+
+class ClaimRequestSerializer(serializers.Serializer):
+    """
+    Reserve the next `count` unclassified transactions of an account (inbox order)
+    for the caller for `claim_seconds`.
+    """
+    bank_account_id = serializers.PrimaryKeyRelatedField(queryset=BankAccount.objects.all())
+    count = serializers.IntegerField(required=False, default=50, min_value=1, max_value=MAX_CLAIM)
+    claim_seconds = serializers.IntegerField(required=False, default=900, min_value=30, max_value=8 * 3600)
+    start_date = serializers.DateField(required=False, allow_null=True)
+    end_date = serializers.DateField(required=False, allow_null=True)
+
+
+class ReleaseClaimsRequestSerializer(serializers.Serializer):
+    """Give back the caller's claims: the listed transactions, or all of them on the account."""
+    bank_account_id = serializers.PrimaryKeyRelatedField(queryset=BankAccount.objects.all(), required=False)
+    bank_transaction_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_empty=False, max_length=MAX_CLAIM,
+    )
+
+    def validate(self, attrs):
+        if not attrs.get("bank_account_id") and not attrs.get("bank_transaction_ids"):
+            raise serializers.ValidationError("bank_account_id or bank_transaction_ids is required.")
+        return attrs
@@ -0,0 +1,79 @@
+# tx_classify/services.py
+"""
+Keeps BankTransaction's denormalised classification fields
+(classification_status, active_classification_count, last_classified_at)
+in line with its active Classification rows.
+
+Call refresh_classification_state() inside the same transaction.atomic()
+block that activates or deactivates classifications, after the writes.
+It also bumps BankTransaction.version and ends any work-queue claim, so
+every classification change is visible to optimistic-concurrency checks,
+and re-derives the transactions' reports.LedgerEntry rows.
+
+Writers lock the transaction rows first (lock_transactions) and check them
+with conflict(); see tx_classify/views.py.
+"""
+from __future__ import annotations
+
+from typing import Dict, Iterable, Optional
+
+from django.db.models import Case, Count, F, IntegerField, Max, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from bank_uploads.models import BankTransaction
+from reports import ledger
+
+from .models import Classification
+
+
+def refresh_classification_state(bank_transaction_ids: Iterable[int]) -> int:
+    """
+    Recompute the fields for these transactions from their active
+    classifications: two set-based UPDATEs however many ids. Returns the
+    number of transactions updated.
+    """
+    ids = list(bank_transaction_ids)
+    if not ids:
+        return 0
+
+    active = (Classification.objects
+              .filter(bank_transaction=OuterRef("pk"), is_active_classification=True)
+              .order_by()
+              .values("bank_transaction"))
+    txns = BankTransaction.all_objects.filter(pk__in=ids)
+    updated = txns.update(
+        active_classification_count=Coalesce(
+            Subquery(active.annotate(n=Count("pk")).values("n"), output_field=IntegerField()), 0
+        ),
+        last_classified_at=Subquery(active.annotate(last=Max("created_at")).values("last")),
+        version=F("version") + 1,
+        claimed_by=None,
+        claimed_until=None,
+    )
+    txns.update(classification_status=Case(
+        When(active_classification_count=0, then=Value(BankTransaction.STATUS_UNCLASSIFIED)),
+        When(active_classification_count=1, then=Value(BankTransaction.STATUS_CLASSIFIED)),
+        default=Value(BankTransaction.STATUS_SPLIT),
+    ))
+    ledger.sync_bank_transactions(ids)
+    return updated
+
+
+def lock_transactions(bank_transaction_ids: Iterable[int]) -> Dict[int, BankTransaction]:
+    """SELECT ... FOR UPDATE the (active) transactions; call inside transaction.atomic()."""
+    return BankTransaction.objects.select_for_update().in_bulk(list(bank_transaction_ids))
+
+
+def conflict(txn: BankTransaction, user, expected_version: Optional[int] = None, now=None) -> Optional[str]:
+    """
+    Why `user` may not change the locked `txn` right now, or None:
+    someone else holds a live claim on it, or it changed since the caller
+    read `expected_version`.
+    """
+    now = now or timezone.now()
+    if txn.claimed_by_id and txn.claimed_by_id != user.pk and txn.claimed_until and txn.claimed_until > now:
+        return "This transaction is claimed by another user."
+    if expected_version is not None and expected_version != txn.version:
+        return f"This transaction was changed by someone else (version {txn.version}); reload it."
+    return None
@@ -0,0 +1,51 @@
+# tx_classify/signals.py
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from assets.models import Asset
+from contracts.models import Contract
+from cost_centres.models import CostCentre
+from entities.models import Entity
+from transaction_types.models import TransactionType
+from vendors.models import Vendor
+
+from . import reference
+
+def _stored_company_id(sender, instance):
+    return sender._default_manager.filter(pk=instance.pk).values_list("company_id", flat=True).first()
+
+
+@receiver(pre_save, sender=TransactionType)
+@receiver(pre_save, sender=CostCentre)
+@receiver(pre_save, sender=Entity)
+@receiver(pre_save, sender=Asset)
+@receiver(pre_save, sender=Contract)
+def remember_reference_company(sender, instance, raw=False, **kwargs):
+    # a row moved to another company leaves the old company's snapshot stale too
+    if instance.pk is not None and not raw and not instance._state.adding:
+        instance._reference_company_id = _stored_company_id(sender, instance)
+
+
+@receiver([post_save, post_delete], sender=TransactionType)
+@receiver([post_save, post_delete], sender=CostCentre)
+@receiver([post_save, post_delete], sender=Entity)
+@receiver([post_save, post_delete], sender=Asset)
+@receiver([post_save, post_delete], sender=Contract)
+def invalidate_reference_data(sender, instance, **kwargs):
+    # in the writer's transaction: the new version commits together with the rows
+    reference.invalidate(instance.company_id)
+    old_company_id = getattr(instance, "_reference_company_id", instance.company_id)
+    if old_company_id != instance.company_id:
+        reference.invalidate(old_company_id)
+    instance._reference_company_id = instance.company_id
+
+
+@receiver(post_save, sender=Vendor)
+def invalidate_vendor_contracts(sender, instance, raw=False, **kwargs):
+    # contract names come from vendor__vendor_name; deleting a vendor cascades
+    # to its contracts, whose own signals cover that
+    if raw:
+        return
+    for company_id in (Contract.objects.filter(vendor=instance)
+                       .order_by().values_list("company_id", flat=True).distinct()):
+        reference.invalidate(company_id)
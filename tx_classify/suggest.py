@@ -0,0 +1,196 @@
+# tx_classify/suggest.py
+"""
+Classification suggestions learned from past classifications.
+
+Per company, a naive Bayes model over narration words (plus the direction)
+predicts the (transaction type, cost centre, entity) a bank transaction was
+most likely classified as. `manage.py train_classification_suggestions`
+trains it from active classifications and writes one file per company to
+settings.TX_CLASSIFY_MODEL_DIR; web workers load a company's file the first
+time it's needed and keep it until the file changes.
+
+    suggester = for_company(company_id)          # None if never trained
+    suggester.suggest(tx.narration, tx.signed_amount, k=3)
+"""
+from __future__ import annotations
+
+import math
+import os
+import pickle
+import tempfile
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+
+from .models import Classification
+from .rules import tokens
+
+FORMAT_VERSION = 1
+# Laplace smoothing
+ALPHA = 1.0
+MAX_SUGGESTIONS = 10
+
+Label = Tuple[int, int, int]   # (transaction_type_id, cost_centre_id, entity_id)
+
+
+def features(narration: Optional[str], signed_amount) -> set:
+    """Distinct narration words (reference numbers dropped) plus the direction."""
+    words = {t for t in tokens(narration) if not t.isdigit()}
+    words.add("__credit" if (signed_amount or 0) >= 0 else "__debit")
+    return words
+
+
+class NaiveBayesSuggester:
+    """
+    Multinomial naive Bayes over distinct words. Scoring is sparse: each
+    label starts from prior + n_words * log P(unseen word | label), and
+    only the (word, label) pairs seen in training adjust it.
+    """
+
+    def __init__(self, labels: List[Label], names: List[Tuple[str, str, str]],
+                 log_prior: List[float], log_unseen: List[float],
+                 weights: Dict[str, List[Tuple[int, float]]], trained_on: int = 0,
+                 trained_at: Optional[str] = None):
+        self.labels = labels
+        self.names = names
+        self.log_prior = log_prior
+        self.log_unseen = log_unseen
+        self.weights = weights           # word -> [(label index, log P(word|label) - log_unseen)]
+        self.trained_on = trained_on
+        self.trained_at = trained_at
+
+    @classmethod
+    def train(cls, rows: Iterable[tuple]) -> "NaiveBayesSuggester":
+        """
+        rows: (narration, signed_amount, transaction_type_id, cost_centre_id, entity_id,
+               transaction_type name, cost_centre name, entity name)
+        """
+        docs: Counter = Counter()
+        words: Dict[Label, Counter] = defaultdict(Counter)
+        names: Dict[Label, Tuple[str, str, str]] = {}
+        for narration, signed, tt, cc, en, tt_name, cc_name, en_name in rows:
+            label = (tt, cc, en)
+            docs[label] += 1
+            words[label].update(features(narration, signed))
+            names[label] = (tt_name, cc_name, en_name)
+
+        labels = sorted(docs)
+        vocab = set()
+        for c in words.values():
+            vocab.update(c)
+        total = sum(docs.values())
+        v = len(vocab) or 1
+
+        log_prior, log_unseen = [], []
+        weights: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        for i, label in enumerate(labels):
+            counts = words[label]
+            denom = math.log(sum(counts.values()) + ALPHA * v)
+            unseen = math.log(ALPHA) - denom
+            log_prior.append(math.log(docs[label] / total))
+            log_unseen.append(unseen)
+            for w, n in counts.items():
+                weights[w].append((i, math.log(n + ALPHA) - denom - unseen))
+
+        return cls(labels, [names[l] for l in labels], log_prior, log_unseen, dict(weights),
+                   trained_on=total, trained_at=datetime.now(timezone.utc).isoformat())
+
+    def suggest(self, narration: Optional[str], signed_amount, k: int = 3) -> List[dict]:
+        """Top-k labels with probabilities (normalised over all labels)."""
+        if not self.labels:
+            return []
+        feats = features(narration, signed_amount)
+        n = len(feats)
+        scores = [p + n * u for p, u in zip(self.log_prior, self.log_unseen)]
+        weights = self.weights
+        for w in feats:
+            for i, delta in weights.get(w, ()):
+                scores[i] += delta
+
+        top = sorted(range(len(scores)), key=scores.__getitem__, reverse=True)[:max(1, min(k, MAX_SUGGESTIONS))]
+        best = scores[top[0]]
+        norm = sum(math.exp(s - best) for s in scores)
+        out = []
+        for i in top:
+            tt, cc, en = self.labels[i]
+            tt_name, cc_name, en_name = self.names[i]
+            out.append({
+                "transaction_type_id": tt,
+                "transaction_type": tt_name,
+                "cost_centre_id": cc,
+                "cost_centre": cc_name,
+                "entity_id": en,
+                "entity": en_name,
+                "score": round(math.exp(scores[i] - best) / norm, 4),
+            })
+        return out
+
+    # ---------- persistence ----------
+    def save(self, path: Path) -> None:
+        """Write atomically, so a worker never loads a half-written file."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        state = {"version": FORMAT_VERSION, **self.__dict__}
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                pickle.dump(state, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path: Path) -> "NaiveBayesSuggester":
+        with open(path, "rb") as fh:
+            state = pickle.load(fh)
+        if state.pop("version", None) != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported model format, retrain it")
+        return cls(**state)
+
+
+# ---------- per-company models ----------
+
+def model_dir() -> Path:
+    return Path(getattr(settings, "TX_CLASSIFY_MODEL_DIR", Path(settings.BASE_DIR) / "var" / "tx_classify"))
+
+
+def model_path(company_id: int) -> Path:
+    return model_dir() / f"suggest-company-{int(company_id)}.pickle"
+
+
+_loaded: Dict[int, Tuple[float, NaiveBayesSuggester]] = {}   # company -> (file mtime, model)
+_lock = threading.Lock()
+
+
+def for_company(company_id: int) -> Optional[NaiveBayesSuggester]:
+    """The company's trained model (reloaded when its file changes), or None."""
+    path = model_path(company_id)
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    with _lock:
+        cached = _loaded.get(company_id)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        model = NaiveBayesSuggester.load(path)
+        _loaded[company_id] = (mtime, model)
+        return model
+
+
+def training_rows(company_id: int):
+    """Active classifications of the company's (active) bank transactions, as train() rows."""
+    return (Classification.objects
+            .filter(is_active_classification=True,
+                    bank_transaction__bank_account__company_id=company_id,
+                    bank_transaction__is_deleted=False)
+            .values_list("bank_transaction__narration", "bank_transaction__signed_amount",
+                         "transaction_type_id", "cost_centre_id", "entity_id",
+                         "transaction_type__name", "cost_centre__name", "entity__name")
+            .iterator(chunk_size=5000))
@@ -1,3 +1,330 @@
-from django.test import TestCase
+# tx_classify/tests.py
+import math
+import os
+import pickle
+import random
+import tempfile
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from bank_uploads.models import BankTransaction, BankUploadBatch
+from banks.models import BankAccount
+from companies.models import Company
+from contracts.models import Contract
+from cost_centres.models import CostCentre
+from entities.models import Entity
+from transaction_types.models import TransactionType
+from users.models import User
+from vendors.models import Vendor
+
+from . import reference, suggest
+from .models import Classification, ClassificationRule, ReferenceDataVersion
+from .services import conflict
+from .rules import RuleSet, TokenAutomaton, tokens
+from .suggest import ALPHA, NaiveBayesSuggester, features
+
+
+# ---------- rules ----------
+
+def _occurs(pattern, words) -> bool:
+    n = len(pattern)
+    return any(tuple(words[i:i + n]) == pattern for i in range(len(words) - n + 1))
+
+
+class TokenAutomatonTests(SimpleTestCase):
+    def _automaton(self, patterns):
+        automaton = TokenAutomaton()
+        for i, p in enumerate(patterns):
+            automaton.add(p, i)
+        return automaton.build()
+
+    def test_overlapping_and_nested_patterns(self):
+        patterns = [("she",), ("he",), ("he", "rs"), ("s", "he"), ("she", "he", "rs")]
+        automaton = self._automaton(patterns)
+        self.assertEqual(automaton.search(["x", "she", "he", "rs"]), {0, 1, 2, 4})
+        self.assertEqual(automaton.search(["s", "he", "rs"]), {1, 2, 3})
+        self.assertEqual(automaton.search(["s", "she"]), {0})
+
+    def test_failure_links_across_a_partial_match(self):
+        automaton = self._automaton([("neft", "cr", "acme"), ("cr", "acme", "corp")])
+        self.assertEqual(automaton.search(tokens("NEFT CR ACME CORP")), {0, 1})
+        self.assertEqual(automaton.search(tokens("neft neft cr acme")), {0})
+
+    def test_matches_brute_force(self):
+        rnd = random.Random(13)
+        vocab = ["a", "b", "c", "d"]
+        for _ in range(200):
+            patterns = list({tuple(rnd.choices(vocab, k=rnd.randint(1, 3))) for _ in range(6)})
+            automaton = self._automaton(patterns)
+            words = rnd.choices(vocab, k=rnd.randint(0, 12))
+            expected = {i for i, p in enumerate(patterns) if _occurs(p, words)}
+            self.assertEqual(automaton.search(words), expected, (patterns, words))
+
+
+def _rule(pk, priority, pattern="", **conditions):
+    return ClassificationRule(id=pk, name=f"r{pk}", priority=priority, narration_pattern=pattern, **conditions)
+
+
+class RuleSetTests(SimpleTestCase):
+    def test_highest_priority_hit_wins(self):
+        rules = RuleSet([
+            _rule(1, 50, "acme"),
+            _rule(2, 10, "acme corp"),
+            _rule(3, 5, "swiggy"),
+        ])
+        self.assertEqual(rules.match("NEFT CR ACME CORP 123", "", Decimal("10")).id, 2)
+        self.assertEqual(rules.match("acme ltd", "", Decimal("10")).id, 1)
+        self.assertIsNone(rules.match("unrelated", "", Decimal("10")))
+
+    def test_conditions_checked_in_priority_order(self):
+        rules = RuleSet([
+            _rule(1, 1, "acme", direction="Debit"),
+            _rule(2, 2, "acme", min_amount=Decimal("100")),
+            _rule(3, 3, utr_prefix="HDFC"),
+            _rule(4, 4),
+        ])
+        self.assertEqual(rules.match("acme", "", Decimal("-5")).id, 1)
+        self.assertEqual(rules.match("acme", "", Decimal("500")).id, 2)
+        self.assertEqual(rules.match("acme", "hdfc0001", Decimal("5")).id, 3)
+        self.assertEqual(rules.match("acme", "", Decimal("5")).id, 4)
+
+
+# ---------- suggestions ----------
+
+TRAINING_ROWS = [
+    ("NEFT CR 1001 ACME CORP", Decimal("5000"), 1, 10, 100, "Sales", "Ops", "Acme"),
+    ("NEFT CR 1002 ACME CORP", Decimal("7000"), 1, 10, 100, "Sales", "Ops", "Acme"),
+    ("UPI DR 2001 SWIGGY", Decimal("-250"), 2, 20, 200, "Food", "Admin", "Swiggy"),
+    ("UPI DR 2002 SWIGGY ORDER", Decimal("-300"), 2, 20, 200, "Food", "Admin", "Swiggy"),
+    ("UPI DR 2003 ZOMATO", Decimal("-150"), 2, 20, 201, "Food", "Admin", "Zomato"),
+    ("RENT AUG", Decimal("-20000"), 3, 10, 300, "Rent", "Ops", "Landlord"),
+]
+
+
+def _dense_scores(rows, narration, signed):
+    """Textbook multinomial naive Bayes log scores per label, for comparison."""
+    docs, words = Counter(), {}
+    for narr, amount, tt, cc, en, *_names in rows:
+        docs[(tt, cc, en)] += 1
+        words.setdefault((tt, cc, en), Counter()).update(features(narr, amount))
+    vocab = set().union(*words.values())
+    total = sum(docs.values())
+    scores = {}
+    for label, n in docs.items():
+        denom = sum(words[label].values()) + ALPHA * len(vocab)
+        scores[label] = math.log(n / total) + sum(
+            math.log((words[label][w] + ALPHA) / denom) for w in features(narration, signed)
+        )
+    return scores
+
+
+class NaiveBayesSuggesterTests(SimpleTestCase):
+    def setUp(self):
+        self.model = NaiveBayesSuggester.train(TRAINING_ROWS)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_sparse_scoring_matches_dense_naive_bayes(self):
+        for narration, signed in [("NEFT CR ACME", Decimal("1")), ("UPI SWIGGY", Decimal("-1")),
+                                  ("never seen", Decimal("1")), ("", Decimal("-1"))]:
+            with self.subTest(narration=narration):
+                scores = _dense_scores(TRAINING_ROWS, narration, signed)
+                expected = sorted(scores, key=scores.get, reverse=True)
+                best = max(scores.values())
+                norm = sum(math.exp(v - best) for v in scores.values())
+                got = self.model.suggest(narration, signed, k=len(scores))
+                self.assertEqual(
+                    [(r["transaction_type_id"], r["cost_centre_id"], r["entity_id"]) for r in got], expected
+                )
+                for r, label in zip(got, expected):
+                    self.assertAlmostEqual(r["score"], math.exp(scores[label] - best) / norm, places=4)
+
+    def test_suggests_the_obvious_label(self):
+        top = self.model.suggest("UPI DR 2999 SWIGGY", Decimal("-99"), k=1)
+        self.assertEqual(len(top), 1)
+        self.assertEqual((top[0]["entity_id"], top[0]["entity"]), (200, "Swiggy"))
+
+    def test_save_load_round_trip(self):
+        path = Path(self.tmp.name) / "model.pickle"
+        self.model.save(path)
+        loaded = NaiveBayesSuggester.load(path)
+        self.assertEqual(loaded.__dict__, self.model.__dict__)
+        for narration, signed in [("NEFT CR ACME", Decimal("1")), ("zomato", Decimal("-5"))]:
+            self.assertEqual(loaded.suggest(narration, signed, k=5), self.model.suggest(narration, signed, k=5))
+        self.assertEqual([p.name for p in Path(self.tmp.name).iterdir()], ["model.pickle"])   # no temp files left
+
+    def test_load_rejects_other_format_versions(self):
+        path = Path(self.tmp.name) / "old.pickle"
+        path.write_bytes(pickle.dumps({"version": suggest.FORMAT_VERSION + 1, **self.model.__dict__}))
+        with self.assertRaises(ValueError):
+            NaiveBayesSuggester.load(path)
+
+    def test_for_company_reloads_when_the_file_changes(self):
+        self.addCleanup(suggest._loaded.pop, 7, None)
+        with override_settings(TX_CLASSIFY_MODEL_DIR=Path(self.tmp.name)):
+            self.assertIsNone(suggest.for_company(7))
+            self.model.save(suggest.model_path(7))
+            first = suggest.for_company(7)
+            self.assertIs(suggest.for_company(7), first)
+
+            NaiveBayesSuggester.train(TRAINING_ROWS[:2]).save(suggest.model_path(7))
+            stat = os.stat(suggest.model_path(7))
+            os.utime(suggest.model_path(7), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            second = suggest.for_company(7)
+            self.assertIsNot(second, first)
+            self.assertEqual(second.trained_on, 2)
+
+
+# ---------- concurrency ----------
+
+class ConflictTests(SimpleTestCase):
+    def setUp(self):
+        self.me, self.other = User(pk=1), User(pk=2)
+        self.now = timezone.now()
+
+    def test_live_claims_of_others_conflict(self):
+        txn = BankTransaction(version=3, claimed_by_id=2, claimed_until=self.now + timedelta(minutes=1))
+        self.assertIn("claimed", conflict(txn, self.me, now=self.now))
+        self.assertIsNone(conflict(txn, self.other, now=self.now))
+        txn.claimed_until = self.now
+        self.assertIsNone(conflict(txn, self.me, now=self.now))   # lapsed
+
+    def test_expected_version(self):
+        txn = BankTransaction(version=3)
+        self.assertIsNone(conflict(txn, self.me))
+        self.assertIsNone(conflict(txn, self.me, expected_version=3))
+        self.assertIn("version 3", conflict(txn, self.me, expected_version=2))
+
+
+class ClassificationConcurrencyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        company = Company.objects.create(name="Acme", pan="ABCDE1234F")
+        cls.me = User.objects.create_superuser("me", "pw", full_name="Me", role="SUPER_USER")
+        cls.other = User.objects.create_superuser("other", "pw", full_name="Other", role="SUPER_USER")
+        cls.account = BankAccount.objects.create(
+            company=company, account_name="Main", account_number="111", bank_name="HDFC", ifsc="HDFC0000001",
+        )
+        batch = BankUploadBatch.objects.create(bank_account=cls.account, file_name="s.csv")
+        cls.txns = [
+            BankTransaction.objects.create(
+                bank_account=cls.account, upload_batch=batch, transaction_date=date(2025, 8, 1) + timedelta(days=i),
+                narration=f"NEFT CR {i}", credit_amount=Decimal("100.00") + i, balance_amount=Decimal("1000.00"),
+                utr_number=f"U{i}",
+            )
+            for i in range(6)
+        ]
+        cost_centre = CostCentre.objects.create(company=company, name="Ops")
+        cls.refs = {
+            "cost_centre_id": cost_centre.pk,
+            "transaction_type_id": TransactionType.objects.create(
+                company=company, name="Sales", cost_centre=cost_centre, direction="Credit", is_credit=True,
+            ).pk,
+            "entity_id": Entity.objects.create(company=company, name="HQ", entity_type="Internal").pk,
+        }
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.me)
+        self.other_client = APIClient()
+        self.other_client.force_authenticate(self.other)
+
+    def _classify(self, client, txn, **extra):
+        body = {"bank_transaction_id": txn.pk, "amount": str(txn.signed_amount),
+                "value_date": str(txn.transaction_date), **self.refs, **extra}
+        return client.post("/api/tx-classify/classify/", body, format="json")
+
+    def _claim(self, client, count):
+        response = client.post("/api/tx-classify/claim/", {"bank_account_id": self.account.pk, "count": count},
+                               format="json")
+        self.assertEqual(response.status_code, 200)
+        return [row["id"] for row in response.data["results"]]
+
+    def test_classify_checks_and_bumps_the_version(self):
+        txn = self.txns[0]
+        stale = self._classify(self.client, txn, expected_version=txn.version + 1)
+        self.assertEqual((stale.status_code, stale.data["version"]), (409, txn.version))
+
+        done = self._classify(self.client, txn, expected_version=txn.version)
+        self.assertEqual((done.status_code, done.data["version"]), (201, txn.version + 1))
+        txn.refresh_from_db()
+        self.assertEqual((txn.version, txn.classification_status), (done.data["version"], "CLASSIFIED"))
+
+        again = self._classify(self.client, txn)
+        self.assertEqual(again.status_code, 400)
+        self.assertEqual(Classification.objects.filter(bank_transaction=txn, is_active_classification=True).count(), 1)
+
+    def test_claims_are_disjoint_and_block_other_writers(self):
+        mine = self._claim(self.client, 2)
+        theirs = self._claim(self.other_client, 3)
+        self.assertEqual(len(mine), 2)
+        self.assertFalse(set(mine) & set(theirs))
+        self.assertEqual(self._claim(self.client, 2), mine)   # own claims count towards the quota
+
+        txn = BankTransaction.objects.get(pk=theirs[0])
+        self.assertEqual(self._classify(self.client, txn).status_code, 409)
+        self.assertEqual(self._classify(self.other_client, txn).status_code, 201)
+        txn.refresh_from_db()
+        self.assertIsNone(txn.claimed_by_id)   # classifying ends the claim
+
+    def test_lapsed_and_released_claims_free_the_row(self):
+        theirs = self._claim(self.other_client, 2)
+        BankTransaction.objects.filter(pk=theirs[0]).update(claimed_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self._classify(self.client, BankTransaction.objects.get(pk=theirs[0])).status_code, 201)
+
+        released = self.other_client.post("/api/tx-classify/claim/release/",
+                                          {"bank_account_id": self.account.pk}, format="json")
+        self.assertEqual(released.data, {"released": 1})
+        self.assertEqual(self._classify(self.client, BankTransaction.objects.get(pk=theirs[1])).status_code, 201)
+
+
+# ---------- reference data ----------
+
+class ReferenceInvalidationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.acme = Company.objects.create(name="Acme", pan="ABCDE1234F")
+        cls.globex = Company.objects.create(name="Globex", pan="ZYXWV9876K")
+        cls.cost_centre = CostCentre.objects.create(company=cls.acme, name="Ops")
+        cls.entity = Entity.objects.create(company=cls.acme, name="HQ", entity_type="Internal")
+        cls.vendor = Vendor.objects.create(
+            company=cls.acme, vendor_name="Initech", vendor_type="Supplier", pan_number="ABCDE1234F",
+            contact_person="Bill", phone_number="9999999999", bank_name="HDFC", bank_account="1",
+            ifsc_code="HDFC0000001",
+        )
+        cls.contract = Contract.objects.create(
+            vendor=cls.vendor, cost_centre=cls.cost_centre, entity=cls.entity, company=cls.globex,
+            description="Support", contract_date=date(2025, 1, 1), start_date=date(2025, 1, 1),
+            end_date=date(2025, 12, 31),
+        )
+
+    def setUp(self):
+        # snapshots outlive the rolled back test transactions
+        self.addCleanup(reference._snapshots.clear)
+
+    def _version(self, company):
+        return ReferenceDataVersion.objects.filter(key=str(company.pk)).values_list("version", flat=True).first() or 0
+
+    def test_moving_a_row_invalidates_both_companies(self):
+        acme, globex = self._version(self.acme), self._version(self.globex)
+        self.cost_centre.company = self.globex
+        self.cost_centre.save()
+        self.assertGreater(self._version(self.acme), acme)
+        self.assertGreater(self._version(self.globex), globex)
+
+        self.assertIn(self.cost_centre.pk, reference.for_company(self.globex.pk).data["cost_centres"])
+        self.assertNotIn(self.cost_centre.pk, reference.for_company(self.acme.pk).data["cost_centres"])
+
+    def test_renaming_a_vendor_refreshes_its_contracts(self):
+        self.assertEqual(reference.for_company(self.globex.pk).get("contracts", self.contract.pk)["name"], "Initech")
+        acme = self._version(self.acme)
+        self.vendor.vendor_name = "Initrode"
+        self.vendor.save()
+        self.assertEqual(reference.for_company(self.globex.pk).get("contracts", self.contract.pk)["name"], "Initrode")
+        self.assertEqual(self._version(self.acme), acme)   # no contracts there
@@ -1,11 +1,19 @@
 # tx_classify/urls.py
 from django.urls import path
+from rest_framework.routers import DefaultRouter
 from .views import (
     UnclassifiedListView,
     ClassifySingleView,
+    BulkClassifyView,
     SplitTransactionView,
     ResplitTransactionView,          # NEW
     ReclassifyClassificationView,    # NEW
+    ClassificationRuleViewSet,
+    AutoClassifyView,
+    ClassificationHistoryView,
+    ClaimTransactionsView,
+    ReleaseClaimsView,
+    ReferenceDataView,
 )
 
 app_name = "tx_classify"
@@ -13,7 +21,17 @@ app_name = "tx_classify"
 urlpatterns = [
     path("unclassified/", UnclassifiedListView.as_view(), name="unclassified"),
     path("classify/", ClassifySingleView.as_view(), name="classify"),
+    path("classify/bulk/", BulkClassifyView.as_view(), name="classify-bulk"),
     path("split/", SplitTransactionView.as_view(), name="split"),
     path("resplit/", ResplitTransactionView.as_view(), name="resplit"),            # NEW
-    path("reclassify/", ReclassifyClassificationView.as_view(), name="reclassify") # NEW
+    path("reclassify/", ReclassifyClassificationView.as_view(), name="reclassify"), # NEW
+    path("auto-classify/", AutoClassifyView.as_view(), name="auto-classify"),
+    path("history/", ClassificationHistoryView.as_view(), name="history"),
+    path("claim/", ClaimTransactionsView.as_view(), name="claim"),
+    path("claim/release/", ReleaseClaimsView.as_view(), name="claim-release"),
+    path("reference-data/", ReferenceDataView.as_view(), name="reference-data"),
 ]
+
+router = DefaultRouter()
+router.register(r"rules", ClassificationRuleViewSet, basename="classification-rules")
+urlpatterns += router.urls
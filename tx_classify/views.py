@@ -1,21 +1,34 @@
 # tx_classify/views.py
 from __future__ import annotations
+import hashlib
+import uuid
+from datetime import timedelta
 from decimal import Decimal, ROUND_HALF_UP
 
+from django.core.cache import cache
 from django.db import transaction
-from django.db.models import Count, Max, Q, Prefetch
+from django.db.models import Prefetch, Q
 from django.db.models.functions import Abs
-from rest_framework import status, permissions
+from django.utils import timezone
+from rest_framework import status, permissions, viewsets
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from bank_uploads.models import BankTransaction
-from .models import Classification
+from bank_uploads.pagination import InvalidCursor, keyset_page, parse_limit
+from banks.models import BankAccount
+from . import reference, rules, services, suggest
+from .models import Classification, ClassificationRule
 from .serializers import (
     ClassificationSerializer,
     SplitRequestSerializer,
     ResplitRequestSerializer,       # NEW (already used)
     ReclassifyRequestSerializer,    # NEW
+    ClassificationRuleSerializer,
+    AutoClassifyRequestSerializer,
+    BulkClassifyRequestSerializer,
+    ClaimRequestSerializer,
+    ReleaseClaimsRequestSerializer,
 )
 
 # ---------- helpers ----------
@@ -29,8 +42,57 @@ def _q2(x: Decimal) -> Decimal:
     return (x or Decimal("0")).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
 
+def _lock_for_write(bank_transaction_id: int, user, expected_version=None):
+    """
+    Lock a transaction row for a classification write (inside transaction.atomic()).
+    Returns (txn, None), or (None, error response) when it's gone, claimed by
+    someone else or no longer at `expected_version`. Checks on its
+    classifications are only reliable after this.
+    """
+    txn = services.lock_transactions([bank_transaction_id]).get(bank_transaction_id)
+    if txn is None:
+        return None, Response({"detail": "Bank transaction not found."}, status=404)
+    detail = services.conflict(txn, user, expected_version)
+    if detail:
+        return None, Response({"detail": detail, "version": txn.version}, status=409)
+    return txn, None
+
+
+def _unclaimed_q(user, now) -> Q:
+    """Rows nobody else holds a live claim on."""
+    return Q(claimed_until__isnull=True) | Q(claimed_until__lte=now) | Q(claimed_by=user)
+
+
+def _cached_count(qs, timeout: int) -> int:
+    """qs.count(), reused for `timeout` seconds by any request with the same filters."""
+    key = "tx_classify:count:" + hashlib.sha1(str(qs.query).encode()).hexdigest()
+    return cache.get_or_set(key, qs.count, timeout)
+
+
 # ---------- list view ----------
+# newest first; matches the partial index bank_txn_unclassified_idx
+INBOX_ORDERING = ("-transaction_date", "-created_at", "-id")
+# how long a non-exact inbox count is reused
+INBOX_COUNT_CACHE_SECONDS = 60
+COUNT_MODES = ("exact", "cached", "none")
+
+
 class UnclassifiedListView(APIView):
+    """
+    Pagination:
+      - ?cursor=<next_cursor> (empty for the first page): keyset pages on
+        (transaction_date, created_at, id), constant cost at any depth and
+        stable while rows get classified away. Returns "next_cursor".
+      - ?offset= (legacy, default): OFFSET slicing.
+    ?count=exact|cached|none: "cached" reuses the exact count for
+    INBOX_COUNT_CACHE_SECONDS; default is cached in cursor mode and exact
+    with offset. "count_exact" says which one you got.
+
+    ?available=1 hides rows someone else has claimed (claim/).
+
+    ?suggest=1 adds "suggestions" (top suggest_k, default 3) to unclassified rows
+    once the company's model has been trained (train_classification_suggestions).
+    """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
@@ -52,18 +114,19 @@ class UnclassifiedListView(APIView):
         include_children = (request.query_params.get("include_children", "0") in ("1", "true", "True"))
         flatten_splits = (request.query_params.get("flatten_splits", "0") in ("1", "true", "True"))
 
-        qs = qs.annotate(
-            abs_amount=Abs("signed_amount"),
-            active_count=Count(
-                "classifications",
-                filter=Q(classifications__is_active_classification=True),
-                distinct=True,
-            ),
-            last_classified_at=Max(
-                "classifications__created_at",
-                filter=Q(classifications__is_active_classification=True),
-            ),
-        )
+        # learned suggestions for unclassified rows (see tx_classify/suggest.py)
+        suggester = None
+        if request.query_params.get("suggest", "0") in ("1", "true", "True"):
+            company_id = BankAccount.objects.filter(pk=bank_account_id).values_list("company_id", flat=True).first()
+            suggester = suggest.for_company(company_id) if company_id else None
+        try:
+            suggest_k = max(1, min(suggest.MAX_SUGGESTIONS, int(request.query_params.get("suggest_k", 3))))
+        except ValueError:
+            suggest_k = 3
+
+        # classification counts are stored on the transaction (tx_classify/services.py),
+        # so no join/GROUP BY over classifications here
+        qs = qs.annotate(abs_amount=Abs("signed_amount"))
 
         # amount filters
         min_amt = _to_dec(request.query_params.get("min_amount"))
@@ -83,33 +146,47 @@ class UnclassifiedListView(APIView):
         # Unclassified Only (default ON)
         unclassified_only = (request.query_params.get("unclassified_only", "1") in ("1", "true", "True"))
         if unclassified_only:
-            qs = qs.filter(active_count=0)
+            # served by the partial index bank_txn_unclassified_idx
+            qs = qs.filter(classification_status=BankTransaction.STATUS_UNCLASSIFIED)
 
-        qs = qs.order_by("-transaction_date", "-created_at")
+        if request.query_params.get("available", "0") in ("1", "true", "True"):
+            qs = qs.filter(_unclaimed_q(request.user, timezone.now()))
 
-        # pagination
-        try:
-            limit = max(1, min(500, int(request.query_params.get("limit", 200))))
-        except ValueError:
-            limit = 200
-        try:
-            offset = max(0, int(request.query_params.get("offset", 0)))
-        except ValueError:
-            offset = 0
+        qs = qs.order_by(*INBOX_ORDERING)
 
-        page = qs[offset:offset + limit]
+        # pagination
+        cursor_mode = "cursor" in request.query_params
+        limit = parse_limit(request.query_params.get("limit"), default=200, maximum=500)
+        count_mode = request.query_params.get("count") or ("cached" if cursor_mode else "exact")
+        if count_mode not in COUNT_MODES:
+            return Response({"detail": f"count must be one of: {', '.join(COUNT_MODES)}"}, status=400)
 
         # prefetch active classifications if needed
+        page_qs = qs
         if include_children or flatten_splits:
             active_children = Classification.objects.select_related(
                 "transaction_type", "cost_centre", "entity", "asset", "contract"
             ).filter(is_active_classification=True)
-            page = page.prefetch_related(Prefetch("classifications", queryset=active_children))
+            page_qs = qs.prefetch_related(Prefetch("classifications", queryset=active_children))
+
+        if cursor_mode:
+            try:
+                page, next_cursor = keyset_page(
+                    page_qs, INBOX_ORDERING, cursor=request.query_params.get("cursor") or None, limit=limit,
+                )
+            except InvalidCursor as e:
+                return Response({"detail": str(e)}, status=400)
+        else:
+            try:
+                offset = max(0, int(request.query_params.get("offset", 0)))
+            except ValueError:
+                offset = 0
+            page = page_qs[offset:offset + limit]
 
         results = []
         for tx in page:
             # flatten: replace split parents with their child rows
-            if flatten_splits and tx.active_count and tx.active_count > 1:
+            if flatten_splits and tx.active_classification_count and tx.active_classification_count > 1:
                 for c in tx.classifications.all():
                     results.append({
                         # parent (bank txn) info
@@ -125,7 +202,7 @@ class UnclassifiedListView(APIView):
                         # classification summary for display
                         "is_split_child": True,
                         "status": "Split Child",
-                        "active_count": tx.active_count,
+                        "active_count": tx.active_classification_count,
                         "last_classified_at": tx.last_classified_at,
 
                         "child": {
@@ -143,12 +220,12 @@ class UnclassifiedListView(APIView):
                 continue  # skip adding the parent itself
 
             # normal (non-flattened) parent row
-            if tx.active_count == 0:
+            if tx.active_classification_count == 0:
                 status_label = "Unclassified"
-            elif tx.active_count == 1:
+            elif tx.active_classification_count == 1:
                 status_label = "Classified"
             else:
-                status_label = f"Split ({tx.active_count})"
+                status_label = f"Split ({tx.active_classification_count})"
 
             item = {
                 "id": tx.id,
@@ -159,10 +236,15 @@ class UnclassifiedListView(APIView):
                 "balance_amount": tx.balance_amount,
                 "signed_amount": tx.signed_amount,
                 "utr_number": tx.utr_number,
-                "active_count": tx.active_count,
+                "active_count": tx.active_classification_count,
                 "last_classified_at": tx.last_classified_at,
                 "status": status_label,
+                "version": tx.version,
+                "claimed_by": tx.claimed_by_id,
+                "claimed_until": tx.claimed_until,
             }
+            if suggester is not None and tx.active_classification_count == 0:
+                item["suggestions"] = suggester.suggest(tx.narration, tx.signed_amount, k=suggest_k)
             if include_children:
                 item["children"] = [{
                     "classification_id": str(c.classification_id),
@@ -177,13 +259,27 @@ class UnclassifiedListView(APIView):
                 } for c in tx.classifications.all()]
             results.append(item)
 
-        return Response(
-            {"results": results, "count": qs.count(), "limit": limit, "offset": offset},
-            status=200
-        )
+        if count_mode == "exact":
+            count = qs.count()
+        elif count_mode == "cached":
+            count = _cached_count(qs.order_by(), INBOX_COUNT_CACHE_SECONDS)
+        else:
+            count = None
+
+        payload = {"results": results, "count": count, "count_exact": count_mode == "exact", "limit": limit}
+        if cursor_mode:
+            payload["next_cursor"] = next_cursor
+        else:
+            payload["offset"] = offset
+        return Response(payload, status=200)
 
 
 # ---------- single classify ----------
+# Every write below locks the bank transaction row before checking its
+# classifications, so concurrent classifiers serialise on it. Requests may
+# send "expected_version" (BankTransaction.version as they read it): a 409
+# means someone else changed the transaction meanwhile, or holds a claim on
+# it (claim/). Successful responses carry the new version.
 class ClassifySingleView(APIView):
     """
     Create one ACTIVE classification (no split) **only for UNCLASSIFIED transactions**.
@@ -198,16 +294,6 @@ class ClassifySingleView(APIView):
         txn: BankTransaction = ser.validated_data["bank_transaction"]
         amount: Decimal = ser.validated_data["amount"]
 
-        # Only classify UNCLASSIFIED transactions
-        if Classification.objects.filter(
-            bank_transaction=txn,
-            is_active_classification=True
-        ).exists():
-            return Response(
-                {"detail": "This transaction is already classified or split. Only unclassified transactions can be classified."},
-                status=400,
-            )
-
         # must equal txn amount (2dp) and be positive
         expected = _q2(abs(txn.signed_amount or Decimal("0.00")))
         if _q2(amount) != expected or amount <= 0:
@@ -217,29 +303,150 @@ class ClassifySingleView(APIView):
             )
 
         with transaction.atomic():
-            Classification.objects.filter(
-                bank_transaction=txn, is_active_classification=True
-            ).update(is_active_classification=False)
+            txn, error = _lock_for_write(txn.pk, request.user, ser.validated_data.get("expected_version"))
+            if error:
+                return error
+
+            # Only classify UNCLASSIFIED transactions (checked under the row lock,
+            # so two classifiers can't both pass it)
+            if txn.active_classification_count:
+                return Response(
+                    {"detail": "This transaction is already classified or split. Only unclassified transactions can be classified."},
+                    status=400,
+                )
 
             obj = Classification.objects.create(
                 bank_transaction=txn,
-                transaction_type=ser.validated_data["transaction_type"],
-                cost_centre=ser.validated_data["cost_centre"],
-                entity=ser.validated_data["entity"],
-                asset=ser.validated_data.get("asset"),
-                contract=ser.validated_data.get("contract"),
+                transaction_type_id=ser.validated_data["transaction_type_id"],
+                cost_centre_id=ser.validated_data["cost_centre_id"],
+                entity_id=ser.validated_data["entity_id"],
+                asset_id=ser.validated_data.get("asset_id"),
+                contract_id=ser.validated_data.get("contract_id"),
                 amount=_q2(amount),
                 value_date=ser.validated_data.get("value_date") or txn.transaction_date,
                 remarks=ser.validated_data.get("remarks"),
                 is_active_classification=True,
+                operation=Classification.OP_CLASSIFY,
+                operation_id=uuid.uuid4(),
             )
+            services.refresh_classification_state([txn.pk])
 
         return Response(
-            {"classification_id": str(obj.classification_id), "created_at": obj.created_at},
+            # refresh_classification_state bumped the version once
+            {"classification_id": str(obj.classification_id), "created_at": obj.created_at,
+             "version": txn.version + 1},
             status=201,
         )
 
 
+# ---------- bulk classify ----------
+class BulkClassifyView(APIView):
+    """
+    Classify many UNCLASSIFIED transactions in one request (same rules as classify/):
+    POST { "items": [ {bank_transaction_id, transaction_type_id, cost_centre_id, entity_id,
+                       asset_id?, contract_id?, amount, value_date?, remarks?,
+                       expected_version?}, ... ] }
+    -> { "created": 2, "failed": 1, "results": [
+           {"index": 0, "bank_transaction_id": 10, "status": "created", "classification_id": "..."},
+           {"index": 1, "bank_transaction_id": 11, "status": "error", "detail": "..."}, ...] }
+
+    Reference ids are checked against each company's reference snapshot
+    (tx_classify/reference.py) and the transactions are locked with one query
+    (the "already classified" check reads their stored state), so the query
+    count doesn't grow with the item count.
+    Valid items are created (one bulk_create) even if others fail; 201 if any
+    were created, 400 otherwise.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        req = BulkClassifyRequestSerializer(data=request.data)
+        req.is_valid(raise_exception=True)
+        items = req.validated_data["items"]
+
+        errors = {}
+        seen = set()
+        for idx, it in enumerate(items):
+            if it["bank_transaction_id"] in seen:
+                errors[idx] = "Duplicate bank_transaction_id in this request."
+            seen.add(it["bank_transaction_id"])
+
+        results = [None] * len(items)
+        with transaction.atomic():
+            # lock the transactions so a concurrent classify can't slip in between check and insert
+            txns = services.lock_transactions({it["bank_transaction_id"] for it in items})
+            companies = dict(BankAccount.objects
+                             .filter(pk__in={t.bank_account_id for t in txns.values()})
+                             .values_list("pk", "company_id"))
+            snaps = reference.for_companies(set(companies.values()))
+            now = timezone.now()
+
+            new_rows = []
+            operation_id = uuid.uuid4()
+            for idx, it in enumerate(items):
+                if idx in errors:
+                    continue
+                txn = txns.get(it["bank_transaction_id"])
+                if txn is None:
+                    errors[idx] = "Bank transaction not found."
+                    continue
+                snap = snaps[companies[txn.bank_account_id]]
+                missing = [f for f, kind in reference.FIELD_KINDS.items()
+                           if it.get(f) is not None and snap.get(kind, it[f]) is None]
+                if missing:
+                    errors[idx] = f"Unknown {', '.join(missing)}."
+                    continue
+                conflict = services.conflict(txn, request.user, it.get("expected_version"), now=now)
+                if conflict:
+                    errors[idx] = conflict
+                    continue
+                if txn.active_classification_count:
+                    errors[idx] = "This transaction is already classified or split. Only unclassified transactions can be classified."
+                    continue
+                amount = _q2(it["amount"])
+                expected = _q2(abs(txn.signed_amount or Decimal("0.00")))
+                if amount != expected or amount <= 0:
+                    errors[idx] = f"Amount must equal transaction amount {expected}."
+                    continue
+
+                obj = Classification(
+                    bank_transaction=txn,
+                    transaction_type_id=it["transaction_type_id"],
+                    cost_centre_id=it["cost_centre_id"],
+                    entity_id=it["entity_id"],
+                    asset_id=it.get("asset_id"),
+                    contract_id=it.get("contract_id"),
+                    amount=amount,
+                    value_date=it.get("value_date") or txn.transaction_date,
+                    remarks=it.get("remarks"),
+                    is_active_classification=True,
+                    operation=Classification.OP_BULK_CLASSIFY,
+                    operation_id=operation_id,
+                )
+                new_rows.append(obj)
+                results[idx] = {
+                    "index": idx,
+                    "bank_transaction_id": txn.pk,
+                    "status": "created",
+                    "classification_id": str(obj.classification_id),
+                    "version": txn.version + 1,
+                }
+            Classification.objects.bulk_create(new_rows, batch_size=500)
+            services.refresh_classification_state([c.bank_transaction_id for c in new_rows])
+
+        for idx, detail in errors.items():
+            results[idx] = {
+                "index": idx,
+                "bank_transaction_id": items[idx]["bank_transaction_id"],
+                "status": "error",
+                "detail": detail,
+            }
+        return Response(
+            {"created": len(new_rows), "failed": len(errors), "results": results},
+            status=201 if new_rows else 400,
+        )
+
+
 # ---------- split ----------
 class SplitTransactionView(APIView):
     """
@@ -255,16 +462,6 @@ class SplitTransactionView(APIView):
         txn: BankTransaction = req.validated_data["bank_transaction_id"]
         rows = req.validated_data["rows"]
 
-        # BLOCK: if already split, do not allow splitting again here
-        active_cnt = Classification.objects.filter(
-            bank_transaction=txn, is_active_classification=True
-        ).count()
-        if active_cnt > 1:
-            return Response(
-                {"detail": "This transaction is already split and cannot be split again."},
-                status=400,
-            )
-
         total = _q2(sum((r["amount"] for r in rows), Decimal("0.00")))
         expected = _q2(abs(txn.signed_amount or Decimal("0.00")))
         if total != expected:
@@ -274,12 +471,24 @@ class SplitTransactionView(APIView):
             )
 
         with transaction.atomic():
+            txn, error = _lock_for_write(txn.pk, request.user, req.validated_data.get("expected_version"))
+            if error:
+                return error
+
+            # BLOCK: if already split, do not allow splitting again here
+            if txn.active_classification_count > 1:
+                return Response(
+                    {"detail": "This transaction is already split and cannot be split again."},
+                    status=400,
+                )
+
             # audit trail: mark previous active rows inactive (can be 0 or 1 row)
-            Classification.objects.filter(
-                bank_transaction=txn, is_active_classification=True
-            ).update(is_active_classification=False)
+            previous = Classification.objects.filter(bank_transaction=txn, is_active_classification=True)
+            previous_id = previous.values_list("classification_id", flat=True).first()
+            previous.update(is_active_classification=False)
 
             new_rows = []
+            operation_id = uuid.uuid4()
             for idx, r in enumerate(rows, start=1):
                 amt = _q2(r["amount"])
                 if amt <= 0:
@@ -289,19 +498,23 @@ class SplitTransactionView(APIView):
                     )
                 new_rows.append(Classification(
                     bank_transaction=txn,
-                    transaction_type=r["transaction_type_id"],
-                    cost_centre=r["cost_centre_id"],  # fixed
-                    entity=r["entity_id"],
-                    asset=r.get("asset_id"),
-                    contract=r.get("contract_id"),
+                    transaction_type_id=r["transaction_type_id"],
+                    cost_centre_id=r["cost_centre_id"],  # fixed
+                    entity_id=r["entity_id"],
+                    asset_id=r.get("asset_id"),
+                    contract_id=r.get("contract_id"),
                     amount=amt,
                     value_date=r.get("value_date") or txn.transaction_date,
                     remarks=(r.get("remarks") or f"Split part {idx}/{len(rows)}"),
                     is_active_classification=True,
+                    supersedes_id=previous_id,
+                    operation=Classification.OP_SPLIT,
+                    operation_id=operation_id,
                 ))
             Classification.objects.bulk_create(new_rows, batch_size=500)
+            services.refresh_classification_state([txn.pk])
 
-        return Response({"children_count": len(rows)}, status=201)
+        return Response({"children_count": len(rows), "version": txn.version + 1}, status=201)
 
 
 # ---------- re-split (NEW) ----------
@@ -333,14 +546,21 @@ class ResplitTransactionView(APIView):
             )
 
         with transaction.atomic():
+            txn, error = _lock_for_write(txn.pk, request.user, req.validated_data.get("expected_version"))
+            if error:
+                return error
+
             # Inactivate ONLY the selected child
-            Classification.objects.filter(
+            updated = Classification.objects.filter(
                 classification_id=child.classification_id,
                 is_active_classification=True,
             ).update(is_active_classification=False)
+            if updated == 0:
+                return Response({"detail": "Selected classification is not active."}, status=400)
 
             # Create replacement rows as active lines on the SAME bank_transaction
             new_rows = []
+            operation_id = uuid.uuid4()
             for idx, r in enumerate(rows, start=1):
                 amt = _q2(r["amount"])
                 if amt <= 0:
@@ -350,19 +570,23 @@ class ResplitTransactionView(APIView):
                     )
                 new_rows.append(Classification(
                     bank_transaction=txn,
-                    transaction_type=r["transaction_type_id"],
-                    cost_centre=r["cost_centre_id"],
-                    entity=r["entity_id"],
-                    asset=r.get("asset_id"),
-                    contract=r.get("contract_id"),
+                    transaction_type_id=r["transaction_type_id"],
+                    cost_centre_id=r["cost_centre_id"],
+                    entity_id=r["entity_id"],
+                    asset_id=r.get("asset_id"),
+                    contract_id=r.get("contract_id"),
                     amount=amt,
                     value_date=r.get("value_date") or child.value_date or txn.transaction_date,
                     remarks=(r.get("remarks") or f"Re-split part {idx}/{len(rows)}"),
                     is_active_classification=True,
+                    supersedes=child,
+                    operation=Classification.OP_RESPLIT,
+                    operation_id=operation_id,
                 ))
             Classification.objects.bulk_create(new_rows, batch_size=500)
+            services.refresh_classification_state([txn.pk])
 
-        return Response({"children_count": len(rows)}, status=201)
+        return Response({"children_count": len(rows), "version": txn.version + 1}, status=201)
 
 
 # ---------- re-classify (NEW) ----------
@@ -382,6 +606,10 @@ class ReclassifyClassificationView(APIView):
         txn = child.bank_transaction
 
         with transaction.atomic():
+            txn, error = _lock_for_write(txn.pk, request.user, ser.validated_data.get("expected_version"))
+            if error:
+                return error
+
             # inactivate selected child
             updated = Classification.objects.filter(
                 classification_id=child.classification_id,
@@ -393,18 +621,261 @@ class ReclassifyClassificationView(APIView):
             # create replacement with SAME amount, updated metadata
             obj = Classification.objects.create(
                 bank_transaction=txn,
-                transaction_type=ser.validated_data["transaction_type_id"],
-                cost_centre=ser.validated_data["cost_centre_id"],
-                entity=ser.validated_data["entity_id"],
-                asset=ser.validated_data.get("asset_id"),
-                contract=ser.validated_data.get("contract_id"),
+                transaction_type_id=ser.validated_data["transaction_type_id"],
+                cost_centre_id=ser.validated_data["cost_centre_id"],
+                entity_id=ser.validated_data["entity_id"],
+                asset_id=ser.validated_data.get("asset_id"),
+                contract_id=ser.validated_data.get("contract_id"),
                 amount=_q2(child.amount),
                 value_date=ser.validated_data.get("value_date") or child.value_date or txn.transaction_date,
                 remarks=ser.validated_data.get("remarks"),
                 is_active_classification=True,
+                supersedes=child,
+                operation=Classification.OP_RECLASSIFY,
+                operation_id=uuid.uuid4(),
             )
+            services.refresh_classification_state([txn.pk])
 
         return Response(
-            {"classification_id": str(obj.classification_id), "created_at": obj.created_at},
+            # refresh_classification_state bumped the version once
+            {"classification_id": str(obj.classification_id), "created_at": obj.created_at,
+             "version": txn.version + 1},
             status=201,
         )
+
+
+# ---------- work queue ----------
+class ClaimTransactionsView(APIView):
+    """
+    Hand out disjoint work queues: reserve the caller's next unclassified transactions.
+    POST { "bank_account_id": 1, "count"?: 50, "claim_seconds"?: 900, "start_date"?, "end_date"? }
+    -> { "claimed": 50, "claimed_until": "...", "results": [{id, ..., version}, ...] }
+
+    Rows are taken in inbox order with FOR UPDATE SKIP LOCKED, so concurrent
+    callers never wait on each other or get the same row. The caller's own
+    live claims count towards `count` (and are extended). Classifying a row
+    ends its claim; others get a 409 on it until then.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        ser = ClaimRequestSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        data = ser.validated_data
+
+        now = timezone.now()
+        until = now + timedelta(seconds=data["claim_seconds"])
+        qs = BankTransaction.objects.filter(
+            bank_account=data["bank_account_id"],
+            classification_status=BankTransaction.STATUS_UNCLASSIFIED,
+        ).filter(_unclaimed_q(request.user, now))
+        if data.get("start_date"):
+            qs = qs.filter(transaction_date__gte=data["start_date"])
+        if data.get("end_date"):
+            qs = qs.filter(transaction_date__lte=data["end_date"])
+
+        with transaction.atomic():
+            ids = list(qs.order_by(*INBOX_ORDERING)
+                         .select_for_update(skip_locked=True)
+                         .values_list("id", flat=True)[:data["count"]])
+            BankTransaction.objects.filter(pk__in=ids).update(claimed_by=request.user, claimed_until=until)
+
+        rows = (BankTransaction.objects.filter(pk__in=ids).order_by(*INBOX_ORDERING)
+                .values("id", "transaction_date", "narration", "credit_amount", "debit_amount",
+                        "balance_amount", "signed_amount", "utr_number", "version"))
+        return Response({"claimed": len(ids), "claimed_until": until, "results": list(rows)}, status=200)
+
+
+class ReleaseClaimsView(APIView):
+    """
+    Give back claims early:
+    POST { "bank_transaction_ids": [1, 2] } or { "bank_account_id": 1 } -> { "released": 2 }
+    Only the caller's own claims are touched.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        ser = ReleaseClaimsRequestSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+
+        qs = BankTransaction.objects.filter(claimed_by=request.user)
+        if ser.validated_data.get("bank_account_id"):
+            qs = qs.filter(bank_account=ser.validated_data["bank_account_id"])
+        if ser.validated_data.get("bank_transaction_ids"):
+            qs = qs.filter(pk__in=ser.validated_data["bank_transaction_ids"])
+        released = qs.update(claimed_by=None, claimed_until=None)
+        return Response({"released": released}, status=200)
+
+
+# ---------- reference data ----------
+class ReferenceDataView(APIView):
+    """
+    Everything the classification screens pick from, for one company:
+    GET ?company=<id> -> { "company_id", "etag", "transaction_types": [{id, name, direction,
+        cost_centre_id, is_active}], "cost_centres", "entities", "assets", "contracts" }
+    Served from the in-process snapshot (tx_classify/reference.py) with an ETag;
+    send If-None-Match to get a 304 while nothing changed.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        company_id = request.query_params.get("company")
+        if not company_id or not company_id.isdigit():
+            return Response({"detail": "company is required"}, status=400)
+        user = request.user
+        if user.role != "SUPER_USER" and not user.companies.filter(pk=company_id).exists():
+            return Response({"detail": "Not found."}, status=404)
+
+        snap = reference.for_company(int(company_id))
+        headers = {"ETag": snap.etag, "Cache-Control": "private, no-cache"}
+        if snap.etag in request.headers.get("If-None-Match", ""):
+            return Response(status=304, headers=headers)
+        return Response(snap.as_dict(), status=200, headers=headers)
+
+
+# ---------- history ----------
+MAX_HISTORY_TRANSACTIONS = 500
+
+
+def _history_node(c: Classification) -> dict:
+    return {
+        "classification_id": str(c.classification_id),
+        "operation": c.operation,
+        "operation_id": str(c.operation_id) if c.operation_id else None,
+        "supersedes": str(c.supersedes_id) if c.supersedes_id else None,
+        "is_active_classification": c.is_active_classification,
+        "amount": str(c.amount),
+        "value_date": c.value_date,
+        "transaction_type_id": c.transaction_type_id,
+        "transaction_type": c.transaction_type.name if c.transaction_type_id else None,
+        "cost_centre_id": c.cost_centre_id,
+        "cost_centre": c.cost_centre.name if c.cost_centre_id else None,
+        "entity_id": c.entity_id,
+        "entity": c.entity.name if c.entity_id else None,
+        "asset_id": c.asset_id,
+        "contract_id": c.contract_id,
+        "remarks": c.remarks,
+        "created_at": c.created_at,
+        "replaced_by": [],
+    }
+
+
+class ClassificationHistoryView(APIView):
+    """
+    Version trees of classifications, for many transactions at once:
+      GET ?bank_transaction_ids=1,2,3
+      GET ?bank_account_id=1&start_date=&end_date=[&operation=RECLASSIFY][&after=<id>&limit=]
+          (audit: transactions with classifications written in the date range,
+          by transaction id; "next_after" continues)
+    -> { "results": [{ "bank_transaction_id", "versions": [node, ...] }], "next_after" }
+    A node's "replaced_by" holds the rows that superseded it. Rows written before
+    supersedes links existed have none, so they show up as separate roots.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        params = request.query_params
+        next_after = None
+        if params.get("bank_transaction_ids"):
+            try:
+                txn_ids = sorted({int(x) for x in params["bank_transaction_ids"].split(",") if x.strip()})
+            except ValueError:
+                return Response({"detail": "bank_transaction_ids must be a comma-separated list of ids"}, status=400)
+            if len(txn_ids) > MAX_HISTORY_TRANSACTIONS:
+                return Response({"detail": f"At most {MAX_HISTORY_TRANSACTIONS} transactions per request."}, status=400)
+        elif params.get("bank_account_id"):
+            limit = parse_limit(params.get("limit"), default=100, maximum=MAX_HISTORY_TRANSACTIONS)
+            qs = Classification.objects.filter(bank_transaction__bank_account_id=params["bank_account_id"])
+            if params.get("start_date"):
+                qs = qs.filter(created_at__date__gte=params["start_date"])
+            if params.get("end_date"):
+                qs = qs.filter(created_at__date__lte=params["end_date"])
+            if params.get("operation"):
+                qs = qs.filter(operation=params["operation"])
+            if params.get("after"):
+                try:
+                    qs = qs.filter(bank_transaction_id__gt=int(params["after"]))
+                except ValueError:
+                    return Response({"detail": "after must be a transaction id"}, status=400)
+            txn_ids = list(qs.order_by("bank_transaction_id")
+                             .values_list("bank_transaction_id", flat=True)
+                             .distinct()[:limit + 1])
+            if len(txn_ids) > limit:
+                txn_ids = txn_ids[:limit]
+                next_after = txn_ids[-1]
+        else:
+            return Response({"detail": "bank_transaction_ids or bank_account_id is required"}, status=400)
+
+        # every version of every requested transaction in one query; trees are built here
+        rows = (Classification.objects
+                .filter(bank_transaction_id__in=txn_ids)
+                .select_related("transaction_type", "cost_centre", "entity")
+                .order_by("bank_transaction_id", "created_at", "classification_id"))
+        nodes = {}
+        roots = {tid: [] for tid in txn_ids}
+        for c in rows:
+            nodes[c.classification_id] = (c, _history_node(c))
+        for c, node in nodes.values():
+            parent = nodes.get(c.supersedes_id)
+            if parent is not None:
+                parent[1]["replaced_by"].append(node)
+            else:
+                roots[c.bank_transaction_id].append(node)
+
+        return Response({
+            "results": [{"bank_transaction_id": tid, "versions": roots[tid]} for tid in txn_ids],
+            "next_after": next_after,
+        })
+
+
+# ---------- auto-classification rules ----------
+class ClassificationRuleViewSet(viewsets.ModelViewSet):
+    """CRUD for auto-classification rules; ?company=<id> filters, ?is_active=1 for live rules only."""
+    serializer_class = ClassificationRuleSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.role == "SUPER_USER":
+            qs = ClassificationRule.objects.all()
+        else:
+            qs = ClassificationRule.objects.filter(company__in=user.companies.all())
+
+        company = self.request.query_params.get("company")
+        if company:
+            qs = qs.filter(company_id=company)
+        if self.request.query_params.get("is_active") in ("1", "true", "True"):
+            qs = qs.filter(is_active=True)
+        return qs.select_related("transaction_type", "cost_centre", "entity")
+
+    def destroy(self, request, *args, **kwargs):
+        instance = self.get_object()
+        instance.is_active = False  # keep the rule around, just stop applying it
+        instance.save(update_fields=["is_active", "updated_at"])
+        return Response({"detail": "Rule deactivated."}, status=status.HTTP_204_NO_CONTENT)
+
+
+class AutoClassifyView(APIView):
+    """
+    Classify an account's unclassified transactions with the company's active rules:
+    POST { "bank_account_id": 1, "start_date"?, "end_date"?, "dry_run"?: false }
+    -> { "scanned": 120000, "matched": 87000, "created": 87000, "by_rule": [{rule_id, matched, created}, ...] }
+    Each match gets one active classification for the full amount.
+    created (overall and per rule) is lower than matched when some rows were
+    classified, claimed or locked by someone else in the meantime.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        ser = AutoClassifyRequestSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+
+        account = ser.validated_data["bank_account_id"]
+        result = rules.auto_classify(
+            account.pk,
+            date_from=ser.validated_data.get("start_date"),
+            date_to=ser.validated_data.get("end_date"),
+            rules=rules.RuleSet.for_company(account.company_id),
+            dry_run=ser.validated_data["dry_run"],
+        )
+        return Response(result.as_dict(), status=201 if result.created else 200)